@@ -0,0 +1,51 @@
+"""AI decision cost per step as the fleet grows, with and without the scheduler's budget.
+
+run with: python -m benchmarks.ai_scheduler [--ships 250 1000 4000]
+
+spawns a fleet spread wide around the player, each holding where it spawned so they all start
+out wanting a new target, and steps it once with every ship deciding every step (no budget, what
+update_ai did before) and once under AI_BUDGET_MS. reports the p50 of the decision scope
+and of the per step ai that stays outside the scheduler, decisions a step, how many steps
+a round over every ship took, and the overruns
+"""
+import argparse
+import math
+from game.simulation import Simulation
+from game.profiler import Profiler
+from game.constants import *
+
+STEPS = 120
+WARMUP = 20
+
+
+def run(ships:int, budget_ms:float) -> tuple:
+    profiler = Profiler(window=STEPS, enabled=True)
+    simulation = Simulation(headless=True, seed=1, profiler=profiler)
+    simulation.setup()
+    simulation.ai.budget = budget_ms / 1000
+    for i in range(ships):
+        angle = 2 * math.pi * i / ships
+        radius = 1000 + 3000 * (i % 7) / 6
+        simulation.spawn_cargo_ship(radius * math.cos(angle), radius * math.sin(angle))
+    simulation.run(WARMUP)
+    profiler.reset()
+    simulation.run(STEPS)
+    summary = profiler.summary()
+    return summary["decisions"]["p50"], summary["ai"]["p50"], simulation.ai.stats
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="ai scheduler benchmark")
+    parser.add_argument("--ships", type=int, nargs="*", default=[250, 1000, 4000])
+    args = parser.parse_args(argv)
+
+    for ships in args.ships:
+        print(f"{ships} ships")
+        for name, budget in (("every step", math.inf), (f"{AI_BUDGET_MS:g} ms budget", AI_BUDGET_MS)):
+            decisions, per_step, stats = run(ships, budget)
+            print(f"  {name:13}  decisions {decisions:6.2f} ms  per step ai {per_step:6.2f} ms  {stats['per_step']:7.1f} decisions/step  "
+                  f"round {stats['round_steps']:3d} steps  {stats['overruns']} overruns, worst {stats['worst_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
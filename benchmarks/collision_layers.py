@@ -0,0 +1,75 @@
+"""Collision pairs and physics time of a dense firefight with and without collision layers.
+
+run with: python -m benchmarks.collision_layers
+
+uses pymunk bullets, the projectile fast path never hands bullets to the solver in the first place.
+"without" puts every shape back on pymunk's default filter, which is how the game started out
+"""
+import math
+import pymunk
+from game.simulation import Simulation
+from game.profiler import Profiler
+from game.constants import PLAYER_GUN_COOLDOWN
+from benchmarks.suite import ring
+
+STEPS = 300
+WARMUP = 120
+SEED = 1234
+SHIPS = 60
+
+
+def count_pairs(space:pymunk.Space) -> int:
+    """Arbiters alive after the last step, every pair is seen from both of its bodies"""
+    seen = [0]
+    def count(_arbiter):
+        seen[0] += 1
+    for body in space.bodies:
+        body.each_arbiter(count)
+    return seen[0] // 2
+
+
+def firefight(layered:bool) -> dict:
+    profiler = Profiler(window=STEPS, enabled=True)
+    simulation = Simulation(headless=True, seed=SEED, profiler=profiler, fast_bullets=False)
+    simulation.setup()
+    cargo = [simulation.spawn_cargo_ship(x, y, target=(0, 0)) for x, y in ring(SHIPS, 400)]
+    shooters = cargo + [simulation.player_sprite]
+    simulation.player_sprite.physics_object.body.position = (0, 0)
+    for ship in shooters:
+        ship.health = math.inf
+        ship.set_cooldown(PLAYER_GUN_COOLDOWN)
+        if not layered:
+            ship.physics_object.shape.filter = pymunk.ShapeFilter()
+            ship.bullet_filter = pymunk.ShapeFilter()
+
+    space = simulation.physics_engine.space
+    pairs = 0
+    for step in range(WARMUP + STEPS):
+        if step == WARMUP:
+            profiler.reset()
+        for ship in shooters:
+            ship.fire_guns()
+        simulation.step()
+        if step >= WARMUP:
+            pairs += count_pairs(space)
+
+    physics = profiler.percentiles("physics", (50, 95))
+    return {
+        "bullets": len(simulation.bullet_pool.live),
+        "pairs": pairs / STEPS,
+        "physics_p50": physics[0],
+        "physics_p95": physics[1],
+    }
+
+
+def main():
+    print(f"{SHIPS} AI ships and the player all firing, {STEPS} steps")
+    for layered in (False, True):
+        result = firefight(layered)
+        print(f"{'with' if layered else 'without':>7} layers  {result['bullets']:4} bullets  "
+              f"{result['pairs']:7.1f} pairs/step  physics p50 {result['physics_p50']:6.2f} ms  "
+              f"p95 {result['physics_p95']:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
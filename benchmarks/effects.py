@@ -0,0 +1,77 @@
+"""Frame cost of the gpu particles against the cpu fallback.
+
+run with: python -m benchmarks.effects [--explosions N] [--window]
+
+every frame queues N explosions plus a fleet's worth of thrust emits and runs emit, update
+and draw on both particle systems. reports emit, the numpy spawn and upload, update plus
+draw as the calls return, and the whole frame after a glFinish, along with how many
+particles each one keeps alive. a software renderer does the gpu's work inside the calls,
+so only emit is python time there. runs in a headless context unless --window
+"""
+import argparse
+import time
+import numpy as np
+import pyglet
+
+FRAMES = 180
+THRUSTERS = 500
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="particle effects benchmark")
+    parser.add_argument("--explosions", type=int, default=20, help="explosions a frame, 64 particles each")
+    parser.add_argument("--window", action="store_true", help="open a real window instead of a headless context")
+    args = parser.parse_args(argv)
+    pyglet.options["headless"] = not args.window
+
+    import arcade
+    from game.render import ParticleRenderer
+    from game.effects import EffectQueue, GpuParticles, CpuParticles, PARTICLE_STATE, THRUST_EFFECT, EXPLOSION_EFFECT
+
+    window = arcade.Window(1280, 720, "effects benchmark", visible=args.window)
+    ctx = window.ctx
+    camera = arcade.Camera(window.width, window.height)
+    camera.move_to((-window.width / 2, -window.height / 2))
+    random = np.random.default_rng(1)
+    delta_time = 1 / 60
+
+    systems = (("gpu", GpuParticles(ctx, seed=1)), ("cpu", CpuParticles(ParticleRenderer(ctx), seed=1)))
+    for name, particles in systems:
+        queue = EffectQueue()
+        emits = []
+        calls = []
+        frames = []
+        for frame in range(FRAMES):
+            for x, y in random.uniform(-600, 600, (args.explosions, 2)):
+                queue.emit(EXPLOSION_EFFECT, x, y, 0.0)
+            for x, y, angle in random.uniform(-600, 600, (THRUSTERS, 3)):
+                queue.emit(THRUST_EFFECT, x, y, angle)
+            start = time.perf_counter()
+            window.clear()
+            camera.use()
+            particles.emit(queue.drain())
+            emitted = time.perf_counter()
+            particles.update(delta_time)
+            particles.draw()
+            emits.append(emitted - start)
+            calls.append(time.perf_counter() - emitted)
+            ctx.finish()
+            frames.append(time.perf_counter() - start)
+
+        # the first second fills the systems up and compiles the shaders
+        emits = sorted(emits[60:])
+        calls = sorted(calls[60:])
+        frames = sorted(frames[60:])
+        if name == "gpu":
+            state = np.frombuffer(particles.buffers[particles.current].read(), dtype=PARTICLE_STATE)
+        else:
+            state = particles.state
+        alive = int((state["age"] < state["life"]).sum())
+        print(f"{name}  {alive:6d} particles of {particles.capacity:6d}  p50 emit {emits[len(emits) // 2] * 1000:6.2f} ms  "
+              f"update + draw {calls[len(calls) // 2] * 1000:6.2f} ms  frame {frames[len(frames) // 2] * 1000:6.2f} ms")
+    print(f"{ctx.info.RENDERER}, {args.explosions} explosions and {THRUSTERS} thrusters a frame")
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Per entity memory and system cost of the ComponentStore against state kept on the sprites.
+
+run with: python -m benchmarks.entity_memory [--ships]
+
+the sprite side is a plain object carrying the attributes ship used to keep in its own
+__dict__, the store side is the same state as rows of the store's arrays plus the ship's
+PIDState. --ships also spawns the entities as real cargo ships and reports what a whole
+ship costs
+"""
+import argparse
+import gc
+import math
+import time
+import tracemalloc
+import numpy as np
+from game.components import ComponentStore
+from game.utilities import PIDState
+from game.constants import *
+
+ENTITIES = 10_000
+REPEATS = 20
+
+
+#what a ship kept on itself before its state moved into the store
+class SpriteState:
+
+    def __init__(self, i:int):
+        self.health = float(CARGO_HEALTH)
+        self.cooldown = float(CARGO_GUN_COOLDOWN)
+        self.lastfire = 0.0
+        self.speed = 0.0
+        self.player_force = [0, 0]
+        self.targetcoord = (float(i), float(-i))
+        self.distance_to_target = 0.0
+        self.target_angle = 0.0
+        self.bodyangle = 0.0
+        self.pid_params = {"p":100, "i":10, "d":0.1}
+        self.pid_data = {"errSum":0, "lasterr":0}
+        self.pid_output = 0.0
+
+
+def traced(build) -> tuple:
+    """What build() returns and the bytes it left allocated"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def build_sprites() -> list:
+    return [SpriteState(i) for i in range(ENTITIES)]
+
+
+def build_store() -> tuple:
+    store = ComponentStore()
+    pids = []
+    for i in range(ENTITIES):
+        entity = store.create(None)
+        store.health[entity] = CARGO_HEALTH
+        store.cooldown[entity] = CARGO_GUN_COOLDOWN
+        store.target[entity] = (i, -i)
+        store.has_target[entity] = True
+        pids.append(PIDState(*SHIP_PID_GAINS, windup=SHIP_PID_WINDUP))
+    return store, pids
+
+
+def timed(run) -> float:
+    """Best of REPEATS, in ms"""
+    best = math.inf
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def systems(sprites:list, store:ComponentStore):
+    """Damage every entity, decay them, and collect the dead, both ways"""
+    ids = np.arange(ENTITIES)
+    amounts = np.full(ENTITIES, 1e-6)
+
+    def on_sprites():
+        for state in sprites:
+            state.health -= 1e-6
+        for state in sprites:
+            state.health -= 1e-6
+        return [state for state in sprites if state.health <= 0]
+
+    def on_store():
+        store.damage(ids, amounts)
+        store.decay(ids, 1e-6)
+        return store.dead(ids)
+
+    return timed(on_sprites), timed(on_store)
+
+
+def ship_cost() -> float:
+    from game.simulation import Simulation
+    simulation = Simulation(headless=True, seed=1)
+    simulation.setup()
+
+    def spawn():
+        return [simulation.spawn_cargo_ship(i * 50.0, 0) for i in range(ENTITIES)]
+    _ships, size = traced(spawn)
+    return size / ENTITIES
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="entity store memory benchmark")
+    parser.add_argument("--ships", action="store_true", help=f"also spawn {ENTITIES} real cargo ships")
+    args = parser.parse_args(argv)
+
+    sprites, sprite_bytes = traced(build_sprites)
+    (store, _pids), store_bytes = traced(build_store)
+    print(f"{ENTITIES} entities")
+    print(f"  state on sprites  {sprite_bytes / ENTITIES:7.0f} B/entity")
+    print(f"  store + PIDState  {store_bytes / ENTITIES:7.0f} B/entity  "
+          f"({store.nbytes / store.capacity:.0f} B of arrays per row, {sprite_bytes / store_bytes:.1f}x smaller)")
+
+    on_sprites, on_store = systems(sprites, store)
+    print(f"  damage + decay + dead  sprites {on_sprites:6.2f} ms  store {on_store:6.2f} ms  ({on_sprites / on_store:.0f}x)")
+
+    if args.ships:
+        print(f"  whole cargo ship  {ship_cost():7.0f} B/entity  (sprite, body, gun and store row)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Checks FleetController against the scalar ship.steer and times both.
+
+run with: python -m benchmarks.fleet_steering
+"""
+import math
+import random
+import time
+import numpy as np
+import pymunk
+from game import utilities, entitys
+from game.fleet import FleetController
+from game.components import ComponentStore, component
+from game.constants import *
+
+FRAMES = 120
+DELTA_TIME = 1 / 60
+
+
+#just the parts of entitys.ship that its steer method reads and writes,
+#so this runs without a window
+class SteeringShip:
+
+    distance_to_target = component("distance")
+    target_angle = component("target_angle")
+    bodyangle = component("body_angle")
+    pid_output = component("output")
+
+    def __init__(self, rng:random.Random, entities:ComponentStore):
+        self.body = pymunk.Body(CARGO_MASS, CARGO_MOMENT)
+        self.physics_object = self
+        self.body.angle = rng.uniform(-10, 10)
+        self.position = (rng.uniform(-2000, 2000), rng.uniform(-2000, 2000))
+        self.body.position = self.position
+        self.entities = entities
+        self.entity = entities.create(self, self.body)
+        self.target = None
+        self.targetcoord = (rng.uniform(-2000, 2000), rng.uniform(-2000, 2000))
+        self.pid = utilities.PIDState(*SHIP_PID_GAINS, windup=SHIP_PID_WINDUP, input=self.body.angle)
+        self.fleet = None
+
+    # the real method, so this checks the fleet against what ships actually do
+    steer = entitys.ship.steer
+
+
+def make_fleet(count:int, seed:int):
+    rng = random.Random(seed)
+    entities = ComponentStore()
+    return [SteeringShip(rng, entities) for _ in range(count)]
+
+
+def advance(ships):
+    #turn the accumulated torque into rotation so later frames see new angles
+    for ship in ships:
+        ship.body.angle += ship.body.torque * 1e-5
+        ship.body.torque = 0
+
+
+def run_scalar(ships):
+    torques = []
+    for _ in range(FRAMES):
+        for ship in ships:
+            ship.steer(DELTA_TIME)
+        torques.append([ship.body.torque for ship in ships])
+        advance(ships)
+    return np.array(torques)
+
+
+def run_fleet(ships):
+    fleet = FleetController()
+    for ship in ships:
+        fleet.add(ship)
+    torques = []
+    for _ in range(FRAMES):
+        fleet.entities.sync_transforms()
+        fleet.update(DELTA_TIME)
+        torques.append([ship.body.torque for ship in ships])
+        advance(ships)
+    return np.array(torques)
+
+
+def main():
+    for count in (10, 100, 1000):
+        start = time.perf_counter()
+        scalar = run_scalar(make_fleet(count, seed=count))
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = run_fleet(make_fleet(count, seed=count))
+        fleet_time = time.perf_counter() - start
+
+        assert np.allclose(scalar, batched, rtol=1e-9, atol=1e-6), f"fleet drifted from the scalar path at {count} ships"
+        print(f"{count:>5} ships  scalar {scalar_time / FRAMES * 1000:7.3f} ms/frame  "
+              f"fleet {fleet_time / FRAMES * 1000:7.3f} ms/frame  ({scalar_time / fleet_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Hit box cost at startup with and without the persistent hit box cache.
+
+run with: python -m benchmarks.hitbox_cache
+
+loads the asset registry and asks every texture for its hit box, as the first sprite made
+from each would, three ways: no cache, so every texture's pixels get scanned, an empty
+cache file that has to be filled, and the filled file from the run before. arcade's own
+texture cache is cleared in between, so every run starts like a new process. also checks the cached hit boxes match the scanned ones
+"""
+import os
+import tempfile
+import time
+import arcade
+from game.assets import AssetRegistry, HitBoxCache
+from game.constants import *
+
+REPEATS = 5
+
+
+def startup(hit_boxes:HitBoxCache) -> tuple:
+    """Registry load plus every texture's hit box, in ms"""
+    arcade.cleanup_texture_cache()
+    start = time.perf_counter()
+    assets = AssetRegistry(hit_boxes=hit_boxes)
+    assets.load()
+    for texture in assets.textures.values():
+        texture.hit_box_points
+    return (time.perf_counter() - start) * 1000, assets
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hitboxes.json")
+        uncached = min(startup(None)[0] for _ in range(REPEATS))
+        cold, _assets = startup(HitBoxCache(path))
+        warm = []
+        for _ in range(REPEATS):
+            cache = HitBoxCache(path)
+            elapsed, assets = startup(cache)
+            warm.append(elapsed)
+        size = os.path.getsize(path)
+
+    # the same textures scanned fresh
+    _elapsed, scanned = startup(None)
+    mismatched = [key for key, texture in assets.textures.items()
+                  if [tuple(point) for point in texture.hit_box_points]
+                  != [tuple(point) for point in scanned.textures[key].hit_box_points]]
+
+    print(f"{len(assets.textures)} textures, {len(cache.entries)} cached hit boxes, {size} B file")
+    print(f"  no cache       {uncached:7.1f} ms")
+    print(f"  filling cache  {cold:7.1f} ms")
+    print(f"  from the file  {min(warm):7.1f} ms  ({cache.hits} hits, {cache.misses} misses, {uncached / min(warm):.1f}x)")
+    print(f"  hit boxes match the scanned ones: {not mismatched}")
+
+
+if __name__ == '__main__':
+    main()
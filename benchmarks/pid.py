@@ -0,0 +1,78 @@
+"""Calls per second of the pid controllers.
+
+run with: python -m benchmarks.pid
+
+utilities.pid with its dicts against pid_step on a PIDState, and pid_batch per controller
+at a few fleet sizes. also reports what a burst of pid_step calls leaves allocated
+"""
+import time
+import tracemalloc
+import numpy as np
+from game import utilities
+from game.constants import *
+
+CALLS = 200_000
+DELTA_TIME = 1 / 60
+
+
+def rate(run, calls:int) -> float:
+    start = time.perf_counter()
+    run()
+    return calls / (time.perf_counter() - start)
+
+
+def dict_calls():
+    params = {"p": SHIP_PID_GAINS[0], "i": SHIP_PID_GAINS[1], "d": SHIP_PID_GAINS[2]}
+    data = {"errSum": 0, "lasterr": 0}
+    pid = utilities.pid
+    for n in range(CALLS):
+        pid(n * 1e-6, 1.0, DELTA_TIME, params, data)
+
+
+def state_calls():
+    state = utilities.PIDState(*SHIP_PID_GAINS, windup=SHIP_PID_WINDUP)
+    pid_step = utilities.pid_step
+    for n in range(CALLS):
+        pid_step(state, n * 1e-6, 1.0, DELTA_TIME)
+
+
+def batch_calls(controllers:int):
+    rng = np.random.default_rng(controllers)
+    gains = np.tile(SHIP_PID_GAINS, (controllers, 1)).astype(float)
+    windup = np.full(controllers, SHIP_PID_WINDUP)
+    err_sum = np.zeros(controllers)
+    last_input = np.zeros(controllers)
+    setpoint = rng.uniform(-1, 1, controllers)
+    delta_time = np.full(controllers, DELTA_TIME)
+    for n in range(CALLS // controllers):
+        measured = last_input + 1e-3
+        _output, err_sum = utilities.pid_batch(measured, setpoint, delta_time, gains, err_sum, last_input, windup)
+        last_input = measured
+
+
+def retained() -> int:
+    """Bytes still allocated after a burst of pid_step calls on one state"""
+    state = utilities.PIDState(*SHIP_PID_GAINS, windup=SHIP_PID_WINDUP)
+    pid_step = utilities.pid_step
+    tracemalloc.start()
+    before, _peak = tracemalloc.get_traced_memory()
+    for n in range(10_000):
+        pid_step(state, n * 1e-6, 1.0, DELTA_TIME)
+    after, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return after - before
+
+
+def main():
+    dicts = rate(dict_calls, CALLS)
+    states = rate(state_calls, CALLS)
+    print(f"utilities.pid      {dicts / 1e6:6.2f} M calls/s")
+    print(f"pid_step           {states / 1e6:6.2f} M calls/s  ({states / dicts:.2f}x)")
+    for controllers in (10, 100, 1000):
+        batched = rate(lambda: batch_calls(controllers), CALLS // controllers * controllers)
+        print(f"pid_batch {controllers:>5}  {batched / 1e6:6.2f} M controller updates/s  ({batched / dicts:.1f}x)")
+    print(f"pid_step left {retained()} bytes allocated after 10 000 calls")
+
+
+if __name__ == '__main__':
+    main()
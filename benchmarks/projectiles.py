@@ -0,0 +1,67 @@
+"""Per-bullet cost of the array backed projectiles against pooled pymunk bullets.
+
+run with: python -m benchmarks.projectiles
+
+a ring of cargo ships fires into itself, the physics and projectile time of the same
+ring holding fire is taken off, and what is left is divided by the bullets in flight
+"""
+import math
+from game.simulation import Simulation
+from game.profiler import Profiler
+from game.constants import PLAYER_GUN_COOLDOWN
+from benchmarks.suite import ring
+
+STEPS = 300
+WARMUP = 150
+SEED = 1234
+BULLET_SCOPES = ("physics", "projectiles")
+
+
+def measure(ships:int, fast_bullets:bool, fire:bool = True) -> dict:
+    profiler = Profiler(window=STEPS, enabled=True)
+    simulation = Simulation(headless=True, seed=SEED, profiler=profiler, fast_bullets=fast_bullets)
+    simulation.setup()
+    cargo = [simulation.spawn_cargo_ship(x, y, target=(0, 0)) for x, y in ring(ships, 600)]
+    for ship in cargo:
+        ship.health = math.inf
+        ship.set_cooldown(PLAYER_GUN_COOLDOWN)
+
+    def step():
+        if fire:
+            for ship in cargo:
+                ship.fire_guns()
+        simulation.step()
+
+    for _ in range(WARMUP):
+        step()
+    profiler.reset()
+    in_flight = 0
+    for _ in range(STEPS):
+        step()
+        in_flight += len(simulation.bullet_pool.live)
+
+    samples = profiler.samples
+    total_ms = sum(sum(samples[scope]) for scope in BULLET_SCOPES if scope in samples)
+    return {
+        "bullets": in_flight / STEPS,
+        "step_ms": total_ms / STEPS,
+    }
+
+
+def per_bullet(ships:int, fast_bullets:bool) -> tuple:
+    """Bullets in flight and microseconds each one adds to a step"""
+    firing = measure(ships, fast_bullets)
+    holding = measure(ships, fast_bullets, fire=False)
+    return firing["bullets"], (firing["step_ms"] - holding["step_ms"]) * 1000 / max(firing["bullets"], 1)
+
+
+def main():
+    for ships in (10, 50, 100):
+        bullets, pooled = per_bullet(ships, fast_bullets=False)
+        _bullets, fast = per_bullet(ships, fast_bullets=True)
+        print(f"{ships:>4} ships  ~{bullets:5.0f} bullets  pymunk {pooled:6.2f} us/bullet  "
+              f"projectiles {fast:6.2f} us/bullet  {pooled / max(fast, 1e-9):5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Frame cost of drawing projectiles as sprites against the instanced particle renderer.
+
+run with: python -m benchmarks.render [--bullets N] [--window]
+
+fills a ProjectileSystem with bullets flying out of a ring of ships, then each frame moves
+them one step and draws them both ways: placing their sprites and drawing bullet_list, and
+queueing the arrays on a ParticleRenderer. reports cpu time per frame (with a glFinish, so
+it includes waiting on the gpu) and the gpu's own time from a query. runs in a headless
+context unless --window
+"""
+import argparse
+import time
+import pyglet
+
+FRAMES = 120
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="projectile rendering benchmark")
+    parser.add_argument("--bullets", type=int, default=20_000)
+    parser.add_argument("--window", action="store_true", help="open a real window instead of a headless context")
+    args = parser.parse_args(argv)
+    pyglet.options["headless"] = not args.window
+
+    import arcade
+    from game.simulation import Simulation
+    from game.render import ParticleRenderer
+    from game.constants import SPRITE_SCALING
+
+    window = arcade.Window(1280, 720, "render benchmark", visible=args.window)
+    ctx = window.ctx
+    simulation = Simulation(headless=True, seed=1, fast_bullets=True)
+    simulation.setup()
+    projectiles = simulation.bullet_pool
+    projectiles.cap = args.bullets
+    ships = [simulation.spawn_cargo_ship(x, y) for x, y in ((-400, 0), (400, 0), (0, -300), (0, 300))]
+    while projectiles.count < args.bullets:
+        projectiles.acquire_many(ships * 256)
+    # they only fly and get drawn, nothing stops or expires them
+    projectiles.health[:projectiles.count] = 1e9
+    projectiles.mask[:projectiles.count] = 0
+    bullet_list = simulation.scene["bullet_list"]
+    camera = arcade.Camera(window.width, window.height)
+    camera.move_to((-window.width / 2, -window.height / 2))
+    renderer = ParticleRenderer(ctx)
+    query = ctx.query()
+
+    def sprites():
+        projectiles.place_sprites(0.5)
+        bullet_list.draw()
+
+    def instanced():
+        projectiles.render(renderer, 0.5)
+        renderer.draw()
+
+    results = {}
+    for name, draw in (("sprites", sprites), ("instanced", instanced)):
+        cpu = []
+        gpu = []
+        for frame in range(FRAMES):
+            projectiles.update()
+            start = time.perf_counter()
+            window.clear()
+            camera.use()
+            with query:
+                draw()
+            ctx.finish()
+            cpu.append(time.perf_counter() - start)
+            gpu.append(query.time_elapsed / 1e6)
+        # the first frames upload textures and compile shaders
+        cpu = sorted(cpu[10:])
+        gpu = sorted(gpu[10:])
+        results[name] = (cpu[len(cpu) // 2] * 1000, gpu[len(gpu) // 2])
+
+    print(f"{projectiles.count} bullets, {ctx.info.RENDERER}")
+    for name, (cpu, gpu) in results.items():
+        print(f"  {name:9}  cpu {cpu:7.2f} ms  gpu {gpu:7.2f} ms")
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
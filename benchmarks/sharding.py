@@ -0,0 +1,42 @@
+"""Steps/s of the sharded world as the worker count goes up.
+
+run with: python -m benchmarks.sharding [--ships 10000] [--workers 1 2 4 8]
+
+scaling is relative to the first worker count given, it flattens out past the core count
+"""
+import argparse
+import os
+from game.sharding import ShardedWorld
+
+WARMUP = 30
+
+
+def measure(ships:int, workers:int, steps:int, seed:int, fire:bool) -> float:
+    with ShardedWorld(ships, regions=workers, seed=seed, fire=fire) as world:
+        world.run(WARMUP)
+        elapsed = world.run(steps)
+    return steps / elapsed
+
+
+def main(argv = None):
+    cores = os.cpu_count()
+    default_workers = [count for count in (1, 2, 4, 8, 16) if count <= cores] or [1]
+    parser = argparse.ArgumentParser(description="sharded world scaling")
+    parser.add_argument("--ships", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fire", action="store_true")
+    args = parser.parse_args(argv)
+
+    print(f"{args.ships} ships, {cores} cores")
+    single = None
+    for workers in args.workers:
+        rate = measure(args.ships, workers, args.steps, args.seed, args.fire)
+        single = single or rate
+        print(f"{workers:>3} workers {rate:8.1f} steps/s  {rate / single:5.2f}x  "
+              f"({rate / single / workers * 100:3.0f}% of linear)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compares SpatialHash radius and k-nearest queries against brute force.
+
+run with: python -m benchmarks.spatial_hash
+
+k-nearest on a few ships spread over many cells checks every ship instead of walking the grid,
+so at 100 ships both columns are a plain scan
+"""
+import heapq
+import random
+import time
+from game.spatial import SpatialHash
+
+WORLD = 20000
+QUERIES = 200
+RADIUS = 500
+K = 8
+
+
+def brute_radius(points, x, y, radius):
+    radius_sq = radius * radius
+    return [i for i, (px, py) in enumerate(points) if (px - x) ** 2 + (py - y) ** 2 <= radius_sq]
+
+
+def brute_nearest(points, x, y, k):
+    return heapq.nsmallest(k, range(len(points)), key=lambda i: (points[i][0] - x) ** 2 + (points[i][1] - y) ** 2)
+
+
+def timed(function, queries):
+    start = time.perf_counter()
+    results = [function(x, y) for x, y in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    rng = random.Random(1)
+    print(f"{'ships':>6} {'radius brute':>13} {'radius hash':>12} {'knn brute':>10} {'knn hash':>9} {'sync':>9}   (ms per query)")
+    for count in (100, 1000, 10000):
+        points = [(rng.uniform(-WORLD, WORLD), rng.uniform(-WORLD, WORLD)) for _ in range(count)]
+        # query around existing ships, like the AI does
+        queries = [points[rng.randrange(count)] for _ in range(QUERIES)]
+
+        index = SpatialHash()
+        for i, (x, y) in enumerate(points):
+            index.move(i, x, y)
+        # a second pass is what a normal step costs, most ships stay in their cell
+        start = time.perf_counter()
+        for i, (x, y) in enumerate(points):
+            index.move(i, x + 1, y + 1)
+            index.move(i, x, y)
+        sync_time = (time.perf_counter() - start) / 2
+
+        brute_radius_time, expected = timed(lambda x, y: brute_radius(points, x, y, RADIUS), queries)
+        hash_radius_time, found = timed(lambda x, y: index.query_radius(x, y, RADIUS), queries)
+        assert [sorted(r) for r in found] == expected
+
+        brute_knn_time, expected = timed(lambda x, y: brute_nearest(points, x, y, K), queries)
+        hash_knn_time, found = timed(lambda x, y: index.nearest(x, y, K), queries)
+        distance = lambda i, q: (points[i][0] - q[0]) ** 2 + (points[i][1] - q[1]) ** 2
+        for q, a, b in zip(queries, found, expected):
+            assert [distance(i, q) for i in a] == [distance(i, q) for i in b]
+
+        print(f"{count:>6} {brute_radius_time * 1000:>13.4f} {hash_radius_time * 1000:>12.4f} "
+              f"{brute_knn_time * 1000:>10.4f} {hash_knn_time * 1000:>9.4f} {sync_time * 1000:>8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Headless scenario benchmarks with stored baselines.
+
+run with:   python -m benchmarks.suite               compare against benchmarks/baselines.json
+            python -m benchmarks.suite --record      record new baselines
+            python -m benchmarks.suite fleet_500     run some scenarios only
+
+baselines are timings of one machine and are not checked in, record them on the machine that
+will run the comparison, before the change being measured. a baseline from another machine
+counts as missing.
+
+exits with 1 when a scenario got slower or bigger than its baseline allows, or has no baseline.
+steps/s, p50 step time, peak memory and the subsystems' p50 are held to --tolerance, the p95 and
+p99 tails move around from run to run even on one machine and get the wider --tail-tolerance
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import platform
+import time
+import tracemalloc
+from game.simulation import Simulation
+from game.profiler import Profiler
+from game.constants import PLAYER_GUN_COOLDOWN
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+SEED = 1234
+# subsystems faster than this are too noisy to compare
+SUBSYSTEM_FLOOR_MS = 0.25
+
+
+#scenarios
+#each one takes a set up headless simulation, adds its load to it and
+#returns the AI ships that should hold their trigger down every step
+
+def ring(count:int, radius:float):
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        yield radius * math.cos(angle), radius * math.sin(angle)
+
+
+def fleet(ships:int):
+    """ships AI ships criss crossing the map on targetcoord steering"""
+    def build(simulation:Simulation):
+        for x, y in ring(ships, 2000):
+            simulation.spawn_cargo_ship(x, y, target=(-x, -y))
+        return []
+    return build
+
+
+def bullet_storm(ships:int):
+    """a ring of cargo ships all firing into each other"""
+    def build(simulation:Simulation):
+        cargo = [simulation.spawn_cargo_ship(x, y, target=(0, 0)) for x, y in ring(ships, 600)]
+        for ship in cargo:
+            # keep the storm going for the whole run, the hits still go through the handler
+            ship.health = math.inf
+            # at the player's fire rate, the rate every ship had before cooldowns were per ship
+            ship.set_cooldown(PLAYER_GUN_COOLDOWN)
+        return cargo
+    return build
+
+
+def player_firing(ships:int):
+    """the player holding fire into a group of cargo ships"""
+    def build(simulation:Simulation):
+        for x, y in ring(ships, 300):
+            simulation.spawn_cargo_ship(x + 1000, y, target=(x + 1000, y)).health = math.inf
+        simulation.set_aim(1000, 0)
+        simulation.fire_pressed = True
+        return []
+    return build
+
+
+SCENARIOS = {
+    "fleet_100": fleet(100),
+    "fleet_500": fleet(500),
+    "bullet_storm_50": bullet_storm(50),
+    "player_firing_20": player_firing(20),
+}
+
+
+def make(name:str, profiler:Profiler = None) -> tuple:
+    simulation = Simulation(headless=True, seed=SEED, profiler=profiler)
+    simulation.setup()
+    shooters = SCENARIOS[name](simulation)
+    return simulation, shooters
+
+
+def step(simulation:Simulation, shooters:list):
+    for ship in shooters:
+        ship.fire_guns()
+    simulation.step()
+
+
+def percentile(samples:list, point:float) -> float:
+    return samples[round((len(samples) - 1) * point / 100)]
+
+
+def run(name:str, steps:int, warmup:int) -> dict:
+    profiler = Profiler(window=steps, enabled=True)
+    simulation, shooters = make(name, profiler)
+    for _ in range(warmup):
+        step(simulation, shooters)
+    profiler.reset()
+
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    for _ in range(steps):
+        before = clock()
+        step(simulation, shooters)
+        latencies.append(clock() - before)
+    elapsed = clock() - start
+    latencies.sort()
+
+    # separate pass over the same steps, tracemalloc would skew the timings
+    tracemalloc.start()
+    simulation, shooters = make(name)
+    for _ in range(warmup + steps):
+        step(simulation, shooters)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = profiler.summary()
+    return {
+        "steps_per_sec": steps / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_mb": peak / 2**20,
+        "subsystems_p50_ms": {scope: stats["p50"] for scope, stats in summary.items()},
+        "machine": platform.node(),
+    }
+
+
+def regressions(result:dict, baseline:dict, tolerance:float, tail_tolerance:float) -> list:
+    problems = []
+    if result["steps_per_sec"] < baseline["steps_per_sec"] * (1 - tolerance):
+        problems.append(f"steps/s {result['steps_per_sec']:.0f} < baseline {baseline['steps_per_sec']:.0f}")
+    for key, allowed in (("p50_ms", tolerance), ("p95_ms", tail_tolerance), ("p99_ms", tail_tolerance), ("peak_mb", tolerance)):
+        if result[key] > baseline[key] * (1 + allowed):
+            problems.append(f"{key} {result[key]:.3f} > baseline {baseline[key]:.3f}")
+    # per subsystem, so a slower scene update or physics step is named even when the total hides it
+    for scope, before in baseline.get("subsystems_p50_ms", {}).items():
+        after = result["subsystems_p50_ms"].get(scope, 0.0)
+        if after > max(before, SUBSYSTEM_FLOOR_MS) * (1 + tolerance):
+            problems.append(f"{scope} p50 {after:.3f} ms > baseline {before:.3f} ms")
+    return problems
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="headless scenario benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)}, all by default")
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=120)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--tail-tolerance", type=float, default=1.0, help="allowed p95 and p99 slowdown as a fraction of the baseline")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--record", "--save", dest="record", action="store_true", help="store the results as this machine's baselines")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(unknown)}")
+    scenarios = args.scenarios or list(SCENARIOS)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as file:
+            baselines = json.load(file)
+
+    failed = False
+    for name in scenarios:
+        result = run(name, args.steps, args.warmup)
+        print(f"{name:<18} {result['steps_per_sec']:8.0f} steps/s  p50 {result['p50_ms']:6.2f}  "
+              f"p95 {result['p95_ms']:6.2f}  p99 {result['p99_ms']:6.2f} ms  peak {result['peak_mb']:6.1f} MB")
+        if args.record:
+            baselines[name] = result
+        elif name not in baselines:
+            # a missing baseline would let any regression through
+            print("    MISSING baseline, run with --record to record one")
+            failed = True
+        elif baselines[name].get("machine") != result["machine"]:
+            # another machine's timings say nothing about this one
+            print(f"    MISSING baseline for this machine, {name} was recorded on {baselines[name].get('machine')!r}, "
+                  f"run with --record to record one")
+            failed = True
+        else:
+            for problem in regressions(result, baselines[name], args.tolerance, args.tail_tolerance):
+                print(f"    REGRESSION {problem}")
+                failed = True
+
+    if args.record:
+        with open(args.baselines, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
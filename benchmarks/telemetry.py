@@ -0,0 +1,62 @@
+"""Per tick cost of recording telemetry.
+
+run with: python -m benchmarks.telemetry [scenario ...]
+
+runs suite scenarios with and without a TelemetrySink attached and reports the telemetry
+scope's p50 against the step's and against a 60 fps frame, plus what the session wrote
+"""
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.suite import make, step, percentile
+from game.profiler import Profiler
+from game.telemetry import TelemetryReader
+
+STEPS = 600
+WARMUP = 60
+FRAME_MS = 1000 / 60
+
+
+def run(name:str, path:str = None) -> tuple:
+    profiler = Profiler(window=STEPS, enabled=True)
+    simulation, shooters = make(name, profiler)
+    if path is not None:
+        simulation.start_telemetry(path)
+    for _ in range(WARMUP):
+        step(simulation, shooters)
+    profiler.reset()
+
+    latencies = []
+    clock = time.perf_counter
+    for _ in range(STEPS):
+        before = clock()
+        step(simulation, shooters)
+        latencies.append(clock() - before)
+    simulation.stop_telemetry()
+    latencies.sort()
+    scope = profiler.summary().get("telemetry", {"p50": 0.0})
+    return percentile(latencies, 50) * 1000, scope["p50"]
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="telemetry overhead benchmark")
+    parser.add_argument("scenarios", nargs="*", default=["fleet_500", "bullet_storm_50"])
+    args = parser.parse_args(argv)
+
+    for name in args.scenarios:
+        with tempfile.TemporaryDirectory() as path:
+            off, _ = run(name)
+            on, record = run(name, path)
+            reader = TelemetryReader(path)
+            size = sum(os.path.getsize(os.path.join(path, file)) for file in os.listdir(path))
+            print(f"{name}")
+            print(f"  step p50  off {off:6.2f} ms  on {on:6.2f} ms")
+            print(f"  record p50 {record:6.3f} ms  ({record / on * 100:.1f}% of the step, "
+                  f"{record / FRAME_MS * 100:.2f}% of a {FRAME_MS:.1f} ms frame)")
+            print(f"  {len(reader.frames)} frames  {len(reader.ships)} ship rows  {len(reader.events)} events  "
+                  f"{size / 2**10:.0f} KiB on disk  {reader.meta['dropped_ticks']} dropped")
+
+
+if __name__ == '__main__':
+    main()
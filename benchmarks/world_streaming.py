@@ -0,0 +1,66 @@
+"""Live world size, step time and memory as the player flies away from the start.
+
+run with: python -m benchmarks.world_streaming [--distance 200000] [--directory dir]
+
+moves the player in a straight line at SPEED units a step and prints, every CHECKPOINT
+units, the AI ships and physics bodies alive, the store's entity count, the p50 step over
+the last stretch, python heap in use (tracemalloc, after a gc so destroyed ships still waiting
+to be collected don't count), the chunks stashed to disk so far and the empty ones only
+remembered by key. once with chunks unloading behind the player and once keeping every chunk
+it passed loaded, which is what one pymunk space holding everything forever looks like.
+tracemalloc slows both runs alike
+"""
+import argparse
+import gc
+import math
+import tracemalloc
+import time
+from game.simulation import Simulation
+from game.world import ChunkManager
+
+SPEED = 100
+CHECKPOINT = 25_000
+
+
+def run(distance:float, unload_radius:float, directory:str):
+    simulation = Simulation(headless=True, seed=1, fast_bullets=True)
+    simulation.setup()
+    simulation.world = ChunkManager(simulation, simulation.seed, unload_radius=unload_radius, directory=directory)
+    simulation.world.update(*simulation.player_sprite.position)
+    body = simulation.player_sprite.physics_object.body
+    tracemalloc.start()
+    times = []
+    travelled = 0
+    while travelled < distance:
+        travelled += SPEED
+        body.position = (500 + travelled, 0)
+        body.velocity = (SPEED / simulation.delta_time, 0)
+        start = time.perf_counter()
+        simulation.step()
+        times.append(time.perf_counter() - start)
+        if travelled % CHECKPOINT == 0:
+            times.sort()
+            gc.collect()
+            world = simulation.world.stats
+            print(f"  {travelled:7d} units  {len(simulation.scene['Ai_list']):5d} ships  {len(simulation.physics_engine.sprites):5d} bodies  "
+                  f"{len(simulation.entities):5d} entities  step p50 {times[len(times) // 2] * 1000:6.2f} ms  "
+                  f"heap {tracemalloc.get_traced_memory()[0] / 2**20:6.1f} MiB  {world['stashed']:4d} chunks stashed ({world['stashed_bytes'] / 1024:.0f} KiB) {world['visited']:4d} empty")
+            times = []
+    tracemalloc.stop()
+    simulation.stop_world()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="world streaming benchmark")
+    parser.add_argument("--distance", type=int, default=200_000)
+    parser.add_argument("--directory", help="make the chunk stash directory under this one instead of the system temp directory")
+    args = parser.parse_args(argv)
+
+    print("unloading behind the player")
+    run(args.distance, 2, args.directory)
+    print("keeping every chunk loaded")
+    run(args.distance, math.inf, None)
+
+
+if __name__ == '__main__':
+    main()
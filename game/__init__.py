@@ -1,19 +1,23 @@
 import math
+import time
+import argparse
 import arcade
-from typing import Optional
-from arcade.experimental.crt_filter import CRTFilter
-from arcade.pymunk_physics_engine import PymunkPhysicsEngine
 from . import entitys
+from .simulation import Simulation
+from .profiler import Profiler
+from .hud import Hud
+from .postprocess import PostProcess
+from .culling import Culler
+from .render import ParticleRenderer
+from .effects import make_particles
+from .input import InputMap, STEP_ACTIONS
 from game.constants import *
-import random
 
 SCREEN_TITLE = "IHOWL"
 
 # Size of screen to show, in pixels
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-SPRITE_SCALING = 1
-GUI_SCALING = 0.5
 IMAGE_ROTATION = -90
 
 
@@ -26,30 +30,39 @@ class GameWindow(arcade.Window):
 
     #constructor
     #this creates the window using the given dimensions
-    def __init__(self, width, height, title):
+    def __init__(self, width, height, title, replay:str = None):
         
         super().__init__(width, height, title)
-        # Track controls 
-        self.mouse_raw_x = 0
-        self.mouse_raw_y = 0
+        # Track controls, events become commands for the fixed step
+        self.input = InputMap()
         self.set_mouse_visible(False)
-        self.thrust_pressed = False
-        self.fire_pressed = False
-        self.time_since_last_fire = 0
-        self.scene = None
         self.debug = False
         self.background = None
-        # Physics engine
-        self.physics_engine: Optional[arcade.PymunkPhysicsEngine] = None
-
-        # Create the crt filter
-        self.crt_filter = CRTFilter(width, height,
-                                    resolution_down_scale=1.0,
-                                    hard_scan=-8.0,
-                                    hard_pix=-3.0,
-                                    display_warp = (1.0 / 32.0, 1.0 / 24.0),
-                                    mask_dark=0.5,
-                                    mask_light=1.5)
+        # Named timings for the debug overlay and trace export
+        self.profiler = Profiler()
+        # Game logic, stepped at a fixed rate and rendered in between
+        if replay is not None:
+            self.sim = Simulation.from_replay(replay, profiler=self.profiler)
+        else:
+            self.sim = Simulation(profiler=self.profiler, streaming=WORLD_STREAMING)
+        self.accumulator = 0
+        self.alpha = 0
+        # projectiles are drawn straight from their arrays in one instanced call instead of as sprites
+        self.particles = ParticleRenderer(self.ctx)
+        self.hidden_lists = ("bullet_list",) if self.sim.fast_bullets else ()
+        # thrust, muzzle flash, hit and explosion particles, moved on the gpu when it can
+        self.effects = make_particles(self.ctx, self.particles)
+        # only what is near the camera gets interpolated and drawn
+        self.culler = Culler(lists=tuple(name for name in Culler.CULLED_LISTS if name not in self.hidden_lists))
+
+        # Create the crt filter, it drops its internal resolution when the gpu can't keep up
+        self.post = PostProcess(self,
+                                mode="crt",
+                                hard_scan=-8.0,
+                                hard_pix=-3.0,
+                                display_warp = (1.0 / 32.0, 1.0 / 24.0),
+                                mask_dark=0.5,
+                                mask_light=1.5)
     
     #setup method
     #loads the camera, physics and game assets before running the game
@@ -58,90 +71,67 @@ class GameWindow(arcade.Window):
         # cameras
         self.camera = arcade.Camera(self.width, self.height)
         #self.background = arcade.load_texture("assets/images/background.png")
-         
 
-        self.physics_engine = PymunkPhysicsEngine(damping=DEFAULT_DAMPING,
-                                                  gravity=GRAVITY)
 
-
-        self.scene = arcade.Scene()
-
-        self.scene.add_sprite_list("player_list")
-        self.scene.add_sprite_list("pointer_list")
-        self.scene.add_sprite_list("ships_list")
-        self.scene.add_sprite_list("bullet_list")
-        self.scene.add_sprite_list("Ai_list")
-
-
-        
-        # Set up the pointer 
-        self.pointer_sprite = entitys.Pointer("assets/images/pointer.png", GUI_SCALING)
-        self.mini_pointer = entitys.Pointer("assets/images/minipointer.png", GUI_SCALING)
-        
-        self.scene.add_sprite("pointer_list", self.pointer_sprite)
-        self.scene.add_sprite("pointer_list", self.mini_pointer)
-        
-        # Set up the player
-        self.player_sprite = entitys.ship("assets/images/ship.png", SPRITE_SCALING, scene=self.scene, physicsEngine=self.physics_engine, max_vel=PLAYER_MAX_SPEED, mass=PLAYER_MASS,moment=PLAYER_MOMENT, cooldown=PLAYER_GUN_COOLDOWN, list="player_list", collision_type="player", target=self.pointer_sprite)
-        self.player_sprite.physics_object.body._set_position((500, 0))
-        # debug cargo ship
-        self.cargodebug = entitys.ship("assets/images/cargo_base.png",  SPRITE_SCALING, scene=self.scene, physicsEngine=self.physics_engine, max_vel=CARGO_MAX_SPEED, mass=CARGO_MASS,moment=CARGO_MOMENT, cooldown=CARGO_GUN_COOLDOWN, list="Ai_list", collision_type="cargoship", targetcoord=(0, 0))
-
-        # Set up bullets
-        """ Find a way to make bullets not collide instead of doing this """
-        def bulletxplayerbullet_hit_handler(bullet_sprite, bullet_sprite_2, _arbiter, _space, _data):
-                bullet_sprite.kill()
-                bullet_sprite_2.kill()
-        self.physics_engine.add_collision_handler("bullet", "playerbullet", post_handler=bulletxplayerbullet_hit_handler)
-        # Set up Cargoships 
-        def bulletxcargo_hit_handler(bullet_sprite:entitys.Bullet, cargo_sprite:entitys.CargoShip_base, _arbiter, _space, _data):
-            cargo_sprite.damage(bullet_sprite.health) 
-            bullet_sprite.kill()
-        self.physics_engine.add_collision_handler("bullet", "cargoship", post_handler=bulletxcargo_hit_handler)
+        self.sim.setup()
+        # shortcuts to what the window draws and steers
+        self.scene = self.sim.scene
+        self.player_sprite = self.sim.player_sprite
+        self.pointer_sprite = self.sim.pointer_sprite
+        self.mini_pointer = self.sim.mini_pointer
+
+        # text, laid out once and redrawn from batches
+        self.hud = Hud(self)
+        self.hud.add("steer", "instructions", 10, 90, "use your mouse to steer the ship")
+        self.hud.add("thrust", "instructions", 10, 70, "hold right click to move forward")
+        self.hud.add("shoot", "instructions", 10, 50, "hold left click to Shoot")
+        for name in ("distance", "pangle", "tangle", "fps", "post", "ai", "world"):
+            self.hud.add(name, "debug", 0, 0, color=arcade.color.RED)
     
     #on update method
-    #runs the game and takes care of player input and physics
+    #takes care of player input and runs as many fixed simulation steps as the frame time covers
     def on_update(self, delta_time):
         """ Movement and game logic """
 
-        # Update pointer
-        self.pointer_sprite.update((self.mouse_raw_x, self.mouse_raw_y), (self.player_sprite.center_x, self.player_sprite.center_y), self.camera)
-        self.mini_pointer.update_mini(self.player_sprite.position, self.player_sprite.physics_object.body.angle, self.player_sprite.distance_to_target)
-    
-        # Apply acceleration
-        if self.thrust_pressed:
-            thrust_amout = self.player_sprite.distance_to_target
-            print(thrust_amout)
-            thrust_amout = math.log(thrust_amout)
-            self.player_sprite.thrust(PLAYER_MOVE_FORCE*thrust_amout)
-
-        self.scene.on_update(delta_time, ["bullet_list", "Ai_list", "player_list"])
-
-
-        if self.fire_pressed:
-            self.player_sprite.fire_guns()
-            
-        for sprite in self.scene.name_mapping['Ai_list']:
-            sprite:entitys.ship
-            if sprite.distance_to_target <= 20: #check if the Ai ship is within 20 units of its old target
-                player_x = self.player_sprite.center_x
-                player_y = self.player_sprite.center_y
-
-                #make a new target based thats within 500 units of the players pos 
-                target = (random.uniform(player_x - 500, player_x + 500),
-                               random.uniform(player_y - 500, player_y + 500))
-                sprite.change_target(target)
-            if abs(sprite.pid_output) <= 10: # if the Ai ship is not correcting its rotation by a large amount, apply thrust
-                sprite.thrust(CARGO_MOVE_FORCE)
-
-        # Step the engine 
-        self.physics_engine.step()
-
-        
-
-        
-        # Center camera
-        self.center_camera_to_player()
+        # Update pointer, a replay moves it by itself
+        with self.profiler.scope("pointer"):
+            if self.sim.playback is None:
+                self.pointer_sprite.update(self.input.mouse, (self.player_sprite.center_x, self.player_sprite.center_y), self.camera)
+            self.mini_pointer.update_mini(self.player_sprite.position, self.player_sprite.physics_object.body.angle, self.player_sprite.distance_to_target)
+
+        # a long hitch would otherwise make the simulation try to catch up forever
+        self.accumulator += min(delta_time, MAX_FRAME_TIME)
+        # the steps below catch up to now, each one takes the commands issued before it ends
+        step_end = self.input.clock() - self.accumulator + self.sim.delta_time
+        while self.accumulator >= self.sim.delta_time:
+            if self.sim.playback is not None and self.sim.playback.finished(self.sim.tick):
+                self.finish_replay()
+                break
+            if self.sim.playback is None:
+                self.input.apply(self.sim, step_end)
+            with self.profiler.scope("step"):
+                self.sim.step()
+            self.accumulator -= self.sim.delta_time
+            step_end += self.sim.delta_time
+        self.alpha = self.accumulator / self.sim.delta_time
+
+        # particles are only looks, they move once a frame by the frame's time
+        with self.profiler.scope("effects"):
+            self.effects.emit(self.sim.effects.drain())
+            self.effects.update(delta_time)
+
+        self.post.update(delta_time)
+
+    #replay method
+    #reports whether the replay ended where the recording did, then hands control back to the player
+    def finish_replay(self):
+        playback = self.sim.playback
+        self.sim.playback = None
+        if playback.digest is not None:
+            if self.sim.digest() == playback.digest:
+                print(f"replay matched the recording at tick {self.sim.tick}")
+            else:
+                print(f"replay DIVERGED from the recording at tick {self.sim.tick}")
 
     #camera method
     #centers the camera on the player at all times
@@ -158,70 +148,87 @@ class GameWindow(arcade.Window):
     #also applies any visual effects invoked such as the CRT filter
     def on_draw(self):
         
+        # Draw the sprites part way between the last two simulation steps
+        with self.profiler.scope("cull"):
+            if self.culler.enabled:
+                on_screen = self.culler.update(self.sim, self.player_sprite.center_x, self.player_sprite.center_y,
+                                               self.camera.viewport_width, self.camera.viewport_height)
+            else:
+                on_screen = None
+            self.sim.interpolate(self.alpha, on_screen, projectiles=not self.sim.fast_bullets)
+        self.center_camera_to_player()
+
         # Draw our stuff into the CRT filter
-        self.crt_filter.use()
-        self.crt_filter.clear()
-        self.camera.use()
-        self.scene.draw()
+        self.post.begin(self.camera)
+        with self.profiler.scope("draw"):
+            if self.culler.enabled:
+                self.culler.draw(self.scene, skip=self.hidden_lists)
+            else:
+                self.scene.draw(names=[name for name in self.scene.name_mapping if name not in self.hidden_lists])
+            if self.sim.fast_bullets:
+                self.sim.bullet_pool.render(self.particles, self.alpha)
+                self.particles.draw()
+            self.effects.draw()
        #arcade.draw_lrwh_rectangle_textured(0, 0,
         #                                    SCREEN_WIDTH, SCREEN_HEIGHT,
         #                                    self.background)
-        arcade.draw_text("use your mouse to steer the ship", 10, 90, arcade.color.WHITE)
-        arcade.draw_text("hold right click to move forward", 10, 70, arcade.color.WHITE)
-        arcade.draw_text("hold left click to Shoot", 10, 50, arcade.color.WHITE)
+        self.hud.draw("instructions")
             # Switch back to our window and draw the CRT filter do
             # draw its stuff to the screen
-        self.use()
-        self.clear()
-
-        self.crt_filter.draw()
+        with self.profiler.scope("crt"):
+            self.post.end()
+        self.sim.restore()
 
         if self.debug:
-           arcade.draw_text(arcade.get_distance(self.player_sprite.center_x, self.player_sprite.center_y, 0, 0), self.pointer_sprite.center_x, self.pointer_sprite.center_y - 50, arcade.color.RED)
-           #arcade.draw_text(self.player_sprite.pid_output, self.pointer_sprite.center_x, self.pointer_sprite.center_y - 50, arcade.color.RED)
-           #arcade.draw_text(f"x {self.pointer_sprite.center_x}", self.pointer_sprite.center_x, self.pointer_sprite.center_y - 100, arcade.color.RED)
-           #arcade.draw_text(f"y {self.pointer_sprite.center_y}", self.pointer_sprite.center_x, self.pointer_sprite.center_y - 150, arcade.color.RED)
            pangle = self.player_sprite.physics_object.body.angle
            tangle = self.player_sprite.target_angle
-           arcade.draw_text(round(pangle, 4), self.pointer_sprite.center_x, self.pointer_sprite.center_y - 100, arcade.color.RED)
-           arcade.draw_text(round(tangle, 4), self.pointer_sprite.center_x, self.pointer_sprite.center_y - 150, arcade.color.RED)
+           pointer_x = self.pointer_sprite.center_x
+           pointer_y = self.pointer_sprite.center_y
+           # values are rounded so the labels only re-lay-out when the shown text changes
+           self.hud.set("distance", str(round(arcade.get_distance(self.player_sprite.center_x, self.player_sprite.center_y, 0, 0))), pointer_x, pointer_y - 50)
+           self.hud.set("pangle", str(round(pangle, 2)), pointer_x, pointer_y - 100)
+           self.hud.set("tangle", str(round(tangle, 2)), pointer_x, pointer_y - 150)
+           self.hud.set("fps", str(round(arcade.get_fps())), pointer_x, pointer_y + 50)
+           self.hud.set("post", f"{self.post.mode} 1/{self.post.scale:g} gpu {self.post.gpu_time_ms:.1f}ms", 10, self.height - 20)
+           ai = self.sim.ai.stats
+           self.hud.set("ai", f"ai {ai['decisions']}/step round {ai['round_steps']} steps overruns {ai['overruns']}", 10, self.height - 40)
+           if self.sim.world is not None:
+               world = self.sim.world.stats
+               self.hud.set("world", f"chunks {world['loaded']} loaded {world['stashed']} stashed", 10, self.height - 60)
            arcade.draw_line(self.player_sprite.center_x, self.player_sprite.center_y, self.player_sprite.center_x+50*math.cos(pangle), self.player_sprite.center_y+50*math.sin(pangle), arcade.color.RED)
            arcade.draw_line(self.player_sprite.center_x, self.player_sprite.center_y, self.player_sprite.center_x+200*math.cos(tangle), self.player_sprite.center_y+200*math.sin(tangle), arcade.color.RED)
            arcade.draw_line(self.player_sprite.center_x, self.player_sprite.center_y, self.player_sprite.center_x+200*math.cos(math.pi), self.player_sprite.center_y+200*math.sin(math.pi), arcade.color.RED)
-           arcade.draw_text(arcade.get_fps(), self.pointer_sprite.center_x, self.pointer_sprite.center_y + 50, arcade.color.RED)
+
+           self.profiler.draw_overlay(self.width - 260, self.height - 10, hud=self.hud)
+           self.hud.draw("debug")
+           self.hud.draw("profiler")
 
     #method invoked when mouse is moved
     #points the spaceship in the direction of the mouse cursor
     def on_mouse_motion(self, x, y, delta_x, delta_y):
         """Called whenever the mouse moves. """
-        self.mouse_raw_x = x
-        self.mouse_raw_y = y
+        self.input.move(x, y)
     
     #method invoked when mouse is pressed
-    #when left mouse is pressed, fire projectiles
-    #when right mouse is pressed, apply thrust to ship
+    #queues whatever the button is bound to, by default left fires and right thrusts
     def on_mouse_press(self, x, y, button, modifiers):
         """Called whenever a key is pressed. """
+        if self.sim.playback is None:
+            self.input.press("mouse", button)
 
-        if button == arcade.MOUSE_BUTTON_LEFT:
-            self.fire_pressed = True
-        elif button == arcade.MOUSE_BUTTON_RIGHT:
-            self.thrust_pressed = True
-
-    #method invoked when mouse is not pressed
-    #when left mouse is not pressed or when is released, stop firing
-    #when right mouse is not pressed or when is released, stop applying thrust
+    #method invoked when mouse is released
+    #queues the end of whatever the button is bound to
     def on_mouse_release(self, x, y, button, modifiers):
         """Called when the user releases a key. """
-
-        if button == arcade.MOUSE_BUTTON_LEFT:
-            self.fire_pressed = False
-        elif button == arcade.MOUSE_BUTTON_RIGHT:
-            self.thrust_pressed = False
+        if self.sim.playback is None:
+            self.input.release("mouse", button)
 
     def on_key_press(self, symbol: int, modifiers: int):
-        if symbol == 65470:
-            print(self.debug)
+        action = self.input.action_for("key", symbol)
+        if action in STEP_ACTIONS:
+            if self.sim.playback is None:
+                self.input.press("key", symbol)
+        elif action == "toggle_debug":
             if self.debug:   
                 self.debug = False
                 arcade.clear_timings()
@@ -229,17 +236,55 @@ class GameWindow(arcade.Window):
             else:
                 arcade.enable_timings()
                 self.debug = True
+            self.profiler.enabled = self.debug or self.profiler.recording
+        elif action == "cycle_post":
+            # crt -> cheap upscale -> no post processing
+            self.post.cycle_mode()
+        elif action == "toggle_culling":
+            # compare against drawing the whole world
+            self.culler.enabled = not self.culler.enabled
+            self.culler.reset()
+        elif action == "record_profile":
+            # start a trace, pressing again writes it out
+            if self.profiler.recording:
+                self.profiler.stop_recording()
+                self.profiler.enabled = self.debug
+                self.profiler.export(time.strftime("profile-%Y%m%d-%H%M%S"))
+            else:
+                self.profiler.start_recording()
         return super().on_key_press(symbol, modifiers)
 
+    def on_key_release(self, symbol: int, modifiers: int):
+        if self.sim.playback is None:
+            self.input.release("key", symbol)
+        return super().on_key_release(symbol, modifiers)
+
+    def on_close(self):
+        # finish the replay file so it can be played back
+        self.sim.stop_recording()
+        self.sim.stop_telemetry()
+        self.sim.stop_world()
+        return super().on_close()
+
     
 
 #main function, entry point
-def main():
+def main(argv = None):
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--record", help="record a replay of this session to a file")
+    parser.add_argument("--replay", help="play back a recorded session")
+    parser.add_argument("--telemetry", help="stream per tick telemetry of this session into a directory")
+    args = parser.parse_args(argv)
+
     #initialise a game window
-    window = GameWindow(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    window = GameWindow(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, replay=args.replay)
     
     #run the setup
     window.setup()
+    if args.record is not None:
+        window.sim.start_recording(args.record)
+    if args.telemetry is not None:
+        window.sim.start_telemetry(args.telemetry)
 
     #runs the main loop
     #always initialise the window, run the setup before invoking run()
@@ -0,0 +1,48 @@
+from game.constants import *
+
+#ai behaviour
+#the decisions an AI cargo ship makes, asked of a SpatialHash of every ship around it instead of
+#distances worked out ship by ship. the game and the shard workers both decide with these, so a
+#ship acts the same wherever it is simulated
+
+
+def arrived(ships, ship) -> bool:
+    """Ship is within AI_ARRIVE_DISTANCE of its target point, a radius query around the point"""
+    x, y = ship.targetcoord
+    return ship in ships.query_radius(x, y, AI_ARRIVE_DISTANCE)
+
+
+def retarget(ships, ship, focus:tuple, rng, world = None):
+    """A ship that reached its target gets a new one within AI_RETARGET_RANGE of focus, the player in the game
+
+    ships a world chunk generated patrol that chunk instead, so they stay where it unloads them
+    """
+    if not arrived(ships, ship):
+        return
+    if ship.home is not None:
+        left, bottom, right, top = world.bounds(ship.home)
+    else:
+        x, y = focus
+        left, bottom = x - AI_RETARGET_RANGE, y - AI_RETARGET_RANGE
+        right, top = x + AI_RETARGET_RANGE, y + AI_RETARGET_RANGE
+    ship.change_target(pick_target(ships, ship, left, bottom, right, top, rng))
+
+
+def pick_target(ships, ship, left:float, bottom:float, right:float, top:float, rng) -> tuple:
+    """A random point in the box for ship to head to next
+
+    of up to AI_RETARGET_TRIES draws it takes the first with no other ship within AI_SPACING, or
+    the one furthest from its nearest ship, so ships don't all pile onto one spot
+    """
+    best = None
+    best_distance = -1.0
+    for _ in range(AI_RETARGET_TRIES):
+        x, y = rng.uniform(left, right), rng.uniform(bottom, top)
+        near = ships.nearest(x, y, 1, max_radius=AI_SPACING, exclude=ship)
+        if not near:
+            return (x, y)
+        other_x, other_y = ships.position(near[0])
+        distance = (other_x - x) ** 2 + (other_y - y) ** 2
+        if distance > best_distance:
+            best, best_distance = (x, y), distance
+    return best
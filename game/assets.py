@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import arcade
+from game.constants import *
+
+# ships are drawn pointing up, flipping them like this makes them face +x like their bodies
+SHIP_ORIENTATION = dict(flipped_diagonally=True, flipped_horizontally=True)
+
+_solid_textures = {}
+
+def solid_texture(width:int, height:int, color) -> arcade.Texture:
+    """One shared texture per size and colour instead of one per sprite"""
+    key = (width, height, tuple(color))
+    texture = _solid_textures.get(key)
+    if texture is None:
+        texture = _solid_textures[key] = arcade.Texture.create_filled(f"Solid-{key}", (width, height), color)
+    return texture
+
+
+#hit box cache
+#arcade scans a texture's pixels for its hit box the first time a sprite uses it. the points only
+#depend on the image, the flips and the algorithm, so they are kept in a json file keyed by those
+#and a texture that was ever scanned before gets its points without touching the pixels.
+#the points are in texture space, sprites scale them themselves so the scale isn't part of the key
+class HitBoxCache:
+
+    VERSION = 1
+
+    def __init__(self, path:str = HIT_BOX_CACHE):
+        self.path = path
+        self.entries = None # key -> points, read on first use
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(digest:str, flips:tuple, algorithm:str, detail:float) -> str:
+        return f"{digest}:{''.join(str(int(flip)) for flip in flips)}:{algorithm}:{detail}"
+
+    def _read(self):
+        self.entries = {}
+        try:
+            with open(self.path) as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return
+        # another arcade version may trace the outlines differently
+        if cache.get("version") == self.VERSION and cache.get("arcade") == arcade.version.VERSION:
+            self.entries = cache["hit_boxes"]
+
+    def apply(self, texture:arcade.Texture, digest:str, flips:tuple):
+        """Give texture its hit box from the cache, scanning it and adding it on a miss"""
+        if texture._hit_box_points is not None:
+            return
+        if self.entries is None:
+            self._read()
+        key = self.key(digest, flips, texture._hit_box_algorithm, texture._hit_box_detail)
+        points = self.entries.get(key)
+        if points is not None:
+            self.hits += 1
+            texture._hit_box_points = tuple(tuple(point) for point in points)
+            return
+        self.misses += 1
+        self.entries[key] = [list(point) for point in texture.hit_box_points]
+        self.dirty = True
+
+    def save(self):
+        """Write the file if anything was added, a read only install just keeps scanning"""
+        if not self.dirty:
+            return
+        cache = {"version": self.VERSION, "arcade": arcade.version.VERSION, "hit_boxes": self.entries}
+        temp = self.path + ".tmp"
+        try:
+            with open(temp, "w") as file:
+                json.dump(cache, file)
+            os.replace(temp, self.path)
+        except OSError:
+            return
+        self.dirty = False
+
+
+# shared by every registry in the process
+HIT_BOXES = HitBoxCache()
+
+
+#asset registry
+#loads every image once at startup and puts them all in one texture atlas,
+#entities are then built from the cached textures so spawning reads nothing from disk
+class AssetRegistry:
+
+    def __init__(self, directory:str = "assets/images", hit_boxes:HitBoxCache = HIT_BOXES):
+        self.directory = directory
+        self.paths = {} # name -> file
+        self.digests = {} # name -> hash of the file's contents
+        self.textures = {} # (name, flipped_horizontally, flipped_vertically, flipped_diagonally) -> texture
+        self.hit_boxes = hit_boxes
+        self.atlas = None
+
+    def load(self, ctx = None):
+        """Load every image in the directory, ctx given means upload them to its default atlas now"""
+        for filename in sorted(os.listdir(self.directory)):
+            name, extension = os.path.splitext(filename)
+            if extension.lower() not in IMAGE_EXTENSIONS:
+                continue
+            self.paths[name] = os.path.join(self.directory, filename)
+            self.texture(name)
+            self.texture(name, **SHIP_ORIENTATION)
+        for width, height, color in PRELOAD_SOLID_TEXTURES:
+            solid_texture(width, height, color)
+        if self.hit_boxes is not None:
+            self.hit_boxes.save()
+
+        # every sprite list draws from the context's default atlas, filling it up front means no uploads mid game
+        if ctx is not None:
+            self.atlas = ctx.default_atlas
+            for texture in self.all_textures():
+                self.atlas.add(texture)
+
+    def all_textures(self):
+        yield from self.textures.values()
+        yield from _solid_textures.values()
+
+    def digest(self, name:str) -> str:
+        digest = self.digests.get(name)
+        if digest is None:
+            with open(self.paths[name], "rb") as file:
+                digest = self.digests[name] = hashlib.sha1(file.read()).hexdigest()
+        return digest
+
+    def texture(self, name:str, flipped_horizontally:bool = False, flipped_vertically:bool = False, flipped_diagonally:bool = False) -> arcade.Texture:
+        key = (name, flipped_horizontally, flipped_vertically, flipped_diagonally)
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = self.textures[key] = arcade.load_texture(self.paths[name],
+                                                               flipped_horizontally=flipped_horizontally,
+                                                               flipped_vertically=flipped_vertically,
+                                                               flipped_diagonally=flipped_diagonally)
+            if self.hit_boxes is not None:
+                self.hit_boxes.apply(texture, self.digest(name), key[1:])
+            if self.atlas is not None:
+                self.atlas.add(texture)
+        return texture
+
+    def ship_texture(self, name:str) -> arcade.Texture:
+        return self.texture(name, **SHIP_ORIENTATION)
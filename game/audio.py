@@ -0,0 +1,78 @@
+import os
+import arcade
+from pyglet.util import DecodeException
+from collections import deque
+from game.constants import *
+
+#sound handle
+#one per asset, shared by everything that plays it
+#caps how many copies can play at once by stopping the oldest voice
+class SoundHandle:
+
+    def __init__(self, sound:arcade.Sound = None, max_voices:int = SOUND_MAX_VOICES):
+        self.sound = sound
+        self.max_voices = max_voices
+        self.voices = deque()
+        self.steals = 0
+
+    def play(self, volume:float = 1.0, pan:float = 0.0):
+        if self.sound is None:
+            return None
+
+        # forget voices that already finished on their own
+        while self.voices and not self._is_playing(self.voices[0]):
+            self.voices.popleft()
+
+        if len(self.voices) >= self.max_voices:
+            self.sound.stop(self.voices.popleft())
+            self.steals += 1
+
+        voice = self.sound.play(volume=volume, pan=pan)
+        self.voices.append(voice)
+        return voice
+
+    def stop_all(self):
+        while self.voices:
+            voice = self.voices.popleft()
+            if self._is_playing(voice):
+                self.sound.stop(voice)
+
+    def _is_playing(self, voice) -> bool:
+        return voice.source is not None and self.sound.is_playing(voice)
+
+
+#sound manager
+#decodes every asset in the sfx folder once so nothing touches the disk while playing
+class SoundManager:
+
+    def __init__(self, directory:str = "assets/sfx", max_voices:int = SOUND_MAX_VOICES, enabled:bool = SOUND_ENABLED):
+        self.directory = directory
+        self.max_voices = max_voices
+        self.enabled = enabled
+        self.sounds = {}
+        # handed out for every name while disabled, so callers never need to check
+        self.silent = SoundHandle()
+
+    def load(self):
+        """Load and fully decode every sound in the directory"""
+        if not self.enabled:
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            name, extension = os.path.splitext(filename)
+            if extension.lower() not in SOUND_EXTENSIONS:
+                continue
+            # streaming=False makes pyglet decode the whole file to PCM up front
+            try:
+                sound = arcade.Sound(os.path.join(self.directory, filename), streaming=False)
+            except DecodeException as error:
+                # no decoder for the format (e.g. mp3 without ffmpeg), the game runs on without that sound
+                print(f"sound {name} unavailable: {error}")
+                continue
+            self.sounds[name] = SoundHandle(sound, self.max_voices)
+
+    def get(self, name:str) -> SoundHandle:
+        return self.sounds.get(name, self.silent) if self.enabled else self.silent
+
+    def stop_all(self):
+        for handle in self.sounds.values():
+            handle.stop_all()
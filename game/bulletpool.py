@@ -0,0 +1,175 @@
+import arcade
+import numpy as np
+import pymunk
+from arcade.pymunk_physics_engine import PymunkPhysicsEngine
+from . import entitys
+from .components import DEFAULT_STORE
+from game.constants import *
+
+#shape filter given to parked bullets so the broadphase never pairs them with anything
+INACTIVE_FILTER = pymunk.ShapeFilter(categories=0, mask=0)
+
+#bullet pool
+#preallocates bullets and their pymunk bodies and recycles them instead of
+#building a new sprite + body for every shot
+class BulletPool:
+
+    def __init__(self,
+                    scene:arcade.Scene,
+                    physicsEngine:PymunkPhysicsEngine,
+                    size:int = BULLET_POOL_SIZE,
+                    cap:int = BULLET_POOL_CAP,
+                    width:int = 20,
+                    height:int = 5,
+                    color = arcade.color.WHITE_SMOKE,
+                    entities = None):
+
+        self.scene = scene
+        self.physics_engine = physicsEngine
+        self.cap = max(cap, size)
+        self.width = width
+        self.height = height
+        self.color = color
+        self.entities = entities if entities is not None else DEFAULT_STORE
+
+        self.bullets = []
+        self.free = []
+        #dicts keep insertion order, so the first key is always the oldest live bullet
+        self.live = {}
+        #parked bullets the physics engine still lists, dropped from it together by flush()
+        self.leaving = set()
+
+        # counters
+        self.hits = 0 #acquire served from the free list
+        self.misses = 0 #acquire had to allocate a new bullet
+        self.reuses = 0 #pool was at its cap and the oldest live bullet was taken over
+
+        for _ in range(size):
+            self.free.append(self._allocate())
+
+    def _allocate(self) -> entitys.Bullet:
+        bullet = entitys.Bullet(self.width, self.height, self.color, self.scene, self.physics_engine, pool=self, entities=self.entities)
+        self.bullets.append(bullet)
+        self.park(bullet)
+        return bullet
+
+    def acquire(self, parent:entitys.ship) -> entitys.Bullet:
+        """Launch a bullet from parent, reusing a parked one when possible"""
+        bullet = self._take()
+        bullet.launch(parent)
+        return bullet
+
+    def acquire_many(self, parents:list, delays:list = None) -> list:
+        """Launch one bullet from each parent, delays are how far into the coming step each one was fired"""
+        if delays is None:
+            return [self.acquire(parent) for parent in parents]
+        bullets = []
+        for parent, delay in zip(parents, delays):
+            bullet = self._take()
+            bullet.launch(parent, delay)
+            bullets.append(bullet)
+        return bullets
+
+    def restore(self, x:float, y:float, angle:float, velocity:tuple, health:float, collision_filter = None) -> entitys.Bullet:
+        """Bring back a bullet in flight, e.g. one handed over from another world shard"""
+        bullet = self._take()
+        bullet.place(x, y, angle, velocity, health, collision_filter)
+        return bullet
+
+    def _take(self) -> entitys.Bullet:
+        if self.free:
+            bullet = self.free.pop()
+            self.hits += 1
+        elif len(self.bullets) < self.cap:
+            bullet = self._allocate()
+            self.misses += 1
+        else:
+            bullet = next(iter(self.live))
+            del self.live[bullet]
+            self.reuses += 1
+
+        # parked bullets are out of the space, they go back in with the same body before they are launched
+        if bullet in self.leaving:
+            self.leaving.discard(bullet)
+            self.physics_engine.space.add(bullet.physics_object.body, bullet.physics_object.shape)
+        elif bullet not in self.physics_engine.sprites:
+            self._rejoin(bullet)
+        self.live[bullet] = None
+        return bullet
+
+    def _rejoin(self, bullet:entitys.Bullet):
+        """Put a flushed bullet back into the physics engine with the body and shape it was built with
+
+        PymunkPhysicsEngine.add_sprite would build new ones, so this does the rest of what it does by
+        hand, which relies on arcade 2.6.17's internals: the engine's sprites dict (sprite ->
+        PymunkPhysicsObject) and its non_static_sprite_list, that resync_sprites walks every step
+        """
+        physics_object = bullet.physics_object
+        self.physics_engine.sprites[bullet] = physics_object
+        self.physics_engine.non_static_sprite_list.append(bullet)
+        self.physics_engine.space.add(physics_object.body, physics_object.shape)
+
+    def flush(self):
+        """Drop the bullets parked since the last flush from the physics engine, one pass over its list
+
+        PymunkPhysicsEngine.remove_sprite would search the list once for every bullet
+        """
+        if not self.leaving:
+            return
+        leaving = self.leaving
+        sprites = self.physics_engine.sprites
+        for bullet in leaving:
+            sprites.pop(bullet, None)
+        self.physics_engine.non_static_sprite_list[:] = [sprite for sprite in self.physics_engine.non_static_sprite_list if sprite not in leaving]
+        leaving.clear()
+
+    def release(self, bullet:entitys.Bullet):
+        """Deactivate a live bullet and hand it back to the free list"""
+        if bullet not in self.live:
+            return
+        del self.live[bullet]
+        self.park(bullet)
+        self.free.append(bullet)
+
+    #update method
+    #decays every live bullet in one pass over the store and parks the spent ones
+    def update(self, delta_time:float = FIXED_DELTA_TIME):
+        self.flush()
+        if not self.live:
+            return
+        ids = np.fromiter((bullet.entity for bullet in self.live), dtype=np.int64, count=len(self.live))
+        self.entities.decay(ids, BULLET_DECAY * delta_time)
+        for bullet in self.entities.dead(ids):
+            self.release(bullet)
+
+    def park(self, bullet:entitys.Bullet):
+        #the body and shape leave the space now, parked bullets piled up on one spot would otherwise all
+        #pair up in the broadphase. the engine stops syncing the sprite once flush() drops it
+        if bullet in self.physics_engine.sprites and bullet not in self.leaving:
+            self.physics_engine.space.remove(bullet.physics_object.body, bullet.physics_object.shape)
+            self.leaving.add(bullet)
+        body = bullet.physics_object.body
+        body.velocity = (0, 0)
+        body.force = (0, 0)
+        body.position = BULLET_POOL_PARK
+        bullet.physics_object.shape.filter = INACTIVE_FILTER
+        bullet.position = BULLET_POOL_PARK
+        bullet.visible = False
+        bullet.active = False
+        bullet.health = 0
+
+    def clear(self):
+        """Park every live bullet"""
+        for bullet in list(self.live):
+            self.release(bullet)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self.bullets),
+            "live": len(self.live),
+            "free": len(self.free),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reuses": self.reuses,
+        }
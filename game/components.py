@@ -0,0 +1,128 @@
+import numpy as np
+from itertools import chain
+
+#component store
+#per entity simulation state, one typed array per component indexed by entity id.
+#sprites only keep their id and read and write their state through component() properties,
+#so systems like damage, decay and the AI can run over every entity in one numpy pass.
+#ids of destroyed entities are handed out again, so the arrays stay as small as the peak count
+class ComponentStore:
+
+    # name, per entity shape, dtype
+    LAYOUT = (
+        ("alive", (), bool),
+        # transform mirror, copied by sync_transforms
+        ("position", (2,), float),
+        ("angle", (), float), # radians, the body's
+        ("health", (), float),
+        ("cooldown", (), float),
+        ("lastfire", (), float),
+        ("speed", (), float),
+        ("force", (2,), float),
+        # AI target, a fixed point when has_target is set
+        ("target", (2,), float),
+        ("has_target", (), bool),
+        ("distance", (), float),
+        ("target_angle", (), float),
+        ("body_angle", (), float),
+        # steering PID output, its state is a utilities.PIDState on the ship
+        ("output", (), float),
+    )
+
+    def __init__(self, capacity:int = 64):
+        self.sprites = [] # entity id -> sprite, None once destroyed
+        self.free = []
+        self.bodies = {} # entity id -> pymunk body, entities with one are in the transform mirror
+        self.count = 0 # ids handed out so far, live or free
+        self.capacity = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity:int):
+        n = self.count
+        self.capacity = capacity
+        for name, shape, dtype in self.LAYOUT:
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                array[:n] = old[:n]
+            setattr(self, name, array)
+
+    def create(self, sprite, body = None) -> int:
+        """New entity for sprite, every component starts at zero"""
+        if self.free:
+            entity = self.free.pop()
+            for name, _shape, _dtype in self.LAYOUT:
+                getattr(self, name)[entity] = 0
+        else:
+            if self.count == self.capacity:
+                self._allocate(self.capacity * 2)
+            entity = self.count
+            self.count += 1
+            self.sprites.append(None)
+        self.alive[entity] = True
+        self.sprites[entity] = sprite
+        if body is not None:
+            self.bodies[entity] = body
+            self.position[entity] = sprite.position
+            self.angle[entity] = body.angle
+        return entity
+
+    def destroy(self, entity:int):
+        if not self.alive[entity]:
+            return
+        self.alive[entity] = False
+        self.sprites[entity] = None
+        self.bodies.pop(entity, None)
+        self.free.append(entity)
+
+    def __len__(self) -> int:
+        return self.count - len(self.free)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name, _shape, _dtype in self.LAYOUT)
+
+    #systems
+    #each one is a single pass over the ids it is given
+
+    def sync_transforms(self):
+        """Copy every mirrored entity's position and angle into the arrays"""
+        bodies = self.bodies
+        n = len(bodies)
+        if n == 0:
+            return
+        ids = np.fromiter(bodies, dtype=np.int64, count=n)
+        # the physics engine already copied the positions onto the sprites, reading them there
+        # is much cheaper than asking pymunk again
+        sprites = self.sprites
+        positions = chain.from_iterable([sprites[i].position for i in bodies])
+        self.position[ids] = np.fromiter(positions, dtype=float, count=2 * n).reshape(n, 2)
+        self.angle[ids] = np.fromiter([body.angle for body in bodies.values()], dtype=float, count=n)
+
+    def damage(self, ids, amounts):
+        """Take amounts off the entities' health, an id can be hit more than once"""
+        np.subtract.at(self.health, ids, amounts)
+
+    def decay(self, ids, amount:float):
+        self.health[ids] -= amount
+
+    def dead(self, ids) -> list:
+        """Sprites of the entities in ids that are out of health"""
+        ids = np.asarray(ids, dtype=np.int64)
+        sprites = self.sprites
+        return [sprites[i] for i in ids[self.health[ids] <= 0].tolist()]
+
+
+def component(name:str):
+    """Property that reads and writes a sprite's entry in its store's name array"""
+    def get(self):
+        return getattr(self.entities, name)[self.entity]
+
+    def set(self, value):
+        getattr(self.entities, name)[self.entity] = value
+
+    return property(get, set)
+
+
+# used by sprites made without a store of their own
+DEFAULT_STORE = ComponentStore()
@@ -1,3 +1,10 @@
+SPRITE_SCALING=  1
+GUI_SCALING=  0.5
+
+FIXED_DELTA_TIME=  1 / 60
+MAX_FRAME_TIME=  0.25
+INTERPOLATION_SNAP=  500
+
 GRAVITY=  (0, 0)
 DEFAULT_DAMPING=  0.2
 
@@ -7,12 +14,131 @@ PLAYER_MOMENT= 75
 PLAYER_MAX_SPEED=  2000
 PLAYER_MOVE_FORCE=  150
 PLAYER_GUN_COOLDOWN= 0.15
+SHIP_PID_GAINS=  (100, 10, 0.1) # p, i, d for turning towards the target
+SHIP_PID_WINDUP=  1.0 # most the turning integral can build up to, radian seconds
+PLAYER_HEALTH=  100
+
+STEER_ARM=  2
+
+#collision layers, one bit per entity type
+LAYER_PLAYER=  1 << 0
+LAYER_PLAYER_BULLET=  1 << 1
+LAYER_AI=  1 << 2
+LAYER_AI_BULLET=  1 << 3
+#the layers each one is allowed to touch, has to be symmetric, bullets never touch bullets
+COLLISION_MASKS=  {
+    LAYER_PLAYER: LAYER_AI | LAYER_AI_BULLET,
+    LAYER_PLAYER_BULLET: LAYER_AI,
+    LAYER_AI: LAYER_PLAYER | LAYER_PLAYER_BULLET | LAYER_AI | LAYER_AI_BULLET,
+    LAYER_AI_BULLET: LAYER_PLAYER | LAYER_AI,
+}
+#the layer a ship's bullets go on
+BULLET_LAYERS=  {
+    LAYER_PLAYER: LAYER_PLAYER_BULLET,
+    LAYER_AI: LAYER_AI_BULLET,
+}
 
 BULLET_FORCE=  500
 BULLET_MASS=  0.001
+BULLET_HEALTH=  50
+BULLET_DECAY=  25
+BULLET_DAMPING=  0.5
+#bullets as array backed projectiles instead of pymunk bodies
+BULLET_FAST_PATH=  True
+
+BULLET_POOL_SIZE=  64
+BULLET_POOL_CAP=  1024
+BULLET_POOL_PARK=  (-1000000, -1000000)
+
+IMAGE_EXTENSIONS=  (".png",)
+PRELOAD_SOLID_TEXTURES=  ((20, 5, (245, 245, 245)),)
+#computed hit boxes of every image, kept between runs
+HIT_BOX_CACHE=  "assets/hitboxes.json"
+
+#inputs bound to each action, ("mouse", pyglet button) or ("key", pyglet key symbol)
+INPUT_BINDINGS=  {
+    "fire": (("mouse", 1), ("key", 32)), # left mouse, space
+    "thrust": (("mouse", 4), ("key", 119)), # right mouse, w
+    "toggle_debug": (("key", 65470),), # f1
+    "record_profile": (("key", 65471),), # f2
+    "cycle_post": (("key", 65472),), # f3
+    "toggle_culling": (("key", 65473),), # f4
+}
+
+#telemetry, ticks per compressed chunk and the rows the game thread can get ahead of the flush thread
+TELEMETRY_CHUNK_TICKS=  120
+TELEMETRY_SHIP_ROWS=  1 << 18
+TELEMETRY_EVENT_ROWS=  1 << 14
+
+SOUND_ENABLED=  True
+SOUND_MAX_VOICES=  8
+SOUND_EXTENSIONS=  (".mp3", ".wav", ".ogg")
+
+POST_TARGET_FPS=  60
+POST_MIN_SCALE=  1.0
+POST_MAX_SCALE=  4.0
+POST_SCALE_STEP=  0.25
+POST_ADJUST_INTERVAL=  1.0
+
+PROFILER_WINDOW=  300
+PROFILER_BUCKETS=  32
+PROFILER_TRACE_LIMIT=  500000
+
+SPATIAL_CELL_SIZE=  256
+
+CULL_MARGIN=  128
+
+#instances the particle renderer starts with room for, it doubles when a frame needs more
+PARTICLE_CAPACITY=  4096
+
+#effects, what each emit spawns: particles, speed, spread either side of its angle (radians), lifetime, size, rgba
+EFFECT_STYLES=  {
+    "thrust": (2, 120, 0.25, 0.4, 4, (255, 160, 60, 200)),
+    "muzzle": (4, 200, 0.35, 0.12, 3, (255, 240, 200, 255)),
+    "hit": (6, 160, 1.2, 0.3, 3, (255, 220, 120, 255)),
+    "explosion": (64, 260, 3.2, 0.9, 6, (255, 120, 40, 230)),
+}
+EFFECTS_GPU=  True
+#particles simulated on the gpu, the oldest are overwritten once it is full
+EFFECTS_GPU_CAPACITY=  1 << 16
+#the numpy fallback keeps far fewer
+EFFECTS_CPU_CAPACITY=  4096
+#emits a simulation step can queue before more are dropped
+EFFECTS_QUEUE_ROWS=  4096
+#velocity kept after a second
+EFFECTS_DAMPING=  0.3
+
+SHARD_WORLD_SIZE=  40000
+SHARD_GHOST_MARGIN=  200
+SHARD_BULLET_SLOTS=  1024
+SHARD_TIMEOUT=  60
+
+AI_ARRIVE_DISTANCE=  20
+AI_RETARGET_RANGE=  500
+#a new target is redrawn up to AI_RETARGET_TRIES times while another ship is within AI_SPACING of it
+AI_RETARGET_TRIES=  4
+AI_SPACING=  150
+AI_LOD_DISTANCE=  2000
+AI_LOD_INTERVAL=  4
+#time a step may spend on AI decisions like retargeting, ships wait for their turn past it
+AI_BUDGET_MS=  1.0
+#decisions a step makes instead when a run is recorded or replayed and can't depend on the clock
+AI_DECISION_QUOTA=  64
+
+#world streaming, the window and the headless run generate chunks around the player
+WORLD_STREAMING=  True
+WORLD_CHUNK_SIZE=  2000
+#chunks either side of the player's that get loaded, and how far it has to go before they unload again
+WORLD_LOAD_RADIUS=  1
+WORLD_UNLOAD_RADIUS=  2
+#most cargo ships a chunk is generated with
+WORLD_CHUNK_SHIPS=  4
+#steps between checks for ships that wandered out of the loaded chunks
+WORLD_SWEEP_INTERVAL=  30
 
 CARGO_MAX_SPEED= 1500
 CARGO_MOVE_FORCE=  200
 CARGO_MASS=  80
 CARGO_MOMENT = 700
-CARGO_GUN_COOLDOWN=  4
\ No newline at end of file
+CARGO_GUN_COOLDOWN=  4
+CARGO_HEALTH=  100
@@ -0,0 +1,52 @@
+import arcade
+from game.constants import *
+
+
+#culler class
+#keeps drawable copies of the busy sprite lists that only hold what is near the camera,
+#so drawing and interpolation cost follows what is on screen instead of the whole world
+class Culler:
+
+    CULLED_LISTS = ("bullet_list", "Ai_list")
+
+    def __init__(self, margin:float = CULL_MARGIN, lists:tuple = CULLED_LISTS):
+        self.margin = margin
+        self.enabled = True
+        self.lists = {name: arcade.SpriteList() for name in lists}
+        self.on_screen = set()
+
+    def reset(self):
+        for sprite_list in self.lists.values():
+            sprite_list.clear()
+        self.on_screen = set()
+
+    def update(self, simulation, x:float, y:float, width:float, height:float) -> set:
+        """Find the sprites in a width x height view centred on (x, y), returns them"""
+        left = x - width / 2 - self.margin
+        right = x + width / 2 + self.margin
+        bottom = y - height / 2 - self.margin
+        top = y + height / 2 + self.margin
+        simulation.update_indexes()
+        on_screen = set(simulation.ship_index.query_rect(left, bottom, right, top))
+        if "bullet_list" in self.lists:
+            on_screen.update(simulation.bullet_index.query_rect(left, bottom, right, top))
+
+        # only sprites crossing the edge of the view touch the lists
+        for sprite in self.on_screen - on_screen:
+            for sprite_list in self.lists.values():
+                if sprite_list in sprite.sprite_lists:
+                    sprite_list.remove(sprite)
+        scene = simulation.scene
+        for sprite in on_screen - self.on_screen:
+            for name, sprite_list in self.lists.items():
+                if scene.name_mapping[name] in sprite.sprite_lists:
+                    sprite_list.append(sprite)
+
+        self.on_screen = on_screen
+        return on_screen
+
+    def draw(self, scene:arcade.Scene, skip:tuple = ()):
+        """Draw the scene in its usual order with the culled lists swapped in, leaving out the ones in skip"""
+        for name, sprite_list in scene.name_mapping.items():
+            if name not in skip:
+                self.lists.get(name, sprite_list).draw()
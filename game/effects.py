@@ -0,0 +1,264 @@
+import numpy as np
+from arcade.gl import BufferDescription
+from game.constants import *
+
+# effect kinds, indexes into STYLES
+KINDS = ("thrust", "muzzle", "hit", "explosion")
+THRUST_EFFECT, MUZZLE_EFFECT, HIT_EFFECT, EXPLOSION_EFFECT = range(len(KINDS))
+
+STYLE = np.dtype([
+    ("count", np.int64),
+    ("speed", np.float32),
+    ("spread", np.float32),
+    ("life", np.float32),
+    ("size", np.float32),
+    ("color", np.float32, 4),
+])
+STYLES = np.array([(count, speed, spread, life, size, tuple(channel / 255 for channel in color))
+                   for count, speed, spread, life, size, color in (EFFECT_STYLES[kind] for kind in KINDS)], dtype=STYLE)
+
+# something happened that wants particles, velocity is what the particles inherit
+EMIT = np.dtype([
+    ("kind", np.uint8),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("angle", np.float32),
+    ("vx", np.float32),
+    ("vy", np.float32),
+])
+
+# one live particle, all floats so the gpu can read and write it as is. dead once age passes life
+PARTICLE_STATE = np.dtype([
+    ("position", np.float32, 2),
+    ("velocity", np.float32, 2),
+    ("age", np.float32),
+    ("life", np.float32),
+    ("size", np.float32),
+    ("color", np.float32, 4),
+])
+STATE_FORMAT = "2f 2f 1f 1f 1f 4f"
+STATE_ATTRIBUTES = ["in_position", "in_velocity", "in_age", "in_life", "in_size", "in_color"]
+
+UPDATE_VERTEX_SHADER = """
+#version 330
+uniform float dt;
+uniform float damping;
+
+in vec2 in_position;
+in vec2 in_velocity;
+in float in_age;
+in float in_life;
+in float in_size;
+in vec4 in_color;
+
+out vec2 out_position;
+out vec2 out_velocity;
+out float out_age;
+out float out_life;
+out float out_size;
+out vec4 out_color;
+
+void main() {
+    out_velocity = in_velocity * pow(damping, dt);
+    out_position = in_position + out_velocity * dt;
+    out_age = in_age + dt;
+    out_life = in_life;
+    out_size = in_size;
+    out_color = in_color;
+}
+"""
+
+DRAW_VERTEX_SHADER = """
+#version 330
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+in vec2 in_corner;
+in vec2 in_position;
+in vec2 in_velocity;
+in float in_age;
+in float in_life;
+in float in_size;
+in vec4 in_color;
+out vec4 color;
+
+void main() {
+    // dead and never used slots collapse outside the clip space
+    if (!(in_age < in_life)) {
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        color = vec4(0.0);
+        return;
+    }
+    float t = in_age / in_life;
+    vec2 world = in_position + in_corner * in_size * (1.0 - 0.5 * t);
+    gl_Position = proj.matrix * vec4(world, 0.0, 1.0);
+    color = vec4(in_color.rgb, in_color.a * (1.0 - t));
+}
+"""
+
+DRAW_FRAGMENT_SHADER = """
+#version 330
+in vec4 color;
+out vec4 fragColor;
+void main() {
+    fragColor = color;
+}
+"""
+
+
+#effect queue
+#the simulation's side of the effects. ships, guns and hits append emits to preallocated rows
+#during a step, the window drains them once a frame. headless simulations don't make one
+class EffectQueue:
+
+    def __init__(self, rows:int = EFFECTS_QUEUE_ROWS):
+        self.rows = np.zeros(rows, dtype=EMIT)
+        self.count = 0
+        self.dropped = 0
+
+    def emit(self, kind:int, x:float, y:float, angle:float, vx:float = 0.0, vy:float = 0.0):
+        if self.count == len(self.rows):
+            self.dropped += 1
+            return
+        self.rows[self.count] = (kind, x, y, angle, vx, vy)
+        self.count += 1
+
+    def drain(self) -> np.ndarray:
+        emits = self.rows[:self.count].copy()
+        self.count = 0
+        return emits
+
+
+def spawn(emits:np.ndarray, random:np.random.Generator) -> np.ndarray:
+    """The particles a batch of emits makes, in one pass"""
+    styles = STYLES[emits["kind"]]
+    counts = styles["count"]
+    source = np.repeat(emits, counts)
+    style = np.repeat(styles, counts)
+    n = len(source)
+    angle = source["angle"] + random.uniform(-1, 1, n) * style["spread"]
+    speed = style["speed"] * random.uniform(0.5, 1, n)
+
+    particles = np.zeros(n, dtype=PARTICLE_STATE)
+    particles["position"][:, 0] = source["x"]
+    particles["position"][:, 1] = source["y"]
+    particles["velocity"][:, 0] = np.cos(angle) * speed + source["vx"]
+    particles["velocity"][:, 1] = np.sin(angle) * speed + source["vy"]
+    particles["life"] = style["life"] * random.uniform(0.6, 1, n)
+    particles["size"] = style["size"]
+    particles["color"] = style["color"]
+    return particles
+
+
+#gpu particles
+#every particle lives in a gpu buffer and a transform feedback pass moves them all each frame,
+#python only writes the new ones into a ring over the oldest. two buffers swap between being
+#read and written, both are drawn from with one instanced call
+class GpuParticles:
+
+    def __init__(self, ctx, capacity:int = EFFECTS_GPU_CAPACITY, seed:int = None):
+        self.ctx = ctx
+        self.capacity = capacity
+        self.random = np.random.default_rng(seed)
+        self.head = 0 # ring slot the next particle goes in
+        self.spawned = 0
+
+        self.update_program = ctx.program(vertex_shader=UPDATE_VERTEX_SHADER,
+                                          varyings=["out_position", "out_velocity", "out_age", "out_life", "out_size", "out_color"])
+        self.update_program["damping"] = EFFECTS_DAMPING
+        self.draw_program = ctx.program(vertex_shader=DRAW_VERTEX_SHADER, fragment_shader=DRAW_FRAGMENT_SHADER)
+        corners = ctx.buffer(data=np.array([-0.5, -0.5, 0.5, -0.5, -0.5, 0.5, 0.5, 0.5], dtype=np.float32))
+
+        self.buffers = [ctx.buffer(reserve=capacity * PARTICLE_STATE.itemsize) for _ in range(2)]
+        self.updates = [ctx.geometry([BufferDescription(buffer, STATE_FORMAT, STATE_ATTRIBUTES)], mode=ctx.POINTS)
+                        for buffer in self.buffers]
+        self.draws = [ctx.geometry([BufferDescription(corners, "2f", ["in_corner"]),
+                                    BufferDescription(buffer, STATE_FORMAT, STATE_ATTRIBUTES, instanced=True)],
+                                   mode=ctx.TRIANGLE_STRIP)
+                      for buffer in self.buffers]
+        self.current = 0
+
+    def emit(self, emits:np.ndarray):
+        if len(emits) == 0:
+            return
+        particles = spawn(emits, self.random)[-self.capacity:]
+        self.spawned += len(particles)
+        buffer = self.buffers[self.current]
+        size = PARTICLE_STATE.itemsize
+        first = min(len(particles), self.capacity - self.head)
+        buffer.write(particles[:first], offset=self.head * size)
+        if first < len(particles):
+            buffer.write(particles[first:], offset=0)
+        self.head = (self.head + len(particles)) % self.capacity
+
+    @property
+    def used(self) -> int:
+        """Slots written so far, the rest of the ring has never held a particle"""
+        return min(self.spawned, self.capacity)
+
+    def update(self, delta_time:float):
+        if self.spawned == 0:
+            return
+        self.update_program["dt"] = delta_time
+        target = 1 - self.current
+        self.updates[self.current].transform(self.update_program, self.buffers[target], vertices=self.used)
+        self.current = target
+
+    def draw(self):
+        if self.spawned == 0:
+            return
+        with self.ctx.enabled(self.ctx.BLEND):
+            self.draws[self.current].render(self.draw_program, vertices=4, instances=self.used)
+
+
+#cpu particles
+#the same particles in numpy for when the gpu path can't be built, capped much lower and
+#drawn through the ParticleRenderer the projectiles use
+class CpuParticles:
+
+    def __init__(self, renderer, capacity:int = EFFECTS_CPU_CAPACITY, seed:int = None):
+        self.renderer = renderer
+        self.capacity = capacity
+        self.random = np.random.default_rng(seed)
+        self.state = np.zeros(capacity, dtype=PARTICLE_STATE)
+        self.head = 0
+        self.spawned = 0
+
+    def emit(self, emits:np.ndarray):
+        if len(emits) == 0:
+            return
+        particles = spawn(emits, self.random)[-self.capacity:]
+        self.spawned += len(particles)
+        slots = (self.head + np.arange(len(particles))) % self.capacity
+        self.state[slots] = particles
+        self.head = (self.head + len(particles)) % self.capacity
+
+    def update(self, delta_time:float):
+        state = self.state
+        live = np.flatnonzero(state["age"] < state["life"])
+        velocity = state["velocity"][live] * EFFECTS_DAMPING ** delta_time
+        state["velocity"][live] = velocity
+        state["position"][live] += velocity * delta_time
+        state["age"][live] += delta_time
+
+    def draw(self):
+        state = self.state[self.state["age"] < self.state["life"]]
+        if len(state) == 0:
+            return
+        t = state["age"] / state["life"]
+        size = state["size"] * (1 - 0.5 * t)
+        color = state["color"] * 255
+        color[:, 3] *= 1 - t
+        self.renderer.add(state["position"], 0.0, np.stack((size, size), -1), color.astype(np.uint8))
+        self.renderer.draw()
+
+
+def make_particles(ctx, renderer, gpu:bool = EFFECTS_GPU, seed:int = None):
+    """GpuParticles when the context can build them, otherwise the capped cpu fallback"""
+    if gpu:
+        try:
+            return GpuParticles(ctx, seed=seed)
+        except Exception as error:
+            print(f"gpu particles unavailable, using the cpu fallback: {error}")
+    return CpuParticles(renderer, seed=seed)
@@ -3,14 +3,53 @@ import arcade
 import math
 import random
 from . import utilities
+from . import layers
+from .assets import SHIP_ORIENTATION, solid_texture
+from .components import DEFAULT_STORE, component
+from .effects import THRUST_EFFECT, MUZZLE_EFFECT
 from arcade.pymunk_physics_engine import PymunkPhysicsEngine
 from game.constants import *
 from itertools import cycle
 
+
+def kill(sprite:arcade.Sprite):
+    """sprite.kill(), also letting go of it in lazy (headless) sprite lists, they keep every
+    sprite added before they were first drawn, removed or not"""
+    for sprite_list in sprite.sprite_lists:
+        if sprite_list._deferred_sprites:
+            sprite_list._deferred_sprites.discard(sprite)
+    sprite.kill()
+
+
+def bullet_hit(bullet_sprite, cargo_sprite:"ship", observe = None):
+    """A bullet or projectile ran into a cargo ship, the game and the shard workers both handle hits here
+
+    observe(bullet, cargo) sees every hit that counts, before the bullet is spent
+    """
+    if not bullet_sprite.active: #already recycled by an earlier contact this step
+        return
+    if bullet_sprite.parent is cargo_sprite: #a ship clipping its own fresh bullet
+        return
+    if observe is not None:
+        observe(bullet_sprite, cargo_sprite)
+    cargo_sprite.damage(bullet_sprite.health)
+    bullet_sprite.recycle()
+
 #player class
 #inherits from arcade.Sprite parent class
+#its simulation state lives in a ComponentStore, the properties below read and write its row
 class ship(arcade.Sprite):
 
+    health = component("health")
+    cooldown = component("cooldown")
+    lastfire = component("lastfire")
+    speed = component("speed")
+    player_force = component("force")
+    distance_to_target = component("distance")
+    target_angle = component("target_angle")
+    bodyangle = component("body_angle")
+    pid_output = component("output")
+
     def __init__(self, 
                     image, 
                     scale, 
@@ -23,15 +62,22 @@ class ship(arcade.Sprite):
                     moment, 
                     cooldown, 
                     target:arcade.Sprite = None, 
-                    targetcoord:list = None):
+                    targetcoord:list = None,
+                    bullet_pool = None,
+                    sounds = None,
+                    health:float = PLAYER_HEALTH,
+                    assets = None,
+                    layer:int = LAYER_PLAYER,
+                    entities = None,
+                    effects = None):
         
-        super().__init__(image, scale, flipped_diagonally=True, flipped_horizontally =True)
+        #image is either a file or a texture from the asset registry that is already flipped
+        if isinstance(image, arcade.Texture):
+            super().__init__(texture=image, scale=scale)
+        else:
+            super().__init__(image, scale, **SHIP_ORIENTATION)
         self.physics_engine = physicsEngine
         self.scene = scene
-        self.target = target
-        self.targetcoord = targetcoord
-        self.distance_to_target = 0
-        self.cooldown = cooldown
         self.scene.add_sprite(list, self)
         self.physics_engine.add_sprite(self,
                                        collision_type=collision_type,
@@ -39,30 +85,55 @@ class ship(arcade.Sprite):
                                        mass=mass,
                                        max_velocity=max_vel)
         self.physics_object = physicsEngine.get_physics_object(self)
-        self.speed = 0
-        self.player_force = [0, 0]
-        self.target_angle = 0
-        self.bodyangle = 0 
+        self.entities = entities if entities is not None else DEFAULT_STORE
+        self.entity = self.entities.create(self, self.physics_object.body)
+        self.target = target
+        self.targetcoord = targetcoord
+        self.cooldown = cooldown
+        # the ship and its bullets share a group so they can't hit each other
+        self.layer = layer
+        self.group = layers.new_group()
+        self.physics_object.shape.filter = layers.shape_filter(layer, self.group)
+        self.bullet_filter = layers.shape_filter(BULLET_LAYERS[layer], self.group)
+        self.bullet_pool = bullet_pool
+        self.sounds = sounds
+        self.effects = effects
+        self.health = health
+        self.assets = assets
         self.gunlist = [
-            Gun("assets/images/ship_gun.png", scale, self)
+            Gun(assets.texture("ship_gun") if assets is not None else "assets/images/ship_gun.png", scale, self)
             ]
         
         self.guncycle = cycle(self.gunlist)
-        self.lastfire = 0
-        self.pid_params = {
-            "p":100,
-            "i":10,
-            "d":0.1
-        }
-        self.pid_data = {
-            "errSum":0,
-            "lasterr":0
-        }
-        self.pid_output = 0
+        self.pid = utilities.PIDState(*SHIP_PID_GAINS, windup=SHIP_PID_WINDUP, input=self.physics_object.body.angle)
+        self.fleet = None
+        self.weapons = None
+        self.ai = None
+        self.home = None # the world chunk that generated it, see world.py
+
+    #fixed point AI target, None when there is none or a sprite is being followed
+    @property
+    def targetcoord(self):
+        if not self.entities.has_target[self.entity]:
+            return None
+        return tuple(self.entities.target[self.entity].tolist())
+
+    @targetcoord.setter
+    def targetcoord(self, value):
+        self.entities.has_target[self.entity] = value is not None
+        if value is not None:
+            self.entities.target[self.entity] = value
 
     def on_update(self, delta_time: float = 1 / 60):
-        self.lastfire -= delta_time
+        if self.weapons is None:
+            self.lastfire -= delta_time
+
+        #ships in a FleetController get steered in one batch before the scene updates
+        if self.fleet is None:
+            self.steer(delta_time)
+        return super().on_update(delta_time)
 
+    def steer(self, delta_time: float = 1 / 60):
         #get distance to target and target angle
         if self.target is not None: 
             self.distance_to_target = arcade.get_distance_between_sprites(self, self.target)
@@ -72,34 +143,58 @@ class ship(arcade.Sprite):
             self.target_angle  = utilities.get_angle_to(self.position, self.targetcoord) % (2 * math.pi)
 
         #~~~ PID control code
-        self.bodyangle = self.physics_object.body.angle % (2 * math.pi)
-        error = self.bodyangle - self.target_angle 
-        
-        if abs(error) > math.pi:
-            if self.target_angle > self.bodyangle:
-                    self.bodyangle = self.bodyangle + 2*math.pi
-            elif self.bodyangle > self.target_angle:
-                self.target_angle = self.target_angle + 2*math.pi
-        
-        self.pid_output = utilities.pid(self.bodyangle, self.target_angle, delta_time, self.pid_params, self.pid_data)
+        angle = self.physics_object.body.angle
+        bodyangle, target_angle = utilities.wrap_angles(angle % (2 * math.pi), float(self.target_angle))
+        self.bodyangle = bodyangle
+        self.target_angle = target_angle
+
+        #the raw body angle never jumps by 2pi, so it is what the derivative is taken on
+        output = utilities.pid_step(self.pid, angle, angle + (target_angle - bodyangle), delta_time)
+        self.pid_output = output
         #~~~
 
 
         #rotate the ship by applying trust in 2 oppsite and offset points 
-        self.physics_object.body.apply_force_at_local_point((0, -self.pid_output), (2, 0))
-        self.physics_object.body.apply_force_at_local_point((0, self.pid_output), (-2, 0))
-        return super().on_update(delta_time)
+        self.physics_object.body.apply_force_at_local_point((0, -output), (STEER_ARM, 0))
+        self.physics_object.body.apply_force_at_local_point((0, output), (-STEER_ARM, 0))
 
     def thrust(self, force:float):
-        self.physics_object.body.apply_impulse_at_local_point((force, 0), (1, 0)) 
+        body = self.physics_object.body
+        body.apply_impulse_at_local_point((force, 0), (1, 0)) 
+        if self.effects is not None:
+            #exhaust out of the back, carried along at the ship's speed
+            reach = max(self.width, self.height) / 2
+            self.effects.emit(THRUST_EFFECT, self.center_x - reach * math.cos(body.angle), self.center_y - reach * math.sin(body.angle),
+                              body.angle + math.pi, *body.velocity)
 
     def fire_guns(self):
-        gun = next(self.guncycle)
-        
-        if self.lastfire <= 0:
-                gun.fire()
-                self.lastfire = PLAYER_GUN_COOLDOWN / len(self.gunlist) #devide the cooldown by the amount of guns attached to the ship, as each gun fires one at a time 
+        #ships in a WeaponScheduler get their shots worked out for the whole step, see weapons.py
+        if self.weapons is not None:
+            self.weapons.trigger(self)
+        elif self.lastfire <= 0:
+            next(self.guncycle).fire()
+            self.lastfire = self.cooldown / len(self.gunlist) #devide the cooldown by the amount of guns attached to the ship, as each gun fires one at a time 
+
+    def set_cooldown(self, cooldown:float):
+        self.cooldown = cooldown
+        for gun in self.gunlist:
+            gun.cooldown = cooldown
             
+    def damage(self, amount:int, instant:bool = False):
+        if instant:
+            self.health = -999
+        else: self.health -= amount
+
+    def destroy(self):
+        if self.fleet is not None:
+            self.fleet.remove(self)
+        if self.weapons is not None:
+            self.weapons.remove(self)
+        if self.ai is not None:
+            self.ai.remove(self)
+        self.entities.destroy(self.entity)
+        kill(self)
+
     def change_target(self, new_target):
         if type(new_target) == arcade.Sprite:
             self.target = new_target
@@ -107,57 +202,137 @@ class ship(arcade.Sprite):
         else:
             self.targetcoord = new_target
             self.target = None
+        if self.fleet is not None:
+            self.fleet.retarget(self)
 
 
 
 class Gun(arcade.Sprite):
     def __init__(self, image, scale, parent):
 
-        super().__init__(image, scale)
+        if isinstance(image, arcade.Texture):
+            super().__init__(texture=image, scale=scale)
+        else:
+            super().__init__(image, scale)
         self.parent = parent
         self.bullet = Bullet
+        self.sound = parent.sounds.get("ship_fire_light") if parent.sounds is not None else None
+        # seconds between this gun's shots, and when a WeaponScheduler lets it fire next
+        self.cooldown = parent.cooldown
+        self.ready = 0.0
+
     def fire(self):
-        self.bullet(20, 5, arcade.color.WHITE_SMOKE, self.parent)
+        if self.parent.bullet_pool is not None:
+            self.parent.bullet_pool.acquire(self.parent)
+        else:
+            self.bullet(20, 5, arcade.color.WHITE_SMOKE, self.parent.scene, self.parent.physics_engine, entities=self.parent.entities).launch(self.parent)
+        self.play_sound()
+        self.flash()
+
+    def play_sound(self):
+        if self.sound is not None:
+            self.sound.play()
+
+    def flash(self):
+        parent = self.parent
+        if parent.effects is None:
+            return
+        body = parent.physics_object.body
+        reach = max(parent.width, parent.height) / 2
+        parent.effects.emit(MUZZLE_EFFECT, parent.center_x + reach * math.cos(body.angle), parent.center_y + reach * math.sin(body.angle),
+                            body.angle, *body.velocity)
         
 #bullet class
-class Bullet(arcade.SpriteSolidColor):
+#bullets made by a BulletPool are parked instead of killed when they expire, and decayed by it in one pass
+#every bullet of the same size and colour shares one texture
+class Bullet(arcade.Sprite):
+
+    health = component("health")
     
-    def __init__(self, width, height, color, parent:ship):
-        """ Set up the player """
+    def __init__(self, width, height, color, scene:arcade.Scene, physicsEngine:PymunkPhysicsEngine, pool = None, entities = None):
+        """ Set up the bullet """
 
         # Call the parent init
-        super().__init__(width, height, color)
+        super().__init__(texture=solid_texture(width, height, color))
 
-        self.sound = arcade.Sound("assets/sfx/ship_fire_light.mp3")
-        self.health:int = 50
+        self.entities = entities if entities is not None else DEFAULT_STORE
+        self.entity = self.entities.create(self)
+        self.active = False
+        self.pool = pool
+        self.parent = None
+        self.size = 0
 
-        self.parent = parent
-        self.parent.scene.add_sprite("bullet_list", self)
-        self.position = parent.position
-
-        self.size = max(parent.width, parent.height) / 2
-
-        self.center_x += self.size * math.cos(parent.bodyangle) 
-        self.center_y += self.size * math.sin(parent.bodyangle)
-
-        self.angle = math.degrees(parent.bodyangle)
-
-        parent.physics_engine.add_sprite(self,
+        scene.add_sprite("bullet_list", self)
+        self.physics_engine = physicsEngine
+        physicsEngine.add_sprite(self,
             mass=BULLET_MASS,
             moment=PymunkPhysicsEngine.MOMENT_INF,
-            damping=0.5,
+            damping=BULLET_DAMPING,
             collision_type="bullet",
             )
-        bullet_physcis_object = parent.physics_engine.get_physics_object(self)
-        bullet_physcis_object.body.velocity = parent.physics_object.body.velocity
+        self.physics_object = physicsEngine.get_physics_object(self)
+        self.collision_filter = self.physics_object.shape.filter
+
+    def launch(self, parent:ship, delay:float = 0):
+        #delay is how far into the coming step it was fired, it starts that far behind the muzzle
+        self.parent = parent
+        self.health = BULLET_HEALTH
+        self.size = max(parent.width, parent.height) / 2
+
+        x = parent.center_x + self.size * math.cos(parent.bodyangle) 
+        y = parent.center_y + self.size * math.sin(parent.bodyangle)
+        if delay:
+            velocity = parent.physics_object.body.velocity
+            kick = BULLET_FORCE / BULLET_MASS * FIXED_DELTA_TIME
+            x -= (velocity.x + kick * math.cos(parent.bodyangle)) * delay
+            y -= (velocity.y + kick * math.sin(parent.bodyangle)) * delay
+        self.position = (x, y)
+        self.angle = math.degrees(parent.bodyangle)
+        self.visible = True
+        self.active = True
+
+        body = self.physics_object.body
+        body.position = (x, y)
+        body.angle = parent.bodyangle
+        body.velocity = parent.physics_object.body.velocity
+        self.physics_object.shape.filter = parent.bullet_filter
         force = (BULLET_FORCE, 0 )
-        parent.physics_engine.apply_force(self, force)
-        self.sound.play()
+        self.physics_engine.apply_force(self, force)
+
+    def hit_point(self) -> tuple:
+        """Where the bullet is and the angle it flies at, radians"""
+        body = self.physics_object.body
+        return body.position.x, body.position.y, body.angle
+
+    def place(self, x:float, y:float, angle:float, velocity:tuple, health:float, collision_filter = None):
+        #like launch but for a bullet already in flight, angle in radians
+        self.parent = None
+        self.health = health
+        self.position = (x, y)
+        self.angle = math.degrees(angle)
+        self.visible = True
+        self.active = True
+
+        body = self.physics_object.body
+        body.position = (x, y)
+        body.angle = angle
+        body.velocity = velocity
+        self.physics_object.shape.filter = collision_filter if collision_filter is not None else self.collision_filter
+
+    def recycle(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            self.entities.destroy(self.entity)
+            kill(self)
 
     def on_update(self, delta_time: float = 1 / 60):
-        self.health -= delta_time * 25
+        #pooled bullets are decayed by their pool
+        if not self.active or self.pool is not None:
+            return
+        self.health -= delta_time * BULLET_DECAY
         if self.health <= 0:
-            self.kill()
+            self.recycle()
         return super().on_update(delta_time)
 
     def damage(self, amount:int, instant:bool = False):
@@ -172,7 +347,10 @@ class Pointer(arcade.Sprite):
         """ Set up the player """
 
         # Call the parent init
-        super().__init__(image, scale)
+        if isinstance(image, arcade.Texture):
+            super().__init__(texture=image, scale=scale)
+        else:
+            super().__init__(image, scale)
 
     def update(self, mousepos, playerpos, camera:arcade.Camera):
         self.center_x = mousepos[0] + playerpos[0] - (camera.viewport_width / 2)
@@ -0,0 +1,200 @@
+import math
+import numpy as np
+from . import utilities
+from game.constants import *
+
+TWO_PI = 2 * math.pi
+
+#fleet controller
+#steers every registered ship in one vectorized pass instead of per sprite
+#mirrors ship.steer exactly so both paths can be checked against each other
+#reads positions from the ships' ComponentStore transform mirror and writes its results back to it,
+#so sync_transforms has to run before update
+#given a focus point, ships far from it only rerun their PID every AI_LOD_INTERVAL steps
+#and hold their last output in between
+class FleetController:
+
+    # name, per ship shape, dtype
+    LAYOUT = (
+        ("entity", (), np.int64), # the ship's id in the store
+        ("position", (2,), float),
+        ("angle", (), float),
+        ("target", (2,), float),
+        ("has_target", (), bool),
+        # the ships' PIDStates while they are in the fleet
+        ("gains", (3,), float), # p, i, d
+        ("windup", (), float),
+        ("err_sum", (), float),
+        ("last_input", (), float),
+        ("since_update", (), float), # time since the PID last ran
+        ("updated", (), bool), # the PID ran this step
+        # results, kept around so the AI code can read them without touching the sprites
+        ("distance", (), float),
+        ("target_angle", (), float),
+        ("body_angle", (), float),
+        ("output", (), float),
+    )
+
+    def __init__(self, capacity:int = 64):
+        self.ships = []
+        self.bodies = []
+        self.following = set() #indexes of ships chasing a sprite instead of a fixed point
+        self.count = 0
+        self.tick = 0
+        self.entities = None # every ship in a fleet shares one store
+        self.capacity = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity:int):
+        n = self.count
+        self.capacity = capacity
+        for name, shape, dtype in self.LAYOUT:
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                array[:n] = old[:n]
+            setattr(self, name, array)
+
+    def add(self, ship):
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+
+        i = self.count
+        self.ships.append(ship)
+        self.bodies.append(ship.physics_object.body)
+        self.count += 1
+        self.entities = ship.entities
+
+        entity = ship.entity
+        self.entity[i] = entity
+        self.position[i] = ship.position
+        self.angle[i] = ship.physics_object.body.angle
+        self.since_update[i] = 0
+        self.updated[i] = True
+        pid = ship.pid
+        self.gains[i] = (pid.p, pid.i, pid.d)
+        self.windup[i] = pid.windup
+        self.err_sum[i] = pid.err_sum
+        self.last_input[i] = pid.last_input
+        for name in ("distance", "target_angle", "output"):
+            getattr(self, name)[i] = getattr(self.entities, name)[entity]
+
+        ship.fleet = self
+        ship.fleet_index = i
+        self.retarget(ship)
+
+    def remove(self, ship):
+        """Swap the last ship into the removed slot so the arrays stay packed"""
+        i = ship.fleet_index
+        last = self.count - 1
+
+        # hand the integrator state back so the ship can keep steering on its own
+        ship.pid.err_sum = float(self.err_sum[i])
+        ship.pid.last_input = float(self.last_input[i])
+        ship.fleet = None
+        self.following.discard(i)
+
+        if i != last:
+            moved = self.ships[last]
+            self.ships[i] = moved
+            self.bodies[i] = self.bodies[last]
+            for name, _shape, _dtype in self.LAYOUT:
+                array = getattr(self, name)
+                array[i] = array[last]
+            moved.fleet_index = i
+            if last in self.following:
+                self.following.discard(last)
+                self.following.add(i)
+
+        self.ships.pop()
+        self.bodies.pop()
+        self.count -= 1
+
+    def retarget(self, ship):
+        """Pick up a target change made through ship.change_target"""
+        i = ship.fleet_index
+        self.following.discard(i)
+        if ship.target is not None:
+            self.following.add(i)
+            self.target[i] = ship.target.position
+            self.has_target[i] = True
+        elif ship.targetcoord is not None:
+            self.target[i] = ship.targetcoord
+            self.has_target[i] = True
+        else:
+            self.has_target[i] = False
+
+    def is_updated(self, ship) -> bool:
+        """Whether the ship's steering ran this step, far ships skip most steps"""
+        return bool(self.updated[ship.fleet_index])
+
+    def update(self, delta_time:float = 1 / 60, focus:tuple = None):
+        n = self.count
+        if n == 0:
+            return
+        self.tick += 1
+        self.since_update[:n] += delta_time
+
+        # pick the ships that steer this step, far ones take turns so the work is spread out
+        if focus is None:
+            self.updated[:n] = True
+        else:
+            offset = self.position[:n] - focus
+            near = np.hypot(offset[:, 0], offset[:, 1]) <= AI_LOD_DISTANCE
+            due = (np.arange(n) + self.tick) % AI_LOD_INTERVAL == 0
+            self.updated[:n] = near | due
+        active = np.flatnonzero(self.updated[:n])
+        if active.size == n:
+            # a slice is much cheaper to index with than the full list of positions
+            self._steer(slice(0, n))
+        elif active.size:
+            self._steer(active)
+
+        # scatter
+        # ship.steer pushes +-output at +-STEER_ARM on the local y axis, the forces cancel
+        # and only leave a torque of -2 * STEER_ARM * output, skipped ships keep their last one
+        torque = (-2 * STEER_ARM) * self.output[:n]
+        for body, amount in zip(self.bodies, torque.tolist()):
+            body.torque += amount
+
+    def _steer(self, active):
+        ships = self.ships
+        entities = self.entities
+        ids = self.entity[active]
+
+        # gather
+        for i in self.following:
+            self.target[i] = ships[i].target.position
+        self.position[active] = entities.position[ids]
+        self.angle[active] = entities.angle[ids]
+
+        # distance and angle to target, ships without one keep their old heading
+        has_target = self.has_target[active]
+        delta = self.target[active] - self.position[active]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        target_angle = np.arctan2(delta[:, 1], delta[:, 0]) % TWO_PI
+        self.distance[active] = np.where(has_target, distance, self.distance[active])
+        target_angle = np.where(has_target, target_angle, self.target_angle[active])
+
+        # same wrapping as utilities.wrap_angles
+        body_angle = self.angle[active] % TWO_PI
+        wrap = np.abs(body_angle - target_angle) > math.pi
+        lift_body = wrap & (target_angle > body_angle)
+        lift_target = wrap & (body_angle > target_angle)
+        body_angle = body_angle + lift_body * TWO_PI
+        target_angle = target_angle + lift_target * TWO_PI
+        self.body_angle[active] = body_angle
+        self.target_angle[active] = target_angle
+
+        # same call as ship.steer, over however long it has been since each ship last ran
+        angle = self.angle[active]
+        output, err_sum = utilities.pid_batch(angle, angle + (target_angle - body_angle), self.since_update[active],
+                                              self.gains[active], self.err_sum[active], self.last_input[active], self.windup[active])
+        self.output[active] = output
+        self.err_sum[active] = err_sum
+        self.last_input[active] = angle
+        self.since_update[active] = 0
+
+        # scatter
+        for name in ("distance", "target_angle", "body_angle", "output"):
+            getattr(entities, name)[ids] = getattr(self, name)[active]
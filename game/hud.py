@@ -0,0 +1,40 @@
+import arcade
+import pyglet
+
+
+#hud class
+#persistent pyglet labels grouped into one batch per layer, so a whole layer is one draw call
+#labels only re-lay-out when their text actually changes
+class Hud:
+
+    def __init__(self, window:arcade.Window):
+        self.window = window
+        self.batches = {} # layer -> pyglet batch
+        self.labels = {} # name -> pyglet label
+
+    def add(self, name:str, layer:str, x:float, y:float, text:str = "", color = arcade.color.WHITE, font_size:float = 12) -> pyglet.text.Label:
+        batch = self.batches.get(layer)
+        if batch is None:
+            batch = self.batches[layer] = pyglet.graphics.Batch()
+        if len(color) == 3:
+            color = (*color, 255)
+        label = pyglet.text.Label(text, x=x, y=y, color=color, font_size=font_size, batch=batch)
+        self.labels[name] = label
+        return label
+
+    def set(self, name:str, text:str, x:float = None, y:float = None):
+        """Update a label, anything that didn't change is left alone"""
+        label = self.labels[name]
+        if label.text != text:
+            label.text = text
+        if x is not None and label.x != x:
+            label.x = x
+        if y is not None and label.y != y:
+            label.y = y
+
+    def draw(self, layer:str):
+        batch = self.batches.get(layer)
+        if batch is None:
+            return
+        with self.window.ctx.pyglet_rendering():
+            batch.draw()
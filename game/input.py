@@ -0,0 +1,67 @@
+import time
+from collections import deque
+from game.constants import *
+
+#actions the simulation consumes on its fixed step, the others are handled by the window straight away
+STEP_ACTIONS = ("thrust", "fire")
+
+
+#input map
+#turns pyglet events into timestamped commands, bindings map ("mouse", button) and ("key", symbol)
+#to named actions so anything can be rebound. the fixed step takes the commands issued before its
+#end time, so a click lands on the step it happened in instead of whenever the frame got round to it
+class InputMap:
+
+    def __init__(self, bindings:dict = INPUT_BINDINGS, clock = time.perf_counter):
+        self.clock = clock
+        self.actions = {} # (device, code) -> action
+        for action, inputs in bindings.items():
+            for device, code in inputs:
+                self.bind(action, device, code)
+        self.queue = deque() # (time, action, pressed), oldest first
+        # mouse movement only matters where it ended up, so it is kept instead of queued
+        self.mouse = (0, 0)
+
+    # bindings
+
+    def bind(self, action:str, device:str, code:int):
+        self.actions[(device, code)] = action
+
+    def unbind(self, device:str, code:int):
+        self.actions.pop((device, code), None)
+
+    def bindings(self, action:str) -> list:
+        return [binding for binding, bound in self.actions.items() if bound == action]
+
+    def action_for(self, device:str, code:int):
+        return self.actions.get((device, code))
+
+    # events
+
+    def press(self, device:str, code:int):
+        """Queue the press if it is bound to a step action, returns the action either way"""
+        action = self.actions.get((device, code))
+        if action in STEP_ACTIONS:
+            self.queue.append((self.clock(), action, True))
+        return action
+
+    def release(self, device:str, code:int):
+        action = self.actions.get((device, code))
+        if action in STEP_ACTIONS:
+            self.queue.append((self.clock(), action, False))
+        return action
+
+    def move(self, x:float, y:float):
+        self.mouse = (x, y)
+
+    # commands
+
+    def apply(self, simulation, until:float):
+        """Hand the simulation every command issued up to until, oldest first"""
+        queue = self.queue
+        while queue and queue[0][0] <= until:
+            _time, action, pressed = queue.popleft()
+            simulation.command(action, pressed)
+
+    def clear(self):
+        self.queue.clear()
@@ -0,0 +1,37 @@
+import itertools
+import pymunk
+from game.constants import *
+
+#collision layers
+#every shape gets its entity type's category bit and the mask of the types it may touch,
+#pymunk drops a pair that doesn't match both ways before any contact is worked out.
+#a ship and its own bullets also share a group, so they never touch each other
+
+_groups = itertools.count(1)
+masks = dict(COLLISION_MASKS)
+
+
+def check_masks(layer_masks:dict):
+    """Raise if one layer accepts another that doesn't accept it back, pymunk needs both"""
+    for layer, mask in layer_masks.items():
+        for other, other_mask in layer_masks.items():
+            if bool(mask & other) != bool(other_mask & layer):
+                raise ValueError(f"collision mask of layer {layer} and {other} disagree, they have to allow each other both ways")
+
+
+def use_masks(layer_masks:dict):
+    """Swap the mask table, only affects filters made afterwards"""
+    check_masks(layer_masks)
+    masks.clear()
+    masks.update(layer_masks)
+
+
+def new_group() -> int:
+    return next(_groups)
+
+
+def shape_filter(layer:int, group:int = 0) -> pymunk.ShapeFilter:
+    return pymunk.ShapeFilter(group=group, categories=layer, mask=masks[layer])
+
+
+check_masks(masks)
@@ -0,0 +1,180 @@
+import arcade
+from arcade.experimental import Shadertoy
+from arcade.gl import geometry
+from game.constants import *
+
+CRT_SHADER = ":resources:shaders/shadertoy/crt_monitor_filter.glsl"
+
+BLIT_VERTEX_SHADER = """
+#version 330
+in vec2 in_vert;
+in vec2 in_uv;
+out vec2 uv;
+void main() {
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+    uv = in_uv;
+}
+"""
+
+BLIT_FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D tex;
+in vec2 uv;
+out vec4 fragColor;
+void main() {
+    fragColor = texture(tex, uv);
+}
+"""
+
+#post processing class
+#renders the scene into an offscreen buffer at an internal resolution and composites it to the window
+#modes: "crt" is the full crt shader, "cheap" is a plain upscale, "off" draws straight to the window
+#the crt shader emulates a pixel grid of the window size / scale, the buffer is that size so the
+#pixels it would blur together are never drawn
+#when adaptive it lowers the internal resolution while frames run over budget and raises it again after
+class PostProcess:
+
+    MODES = ("crt", "cheap", "off")
+
+    def __init__(self,
+                    window:arcade.Window,
+                    mode:str = "crt",
+                    adaptive:bool = True,
+                    target_fps:float = POST_TARGET_FPS,
+                    hard_scan:float = -8.0,
+                    hard_pix:float = -3.0,
+                    display_warp:tuple = (1.0 / 32.0, 1.0 / 24.0),
+                    mask_dark:float = 0.5,
+                    mask_light:float = 1.5):
+
+        self.window = window
+        self.ctx = window.ctx
+        self.mode = mode
+        self.adaptive = adaptive
+        self.budget = 1 / target_fps
+        self.crt_settings = dict(hard_scan=hard_scan, hard_pix=hard_pix, display_warp=display_warp,
+                                 mask_dark=mask_dark, mask_light=mask_light)
+
+        # internal resolution is window size / scale
+        self.scale = POST_MIN_SCALE
+        self.frame_time = self.budget
+        self.since_change = 0
+
+        # gpu time of a post processed frame, scene render included. two queries take turns so the
+        # result read is last frame's, which the gpu has finished, instead of waiting on this one
+        self.queries = [self.ctx.query(), self.ctx.query()]
+        self.query_index = 0
+        self.query_pending = [False, False]
+        self.gpu_time_ms = 0.0
+
+        self.shadertoy = None # the crt shader, made the first time it is needed and kept between builds
+        self.blit_program = self.ctx.program(vertex_shader=BLIT_VERTEX_SHADER, fragment_shader=BLIT_FRAGMENT_SHADER)
+        self.quad = geometry.quad_2d_fs()
+        self.texture = None
+        self.framebuffer = None
+        self._viewport = None
+        self._build()
+
+    def _build(self):
+        width, height = self.window.width, self.window.height
+        self._release()
+        self.texture = None
+        self.framebuffer = None
+        if self.mode == "off":
+            return
+
+        size = (max(int(width / self.scale), 1), max(int(height / self.scale), 1))
+        self.texture = self.ctx.texture(size, components=4, filter=(self.ctx.NEAREST, self.ctx.NEAREST))
+        self.framebuffer = self.ctx.framebuffer(color_attachments=[self.texture])
+        if self.mode == "crt":
+            if self.shadertoy is None:
+                self.shadertoy = Shadertoy.create_from_file((width, height), CRT_SHADER)
+                program = self.shadertoy.program
+                program["hardScan"] = self.crt_settings["hard_scan"]
+                program["hardPix"] = self.crt_settings["hard_pix"]
+                program["warp"] = self.crt_settings["display_warp"]
+                program["maskDark"] = self.crt_settings["mask_dark"]
+                program["maskLight"] = self.crt_settings["mask_light"]
+            else:
+                self.shadertoy.resize((width, height))
+            self.shadertoy.channel_0 = self.texture
+            self.shadertoy.program["resolutionDownScale"] = self.scale
+
+    def _release(self):
+        """Free the buffer of the last build, a scale change would otherwise pile them up"""
+        if self.framebuffer is not None:
+            self.framebuffer.delete()
+            self.texture.delete()
+
+    def set_mode(self, mode:str):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown post processing mode {mode!r}, expected one of {self.MODES}")
+        self.mode = mode
+        self._build()
+
+    def cycle_mode(self):
+        self.set_mode(self.MODES[(self.MODES.index(self.mode) + 1) % len(self.MODES)])
+
+    def set_scale(self, scale:float):
+        scale = min(max(scale, POST_MIN_SCALE), POST_MAX_SCALE)
+        if scale != self.scale:
+            self.scale = scale
+            self._build()
+
+    #begin method
+    #binds the offscreen buffer, call before drawing the scene
+    def begin(self, camera:arcade.Camera):
+        if self.mode == "off":
+            self.window.use()
+            self.window.clear()
+            camera.use()
+            return
+
+        self.queries[self.query_index].__enter__()
+        self.framebuffer.use()
+        self.framebuffer.clear()
+        # the camera sets a window sized viewport, keep the buffer's own one
+        self._viewport = self.ctx.viewport
+        camera.use()
+        self.ctx.viewport = self._viewport
+
+    #end method
+    #composites the offscreen buffer onto the window
+    def end(self):
+        if self.mode == "off":
+            return
+
+        self.window.use()
+        self.window.clear()
+        if self.mode == "crt":
+            self.shadertoy.render()
+        else:
+            self.texture.use(0)
+            self.quad.render(self.blit_program)
+        self.queries[self.query_index].__exit__(None, None, None)
+        self.query_pending[self.query_index] = True
+        self.query_index = 1 - self.query_index
+        if self.query_pending[self.query_index]:
+            self.gpu_time_ms = self.queries[self.query_index].time_elapsed / 1e6
+            self.query_pending[self.query_index] = False
+
+    #update method
+    #feeds the measured frame time into the resolution controller
+    def update(self, delta_time:float):
+        # smooth out single slow frames
+        self.frame_time += (delta_time - self.frame_time) * 0.1
+        self.since_change += delta_time
+        if not self.adaptive or self.mode == "off" or self.since_change < POST_ADJUST_INTERVAL:
+            return
+
+        # only the gpu side gets cheaper with fewer pixels, so that is what decides
+        gpu_time = self.gpu_time_ms / 1000
+        if self.frame_time > self.budget * 1.1 and gpu_time > self.budget * 0.5:
+            self.set_scale(self.scale + POST_SCALE_STEP)
+            self.since_change = 0
+        elif self.scale > POST_MIN_SCALE and self.frame_time <= self.budget * 1.1:
+            # pixel count goes with the square of the scale, only step up if that would still fit
+            finer = max(self.scale - POST_SCALE_STEP, POST_MIN_SCALE)
+            if gpu_time * (self.scale / finer) ** 2 < self.budget * 0.5:
+                self.set_scale(finer)
+                self.since_change = 0
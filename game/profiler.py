@@ -0,0 +1,174 @@
+import csv
+import json
+import time
+import arcade
+from collections import deque
+from game.constants import *
+
+
+#timing scope
+#one per name and reused, so timing a block allocates nothing
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name:str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+#stands in for every scope while the profiler is off
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+
+NULL_SCOPE = _NullScope()
+
+
+#profiler class
+#collects named timings into rolling windows for percentiles and the overlay,
+#and optionally keeps every sample so a session can be exported as a trace
+class Profiler:
+
+    def __init__(self, window:int = PROFILER_WINDOW, enabled:bool = False):
+        self.window = window
+        self.enabled = enabled
+        self.recording = False
+        self.samples = {} # name -> deque of durations in ms
+        self.scopes = {}
+        self.events = deque(maxlen=PROFILER_TRACE_LIMIT) # (name, start_ns, duration_ns)
+        self.origin = time.perf_counter_ns()
+
+    def scope(self, name:str):
+        """Time a block with `with profiler.scope("physics"):`"""
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = _Scope(self, name)
+            self.samples[name] = deque(maxlen=self.window)
+        return scope
+
+    def record(self, name:str, start_ns:int, duration_ns:int):
+        self.samples[name].append(duration_ns / 1e6)
+        if self.recording:
+            self.events.append((name, start_ns, duration_ns))
+
+    def start_recording(self):
+        self.enabled = True
+        self.recording = True
+        self.events.clear()
+        self.origin = time.perf_counter_ns()
+
+    def stop_recording(self):
+        self.recording = False
+
+    def reset(self):
+        for samples in self.samples.values():
+            samples.clear()
+        self.events.clear()
+
+    # statistics
+
+    def percentiles(self, name:str, points = (50, 95, 99)) -> tuple:
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return tuple(0.0 for _ in points)
+        last = len(samples) - 1
+        return tuple(samples[round(last * point / 100)] for point in points)
+
+    def summary(self) -> dict:
+        """p50/p95/p99/max in ms for every scope seen so far"""
+        summary = {}
+        for name, samples in self.samples.items():
+            p50, p95, p99 = self.percentiles(name)
+            summary[name] = {
+                "count": len(samples),
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "max": max(samples, default=0.0),
+            }
+        return summary
+
+    # export
+
+    def export_chrome_trace(self, path:str):
+        """Write the recorded samples in chrome://tracing / perfetto format"""
+        events = [{
+            "name": name,
+            "cat": "frame",
+            "ph": "X",
+            "ts": (start - self.origin) / 1000,
+            "dur": duration / 1000,
+            "pid": 0,
+            "tid": 0,
+        } for name, start, duration in self.events]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def export_csv(self, path:str):
+        """One row per recorded sample"""
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("scope", "start_ms", "duration_ms"))
+            for name, start, duration in self.events:
+                writer.writerow((name, (start - self.origin) / 1e6, duration / 1e6))
+
+    def export_summary(self, path:str):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def export(self, basename:str):
+        """Dump the trace, the raw samples and the percentile summary next to each other"""
+        self.export_chrome_trace(basename + ".trace.json")
+        self.export_csv(basename + ".csv")
+        self.export_summary(basename + ".summary.json")
+
+    # overlay
+
+    def draw_overlay(self, left:float, top:float, hud, width:float = 200, row_height:float = 40, budget_ms:float = 1000 / 60):
+        """Histogram of the rolling window for each scope, in window coordinates
+
+        bars run from 0 to the frame budget, anything slower lands in the last bar
+        the percentile text goes into the hud's "profiler" layer, the caller draws it
+        """
+        buckets = PROFILER_BUCKETS
+        bar_width = width / buckets
+        y = top
+        for name, samples in self.samples.items():
+            counts = [0] * buckets
+            for sample in samples:
+                counts[min(int(sample / budget_ms * buckets), buckets - 1)] += 1
+            peak = max(counts) or 1
+
+            bottom = y - row_height
+            lines = []
+            for i, count in enumerate(counts):
+                if count:
+                    x = left + (i + 0.5) * bar_width
+                    lines.append((x, bottom))
+                    lines.append((x, bottom + (row_height - 14) * count / peak))
+            if lines:
+                arcade.draw_lines(lines, arcade.color.RED, bar_width - 1)
+
+            p50, p95, p99 = self.percentiles(name)
+            label = "profiler." + name
+            if label not in hud.labels:
+                hud.add(label, "profiler", left, y - 12, color=arcade.color.RED, font_size=9)
+            hud.set(label, f"{name} p50 {p50:.1f} p95 {p95:.1f} p99 {p99:.1f} ms", left, y - 12)
+            y = bottom - 4
@@ -0,0 +1,398 @@
+import math
+import arcade
+import numpy as np
+import pymunk
+from itertools import chain
+from arcade.pymunk_physics_engine import PymunkPhysicsEngine
+from .assets import solid_texture
+from game.constants import *
+
+#projectile sprite
+#only there to be drawn, its ProjectileSystem moves it and keeps its state
+class Projectile(arcade.Sprite):
+
+    def __init__(self, texture:arcade.Texture, system):
+        super().__init__(texture=texture)
+        self.system = system
+        self.slot = -1
+        self.active = False
+        self.parent = None
+
+    @property
+    def health(self) -> float:
+        return float(self.system.health[self.slot]) if self.active else 0
+
+    def recycle(self):
+        self.system.release(self)
+
+    def hit_point(self) -> tuple:
+        """Where the projectile is and the angle it flies at, radians"""
+        x, y = self.system.position[self.slot].tolist()
+        return x, y, float(self.system.angle[self.slot])
+
+    def damage(self, amount:int, instant:bool = False):
+        if not self.active:
+            return
+        if instant:
+            self.system.health[self.slot] = -999
+        else: self.system.health[self.slot] -= amount
+
+
+def body_reach(shape:pymunk.Shape) -> float:
+    """Distance from the shape's body to the furthest point of the shape"""
+    if isinstance(shape, pymunk.Poly):
+        return max(vertex.length for vertex in shape.get_vertices()) + shape.radius
+    if isinstance(shape, pymunk.Circle):
+        return shape.offset.length + shape.radius
+    return max(shape.a.length, shape.b.length) + shape.radius
+
+
+#projectile system
+#bullets as rows in numpy arrays instead of pymunk bodies, integrated in one pass with the
+#same damping the bodies get, and swept as segments against the ships' shapes to find what they hit.
+#bullets never touch each other and never enter the solver, the collision layers decide what they can hit.
+#stands in for a BulletPool, ships fire through acquire() either way
+class ProjectileSystem:
+
+    # name, per bullet shape, dtype
+    LAYOUT = (
+        ("position", (2,), float),
+        ("previous", (2,), float),
+        ("velocity", (2,), float),
+        ("angle", (), float), # radians, the shooter's heading at launch
+        ("health", (), float),
+        # collision filter of the shooter's bullets, the same test pymunk does
+        ("category", (), np.int64),
+        ("mask", (), np.int64),
+        ("group", (), np.int64),
+    )
+
+    def __init__(self,
+                    scene:arcade.Scene,
+                    physicsEngine:PymunkPhysicsEngine,
+                    size:int = BULLET_POOL_SIZE,
+                    cap:int = BULLET_POOL_CAP,
+                    width:int = 20,
+                    height:int = 5,
+                    color = arcade.color.WHITE_SMOKE,
+                    delta_time:float = FIXED_DELTA_TIME):
+
+        self.scene = scene
+        self.physics_engine = physicsEngine
+        self.cap = max(cap, size)
+        self.texture = solid_texture(width, height, color)
+        # what a ParticleRenderer draws for each projectile
+        self.quad = (width, height)
+        self.color = tuple(color) + (255,) * (4 - len(color))
+        self.radius = min(width, height) / 2
+        self.delta_time = delta_time
+
+        self.live = [] # sprites, in slot order
+        self.free = []
+        self.size = 0 # sprites made, live, free or being launched
+        self.count = 0
+        self.capacity = 0
+        self._allocate(size)
+
+        # collision type name -> handler(projectile, sprite)
+        self.handlers = {}
+        # collision type id -> handler, rebuilt when the engine learns a new type
+        self._handlers = {}
+        self._known_types = 0
+        # what they can hit: the engine's sprites, their shapes, reach around the body and filters,
+        # read again only when the engine's sprites change
+        self._target_sprites = None
+        self._targets = []
+        self._radii = None
+        self._filters = None
+
+        # counters, same meaning as BulletPool's
+        self.hits = 0
+        self.misses = 0
+        self.reuses = 0
+
+        for _ in range(size):
+            self.free.append(self._new_sprite())
+
+    def _allocate(self, capacity:int):
+        n = self.count
+        self.capacity = capacity
+        for name, shape, dtype in self.LAYOUT:
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                array[:n] = old[:n]
+            setattr(self, name, array)
+
+    def _new_sprite(self) -> Projectile:
+        sprite = Projectile(self.texture, self)
+        self.size += 1
+        sprite.position = BULLET_POOL_PARK
+        sprite.visible = False
+        self.scene.add_sprite("bullet_list", sprite)
+        return sprite
+
+    def add_hit_handler(self, collision_type:str, handler):
+        """Call handler(projectile, sprite) when a projectile hits a shape of collision_type"""
+        self.handlers[collision_type] = handler
+        self._known_types = 0
+
+    def acquire(self, parent) -> Projectile:
+        """Launch a projectile from parent"""
+        return self.acquire_many([parent])[0]
+
+    def acquire_many(self, parents:list, delays:list = None) -> list:
+        """Launch one projectile from each parent, delays are how far into the coming step each one was fired"""
+        parents = parents[:self.cap]
+        sprites = [self._take() for _ in parents]
+        n = len(sprites)
+        while self.count + n > self.capacity:
+            self._allocate(self.capacity * 2)
+        first = self.count
+        for slot, (sprite, parent) in enumerate(zip(sprites, parents), first):
+            sprite.slot = slot
+            sprite.active = True
+            sprite.parent = parent
+        self.live.extend(sprites)
+        self.count += n
+        slots = slice(first, first + n)
+
+        # same launch as Bullet.launch, the force it applies for one step becomes an impulse here
+        angle = np.array([parent.bodyangle for parent in parents])
+        direction = np.stack((np.cos(angle), np.sin(angle)), -1)
+        size = np.array([max(parent.width, parent.height) / 2 for parent in parents])
+        position = np.array([parent.position for parent in parents]) + direction * size[:, None]
+        velocity = np.array([tuple(parent.physics_object.body.velocity) for parent in parents])
+        velocity += direction * (BULLET_FORCE / BULLET_MASS * self.delta_time)
+        if delays is not None:
+            # fired part way into the step, it starts that far behind the muzzle
+            position -= velocity * np.asarray(delays, dtype=float)[:, None]
+        filters = np.array([parent.bullet_filter for parent in parents], dtype=np.int64) # group, categories, mask
+        self.position[slots] = position
+        self.previous[slots] = position
+        self.velocity[slots] = velocity
+        self.angle[slots] = angle
+        self.health[slots] = BULLET_HEALTH
+        self.group[slots] = filters[:, 0]
+        self.category[slots] = filters[:, 1]
+        self.mask[slots] = filters[:, 2]
+
+        for sprite, xy, degrees in zip(sprites, position.tolist(), np.degrees(angle).tolist()):
+            sprite.position = tuple(xy)
+            sprite.angle = degrees
+            sprite.visible = True
+        return sprites
+
+    def _take(self) -> Projectile:
+        if self.free:
+            self.hits += 1
+            return self.free.pop()
+        if self.size < self.cap:
+            self.misses += 1
+            return self._new_sprite()
+        # every bullet decays at the same rate, so the weakest one is the oldest
+        self.release(self.live[int(np.argmin(self.health[:self.count]))])
+        self.reuses += 1
+        return self.free.pop()
+
+    def release(self, sprite:Projectile):
+        """Retire a live projectile, the last one moves into its slot"""
+        if not sprite.active:
+            return
+        i = sprite.slot
+        last = self.count - 1
+        if i != last:
+            moved = self.live[last]
+            self.live[i] = moved
+            for name, _shape, _dtype in self.LAYOUT:
+                array = getattr(self, name)
+                array[i] = array[last]
+            moved.slot = i
+        self.live.pop()
+        self.count -= 1
+
+        sprite.active = False
+        sprite.parent = None
+        sprite.slot = -1
+        sprite.position = BULLET_POOL_PARK
+        sprite.visible = False
+        self.free.append(sprite)
+
+    def clear(self):
+        for sprite in list(self.live):
+            self.release(sprite)
+
+    #queries
+    #the same ones a SpatialHash answers, straight from the arrays so bullets need no index of their own
+    def query_rect(self, left:float, bottom:float, right:float, top:float) -> list:
+        """Every projectile inside the axis aligned box"""
+        x = self.position[:self.count, 0]
+        y = self.position[:self.count, 1]
+        inside = np.flatnonzero((x >= left) & (x <= right) & (y >= bottom) & (y <= top))
+        live = self.live
+        return [live[i] for i in inside.tolist()]
+
+    def query_radius(self, x:float, y:float, radius:float) -> list:
+        """Every projectile within radius of (x, y)"""
+        offset = self.position[:self.count] - (x, y)
+        inside = np.flatnonzero(np.einsum("ij,ij->i", offset, offset) <= radius * radius)
+        live = self.live
+        return [live[i] for i in inside.tolist()]
+
+    def place_sprites(self, alpha:float = 1.0, sprites = None):
+        """Move the sprites to where their projectiles are, alpha of the way through the last step
+
+        sprites limits it to the ones that will be drawn, the simulation itself never reads them
+        """
+        n = self.count
+        if n == 0:
+            return
+        if sprites is None:
+            slots = range(n)
+        else:
+            slots = [sprite.slot for sprite in sprites if type(sprite) is Projectile and sprite.system is self and sprite.active]
+        blended = (self.previous[:n] + (self.position[:n] - self.previous[:n]) * alpha).tolist()
+        live = self.live
+        for i in slots:
+            live[i].position = tuple(blended[i])
+
+    def render(self, renderer, alpha:float = 1.0):
+        """Queue every projectile on a ParticleRenderer, alpha of the way through the last step"""
+        n = self.count
+        if n == 0:
+            return
+        previous = self.previous[:n]
+        renderer.add(previous + (self.position[:n] - previous) * alpha, self.angle[:n], self.quad, self.color)
+
+    #update method
+    #moves every projectile one step, then resolves hits and expiry
+    def update(self, delta_time:float = FIXED_DELTA_TIME):
+        n = self.count
+        if n == 0:
+            return
+
+        # what pymunk does to a body with damping BULLET_DAMPING, semi implicit euler
+        self.previous[:n] = self.position[:n]
+        self.velocity[:n] *= BULLET_DAMPING ** delta_time
+        self.position[:n] += self.velocity[:n] * delta_time
+        self.health[:n] -= BULLET_DECAY * delta_time
+
+        hits = self.sweep()
+        for sprite, target, collision_type in hits:
+            if not sprite.active:
+                continue
+            handler = self._handlers.get(collision_type)
+            if handler is not None:
+                handler(sprite, target)
+            if sprite.active:
+                # anything solid stops a bullet, damage or not
+                self.release(sprite)
+
+        n = self.count
+        for sprite in [self.live[i] for i in np.flatnonzero(self.health[:n] <= 0).tolist()]:
+            self.release(sprite)
+
+
+    def sweep(self) -> list:
+        """(projectile, sprite, collision type) for the first ship each projectile ran into this step"""
+        self._refresh_types()
+        sprites = list(self.physics_engine.sprites)
+        if sprites != self._target_sprites:
+            self._refresh_targets(sprites)
+        targets = self._targets
+        if not targets:
+            return []
+
+        # broadphase, bounding circles of the ships against the bullets' paths, all in numpy. the engine
+        # has just copied the bodies' positions onto the sprites, reading them there is cheaper than pymunk
+        count = len(sprites)
+        centers = np.fromiter(chain.from_iterable([sprite.position for sprite in sprites]), dtype=float, count=2 * count).reshape(count, 2)
+        radii = self._radii
+        filters = self._filters
+        bullets, ships = self._pairs(centers, radii)
+        if bullets.size == 0:
+            return []
+        # collision layers and groups first, they are the cheapest test
+        group = self.group[bullets]
+        allowed = (((filters[ships, 1] & self.mask[bullets]) != 0)
+                   & ((filters[ships, 2] & self.category[bullets]) != 0)
+                   & ((group == 0) | (filters[ships, 0] != group)))
+        bullets = bullets[allowed]
+        ships = ships[allowed]
+        start = self.previous[bullets]
+        path = self.position[bullets] - start
+        length = np.maximum(np.einsum("ij,ij->i", path, path), 1e-12)
+        along = np.clip(np.einsum("ij,ij->i", centers[ships] - start, path) / length, 0, 1)
+        offset = centers[ships] - (start + path * along[:, None])
+        close = np.einsum("ij,ij->i", offset, offset) <= radii[ships] ** 2
+
+        # narrowphase, pymunk's own segment test on the few pairs that are left
+        first = {}
+        live = self.live
+        for bullet, ship in zip(bullets[close].tolist(), ships[close].tolist()):
+            sprite = live[bullet]
+            target, shape = targets[ship]
+            info = shape.segment_query(tuple(self.previous[bullet]), tuple(self.position[bullet]), self.radius)
+            if info.shape is None:
+                continue
+            best = first.get(bullet)
+            if best is None or info.alpha < best[0]:
+                first[bullet] = (info.alpha, sprite, target, shape.collision_type)
+        return [hit[1:] for hit in first.values()]
+
+    def _pairs(self, centers:np.ndarray, radii:np.ndarray) -> tuple:
+        """Indexes of (bullet, ship) pairs whose cells are close enough to maybe touch"""
+        n = self.count
+        size = SPATIAL_CELL_SIZE
+        travel = self.position[:n] - self.previous[:n]
+        reach = np.sqrt(np.einsum("ij,ij->i", travel, travel).max()) + radii.max()
+        spread = int(math.ceil(reach / size))
+
+        # every ship is put in the cells around its own, wide enough that a bullet that could
+        # touch it ends the step in one of them
+        steps = np.arange(-spread, spread + 1)
+        around = np.stack(np.meshgrid(steps, steps), -1).reshape(-1, 2)
+        cells = (np.floor(centers / size).astype(np.int64)[:, None, :] + around[None, :, :]).reshape(-1, 2)
+        owners = np.repeat(np.arange(len(centers)), len(around))
+        keys = cells[:, 0] * 4294967296 + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        owners = owners[order]
+
+        ends = np.floor(self.position[:n] / size).astype(np.int64)
+        bullet_keys = ends[:, 0] * 4294967296 + ends[:, 1]
+        low = np.searchsorted(keys, bullet_keys, "left")
+        high = np.searchsorted(keys, bullet_keys, "right")
+        counts = high - low
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        bullets = np.repeat(np.arange(n), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return bullets, owners[np.repeat(low, counts) + within]
+
+    def _refresh_targets(self, sprites:list):
+        """Read the shapes and filters of the engine's sprites, a filter changed in place later is not seen"""
+        physics_objects = self.physics_engine.sprites
+        self._target_sprites = sprites
+        self._targets = [(sprite, physics_objects[sprite].shape) for sprite in sprites]
+        self._radii = np.array([body_reach(shape) for _sprite, shape in self._targets], dtype=float).reshape(-1) + self.radius
+        self._filters = np.array([shape.filter for _sprite, shape in self._targets], dtype=np.int64).reshape(-1, 3) # group, categories, mask
+
+    def _refresh_types(self):
+        types = self.physics_engine.collision_types
+        if len(types) == self._known_types:
+            return
+        self._known_types = len(types)
+        self._handlers = {types.index(name): handler for name, handler in self.handlers.items() if name in types}
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "live": self.count,
+            "free": len(self.free),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reuses": self.reuses,
+        }
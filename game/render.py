@@ -0,0 +1,108 @@
+import numpy as np
+from arcade.gl import BufferDescription
+from game.constants import *
+
+PARTICLE_VERTEX_SHADER = """
+#version 330
+// arcade keeps the camera's projection in this block
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+in vec2 in_corner;
+in vec2 in_position;
+in float in_angle;
+in vec2 in_size;
+in vec4 in_color;
+out vec4 color;
+
+void main() {
+    float c = cos(in_angle);
+    float s = sin(in_angle);
+    vec2 corner = in_corner * in_size;
+    vec2 world = in_position + vec2(corner.x * c - corner.y * s, corner.x * s + corner.y * c);
+    gl_Position = proj.matrix * vec4(world, 0.0, 1.0);
+    color = in_color;
+}
+"""
+
+PARTICLE_FRAGMENT_SHADER = """
+#version 330
+in vec4 color;
+out vec4 fragColor;
+void main() {
+    fragColor = color;
+}
+"""
+
+# one instance, angle in radians and size the full width and height
+PARTICLE = np.dtype([
+    ("position", np.float32, 2),
+    ("angle", np.float32),
+    ("size", np.float32, 2),
+    ("color", np.uint8, 4),
+])
+
+
+#particle renderer
+#draws solid coloured quads, bullets now and thrust or explosion particles later, as one
+#instanced draw call. whatever wants drawing adds its rows to a numpy buffer during the
+#frame and draw() uploads them all in a single buffer write
+class ParticleRenderer:
+
+    def __init__(self, ctx, capacity:int = PARTICLE_CAPACITY):
+        self.ctx = ctx
+        self.program = ctx.program(vertex_shader=PARTICLE_VERTEX_SHADER, fragment_shader=PARTICLE_FRAGMENT_SHADER)
+        corners = np.array([-0.5, -0.5, 0.5, -0.5, -0.5, 0.5, 0.5, 0.5], dtype=np.float32)
+        self.corners = ctx.buffer(data=corners)
+        self.rows = np.zeros(0, dtype=PARTICLE)
+        self.count = 0
+        self.instances = None
+        self.geometry = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity:int):
+        rows = np.zeros(capacity, dtype=PARTICLE)
+        rows[:self.count] = self.rows[:self.count]
+        self.rows = rows
+        if self.geometry is not None:
+            # the vertex arrays go at the window's next gc, the buffer right away
+            self.geometry.flush()
+            self.instances.delete()
+        self.instances = self.ctx.buffer(reserve=capacity * PARTICLE.itemsize, usage="stream")
+        self.geometry = self.ctx.geometry([
+            BufferDescription(self.corners, "2f", ["in_corner"]),
+            BufferDescription(self.instances, "2f 1f 2f 4f1", ["in_position", "in_angle", "in_size", "in_color"], instanced=True),
+        ], mode=self.ctx.TRIANGLE_STRIP)
+
+    def clear(self):
+        self.count = 0
+
+    def add(self, positions:np.ndarray, angles, sizes, colors) -> np.ndarray:
+        """Queue len(positions) quads for this frame, angles in radians, the others per quad or shared
+
+        returns the new rows, so a caller can fill them further in place
+        """
+        n = len(positions)
+        if self.count + n > len(self.rows):
+            capacity = len(self.rows)
+            while self.count + n > capacity:
+                capacity *= 2
+            self._allocate(capacity)
+        rows = self.rows[self.count:self.count + n]
+        rows["position"] = positions
+        rows["angle"] = angles
+        rows["size"] = sizes
+        rows["color"] = colors
+        self.count += n
+        return rows
+
+    def draw(self):
+        """Upload this frame's quads and draw them, then start the next frame empty"""
+        n = self.count
+        if n == 0:
+            return
+        self.instances.write(self.rows[:n])
+        with self.ctx.enabled(self.ctx.BLEND):
+            self.geometry.render(self.program, vertices=4, instances=n)
+        self.count = 0
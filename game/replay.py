@@ -0,0 +1,97 @@
+import struct
+
+#replay file layout, little endian
+#header: magic, version, fixed delta time, rng seed, flags the run was set up with
+#then a stream of tagged records:
+#   input: tick, aim x, aim y, button bits, written only on ticks where something changed
+#   end:   tick the recording stopped at, digest of the world state at that tick
+MAGIC = b"IHRP"
+VERSION = 2
+HEADER = struct.Struct("<4sHdQB")
+INPUT = struct.Struct("<BIddB")
+END = struct.Struct("<BI8s")
+INPUT_TAG = 0
+END_TAG = 1
+
+THRUST_BIT = 1
+FIRE_BIT = 2
+
+# header flags, a run streaming world chunks plays out differently from one that doesn't
+STREAMING_FLAG = 1
+
+
+class ReplayError(Exception):
+    pass
+
+
+#replay recorder
+#writes the inputs the simulation consumed, step by step
+class ReplayRecorder:
+
+    def __init__(self, path:str, seed:int, delta_time:float, streaming:bool = False):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, delta_time, seed, STREAMING_FLAG if streaming else 0))
+        self.last = None
+
+    def capture(self, tick:int, aim:tuple, thrust:bool, fire:bool):
+        state = (aim[0], aim[1], (THRUST_BIT if thrust else 0) | (FIRE_BIT if fire else 0))
+        if state != self.last:
+            self.file.write(INPUT.pack(INPUT_TAG, tick, *state))
+            self.last = state
+
+    def close(self, tick:int, digest:bytes):
+        self.file.write(END.pack(END_TAG, tick, digest))
+        self.file.close()
+
+
+#replay player
+#hands the recorded inputs back to the simulation on the tick they were captured
+class ReplayPlayer:
+
+    def __init__(self, path:str):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        if len(data) < HEADER.size:
+            raise ReplayError(f"{path} is too short to be a replay")
+        magic, version = struct.unpack_from("<4sH", data, 0)
+        if magic != MAGIC:
+            raise ReplayError(f"{path} is not a replay file")
+        if version != VERSION:
+            raise ReplayError(f"{path} is replay version {version}, expected {VERSION}")
+        _magic, _version, self.delta_time, self.seed, flags = HEADER.unpack_from(data, 0)
+        self.streaming = bool(flags & STREAMING_FLAG)
+
+        self.inputs = [] # (tick, aim x, aim y, buttons)
+        self.end_tick = None
+        self.digest = None
+        offset = HEADER.size
+        while offset < len(data):
+            tag = data[offset]
+            if tag == INPUT_TAG:
+                _tag, *record = INPUT.unpack_from(data, offset)
+                self.inputs.append(tuple(record))
+                offset += INPUT.size
+            elif tag == END_TAG:
+                _tag, self.end_tick, self.digest = END.unpack_from(data, offset)
+                offset += END.size
+            else:
+                raise ReplayError(f"{path} has an unknown record at byte {offset}")
+
+        self.cursor = 0
+
+    def finished(self, tick:int) -> bool:
+        if self.end_tick is None:
+            return self.cursor >= len(self.inputs)
+        return tick >= self.end_tick
+
+    def apply(self, simulation):
+        """Set the simulation's inputs for the tick it is about to run"""
+        inputs = self.inputs
+        while self.cursor < len(inputs) and inputs[self.cursor][0] <= simulation.tick:
+            _tick, x, y, buttons = inputs[self.cursor]
+            simulation.set_aim(x, y)
+            simulation.thrust_pressed = bool(buttons & THRUST_BIT)
+            simulation.fire_pressed = bool(buttons & FIRE_BIT)
+            self.cursor += 1
@@ -0,0 +1,103 @@
+import time
+from collections import deque
+from game.constants import *
+
+#ai scheduler
+#runs the expensive AI decisions, retargeting now and pathfinding or threat checks later, a few
+#ships at a time round robin until the step's budget is spent. steering still runs every step in
+#the FleetController, a bigger fleet only makes each ship's decisions older, not the step slower.
+#a run that has to reproduce exactly swaps the clock for a fixed quota of decisions per step
+class AIScheduler:
+
+    def __init__(self, budget_ms:float = AI_BUDGET_MS, quota:int = AI_DECISION_QUOTA):
+        self.budget = budget_ms / 1000
+        self.quota = quota
+        self.tasks = []
+        self.queue = deque() # ships in turn order, removed ones are dropped when they come up
+        self.ships = set()
+        self.steps = 0
+
+        # counters
+        self.decisions = 0 # made in the last step
+        self.total = 0
+        self.overruns = 0 # steps that went over the budget
+        self.last_ms = 0.0
+        self.worst_ms = 0.0
+        self.cost = 0.0 # running average seconds per decision, a step stops before one would overrun
+        # a round is every ship deciding once, its length in steps is how stale a decision can get
+        self.round_left = 0
+        self.round_start = 0
+        self.round_steps = 0
+
+    def add_task(self, decide):
+        """Run decide(ship) on every ship once a round, tasks run in the order they were added"""
+        self.tasks.append(decide)
+
+    def add(self, ship):
+        self.ships.add(ship)
+        self.queue.append(ship)
+        ship.ai = self
+
+    def remove(self, ship):
+        self.ships.discard(ship)
+        ship.ai = None
+
+    #run method
+    #decides for the ships whose turn it is, at least one a step so every ship gets there eventually
+    def run(self, fixed:bool = False) -> int:
+        clock = time.perf_counter
+        start = clock()
+        deadline = start + self.budget
+        limit = self.quota if fixed else len(self.queue)
+        queue = self.queue
+        ships = self.ships
+        tasks = self.tasks
+        self.steps += 1
+
+        done = 0
+        turns = len(queue)
+        while turns and done < limit:
+            if done and not fixed and clock() + self.cost > deadline:
+                break
+            turns -= 1
+            ship = queue.popleft()
+            if ship not in ships:
+                continue
+            for decide in tasks:
+                decide(ship)
+            queue.append(ship)
+            done += 1
+
+            if self.round_left <= 0:
+                self.round_left = len(ships)
+                self.round_start = self.steps
+            self.round_left -= 1
+            if self.round_left == 0:
+                self.round_steps = self.steps - self.round_start + 1
+
+        elapsed = clock() - start
+        if done:
+            self.cost += (elapsed / done - self.cost) * 0.1
+        self.decisions = done
+        self.total += done
+        self.last_ms = elapsed * 1000
+        self.worst_ms = max(self.worst_ms, self.last_ms)
+        if elapsed > self.budget:
+            self.overruns += 1
+        return done
+
+    def clear(self):
+        self.queue.clear()
+        self.ships.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "ships": len(self.ships),
+            "decisions": self.decisions,
+            "per_step": self.total / self.steps if self.steps else 0.0,
+            "round_steps": self.round_steps,
+            "overruns": self.overruns,
+            "last_ms": self.last_ms,
+            "worst_ms": self.worst_ms,
+        }
@@ -0,0 +1,367 @@
+import os
+import time
+import random
+import argparse
+import multiprocessing
+from itertools import chain
+from multiprocessing import shared_memory
+import numpy as np
+import arcade
+from arcade.pymunk_physics_engine import PymunkPhysicsEngine
+from . import entitys
+from . import layers
+from . import ai
+from .bulletpool import BulletPool
+from .fleet import FleetController
+from .weapons import WeaponScheduler
+from .assets import AssetRegistry
+from .components import ComponentStore
+from .spatial import SpatialHash
+from game.constants import *
+
+#world sharding
+#the world is cut into vertical strips, one worker process simulates each strip with its own
+#physics engine, and every entity has a row in a table in shared memory that all of them can see.
+#a step has two phases with a barrier in between:
+#   simulate: each worker steps what it owns and writes those rows, including which strip they are in now
+#   exchange: each worker reads the table, lets go of what left, takes over what arrived and
+#             refreshes ghosts, kinematic copies of the neighbours' ships close to its edges
+#rows are only written during simulate and only by their owner, so nothing needs a lock
+#ships decide and take hits by the same rules as in the single process game, with focus standing in
+#for the player they close in on
+
+FREE = 0
+SHIP = 1
+BULLET = 2
+
+#one row per entity, the row index is its id for as long as it lives
+ROW = np.dtype([
+    ("kind", np.int8),
+    ("owner", np.int16),
+    ("x", np.float64),
+    ("y", np.float64),
+    ("angle", np.float64),
+    ("vx", np.float64),
+    ("vy", np.float64),
+    ("spin", np.float64),
+    # ship only
+    ("tx", np.float64),
+    ("ty", np.float64),
+    ("err_sum", np.float64),
+    ("last_input", np.float64),
+    ("health", np.float64),
+])
+#the columns every entity has, in body order
+STATE = ("x", "y", "angle", "vx", "vy", "spin")
+
+
+def region_of(x, regions:int):
+    """Index of the strip that owns x, works on single values and arrays"""
+    width = SHARD_WORLD_SIZE / regions
+    return np.clip(np.floor((np.asarray(x) + SHARD_WORLD_SIZE / 2) / width), 0, regions - 1).astype(np.int16)
+
+
+#shard worker
+#one strip of the world, lives in its own process
+class ShardWorker:
+
+    def __init__(self, region:int, regions:int, table:np.ndarray, ships:int, seed:int, fire:bool = False, focus:tuple = (0, 0)):
+        self.region = region
+        self.regions = regions
+        self.table = table
+        self.fire = fire
+        self.focus = focus
+        self.random = random.Random(hash((seed, region)))
+        width = SHARD_WORLD_SIZE / regions
+        self.left = -SHARD_WORLD_SIZE / 2 + region * width
+        self.right = self.left + width
+        # bullets fired here take their row from this block, the rows after the ships
+        start = ships + region * SHARD_BULLET_SLOTS
+        self.block = slice(start, start + SHARD_BULLET_SLOTS)
+
+        self.physics_engine = PymunkPhysicsEngine(damping=DEFAULT_DAMPING, gravity=GRAVITY)
+        self.scene = arcade.Scene()
+        for name in ("Ai_list", "bullet_list", "ghost_list"):
+            self.scene.add_sprite_list(name, sprite_list=arcade.SpriteList(lazy=True))
+        self.assets = AssetRegistry()
+        self.assets.load()
+        self.entities = ComponentStore()
+        self.bullet_pool = BulletPool(self.scene, self.physics_engine, entities=self.entities)
+        self.fleet = FleetController()
+        self.weapons = WeaponScheduler(self.bullet_pool)
+
+        self.ships = {} # row -> ship
+        self.bullets = {} # row -> bullet
+        self.bullet_rows = {} # bullet -> row
+        self.ghosts = {} # row -> kinematic sprite
+        # every ship here and the ghosts, what the AI decisions look around in
+        self.ship_index = SpatialHash()
+        # handed over bullets lost their shooter, they still can't hit each other
+        self.bullet_filter = layers.shape_filter(LAYER_AI_BULLET)
+        self.ghost_filter = layers.shape_filter(LAYER_AI)
+
+        def bulletxcargo_hit_handler(bullet_sprite:entitys.Bullet, cargo_sprite:entitys.ship, _arbiter, _space, _data):
+            entitys.bullet_hit(bullet_sprite, cargo_sprite)
+        self.physics_engine.add_collision_handler("bullet", "cargoship", post_handler=bulletxcargo_hit_handler)
+        # a ghost belongs to another strip, hits on it are dealt with there once the bullet crosses over
+        self.physics_engine.add_collision_handler("bullet", "ghost", begin_handler=lambda *_args: False)
+
+        self.exchange()
+
+    #simulate method
+    #phase one, steps everything this strip owns and publishes it
+    def simulate(self, delta_time:float):
+        self.entities.sync_transforms()
+        self.fleet.update(delta_time)
+        self.scene.on_update(delta_time, ["Ai_list"])
+        self.bullet_pool.update(delta_time)
+
+        kind = self.table["kind"]
+        for row, ship in list(self.ships.items()):
+            if ship.health <= 0:
+                del self.ships[row]
+                ship.destroy()
+                kind[row] = FREE
+
+        self.ship_index.sync(chain(self.ships.values(), self.ghosts.values()))
+        for ship in self.ships.values():
+            ai.retarget(self.ship_index, ship, self.focus, self.random)
+            if abs(ship.pid_output) <= 10:
+                ship.thrust(CARGO_MOVE_FORCE)
+            if self.fire:
+                ship.fire_guns()
+
+        self.weapons.update(delta_time)
+        self.physics_engine.step(delta_time)
+        self.publish()
+
+    def publish(self):
+        table = self.table
+        kind = table["kind"]
+
+        # spent bullets give their row back, new ones claim one from this strip's block
+        live = self.bullet_pool.live
+        for row, bullet in list(self.bullets.items()):
+            if bullet not in live:
+                del self.bullets[row]
+                del self.bullet_rows[bullet]
+                kind[row] = FREE
+        new = [bullet for bullet in live if bullet not in self.bullet_rows]
+        if new:
+            free = (np.flatnonzero(kind[self.block] == FREE) + self.block.start).tolist()
+            # a full block just means the extra bullets stay local to this strip
+            for bullet, row in zip(new, free):
+                self.bullets[row] = bullet
+                self.bullet_rows[bullet] = row
+                kind[row] = BULLET
+
+        ship_rows = list(self.ships)
+        bullet_rows = list(self.bullets)
+        rows = ship_rows + bullet_rows
+        if not rows:
+            return
+        bodies = [self.ships[row].physics_object.body for row in ship_rows]
+        bodies += [self.bullets[row].physics_object.body for row in bullet_rows]
+        state = np.array([(*body.position, body.angle, *body.velocity, body.angular_velocity) for body in bodies])
+        for column, name in enumerate(STATE):
+            table[name][rows] = state[:, column]
+        table["owner"][rows] = region_of(state[:, 0], self.regions)
+
+        # the rest from the store and the fleet
+        entities = self.entities
+        ids = [self.ships[row].entity for row in ship_rows] + [self.bullets[row].entity for row in bullet_rows]
+        table["health"][rows] = entities.health[ids]
+        if ship_rows:
+            ids = ids[:len(ship_rows)]
+            table["tx"][ship_rows] = entities.target[ids, 0]
+            table["ty"][ship_rows] = entities.target[ids, 1]
+            slots = [self.ships[row].fleet_index for row in ship_rows]
+            table["err_sum"][ship_rows] = self.fleet.err_sum[slots]
+            table["last_input"][ship_rows] = self.fleet.last_input[slots]
+
+    #exchange method
+    #phase two, only reads the table
+    def exchange(self):
+        table = self.table
+        kind = table["kind"]
+        owner = table["owner"]
+        region = self.region
+
+        # let go of whatever crossed into another strip
+        for row in [row for row in self.ships if owner[row] != region]:
+            self.ships.pop(row).destroy()
+        for row in [row for row in self.bullets if owner[row] != region]:
+            bullet = self.bullets.pop(row)
+            del self.bullet_rows[bullet]
+            self.bullet_pool.release(bullet)
+
+        # take over whatever crossed into this one
+        for row in np.flatnonzero((kind != FREE) & (owner == region)).tolist():
+            if row in self.ships or row in self.bullets:
+                continue
+            record = table[row]
+            if record["kind"] == SHIP:
+                self.ships[row] = self.adopt_ship(record)
+            else:
+                x, y, angle, vx, vy, _spin = self.state_of(record)
+                bullet = self.bullet_pool.restore(x, y, angle, (vx, vy), float(record["health"]), self.bullet_filter)
+                self.bullets[row] = bullet
+                self.bullet_rows[bullet] = row
+
+        # ghosts of the neighbours' ships near the edges, so ships still bump into each other across them
+        x = table["x"]
+        near = np.flatnonzero((kind == SHIP) & (owner != region)
+                              & (x >= self.left - SHARD_GHOST_MARGIN) & (x <= self.right + SHARD_GHOST_MARGIN))
+        near = near.tolist()
+        for row in set(self.ghosts).difference(near):
+            entitys.kill(self.ghosts.pop(row))
+        for row in near:
+            ghost = self.ghosts.get(row)
+            if ghost is None:
+                ghost = self.ghosts[row] = arcade.Sprite(texture=self.assets.ship_texture("cargo_base"), scale=SPRITE_SCALING)
+                self.scene.add_sprite("ghost_list", ghost)
+                self.physics_engine.add_sprite(ghost, mass=CARGO_MASS, moment=CARGO_MOMENT,
+                                               body_type=PymunkPhysicsEngine.KINEMATIC, collision_type="ghost")
+                ghost.physics_object = self.physics_engine.get_physics_object(ghost)
+                ghost.physics_object.shape.filter = self.ghost_filter
+            self.set_body(self.physics_engine.get_physics_object(ghost).body, table[row])
+
+    def adopt_ship(self, record) -> entitys.ship:
+        target = (float(record["tx"]), float(record["ty"]))
+        ship = entitys.ship(self.assets.ship_texture("cargo_base"), SPRITE_SCALING, scene=self.scene, physicsEngine=self.physics_engine, max_vel=CARGO_MAX_SPEED, mass=CARGO_MASS, moment=CARGO_MOMENT, cooldown=CARGO_GUN_COOLDOWN, list="Ai_list", collision_type="cargoship", targetcoord=target, bullet_pool=self.bullet_pool, health=float(record["health"]), assets=self.assets, layer=LAYER_AI, entities=self.entities)
+        self.set_body(ship.physics_object.body, record)
+        ship.position = ship.physics_object.body.position
+        ship.pid.err_sum = float(record["err_sum"])
+        ship.pid.last_input = float(record["last_input"])
+        self.fleet.add(ship)
+        self.weapons.add(ship)
+        return ship
+
+    @staticmethod
+    def state_of(record) -> list:
+        return [float(record[name]) for name in STATE]
+
+    def set_body(self, body, record):
+        x, y, angle, vx, vy, spin = self.state_of(record)
+        body.position = (x, y)
+        body.angle = angle
+        body.velocity = (vx, vy)
+        body.angular_velocity = spin
+
+
+def _work(region, regions, name, rows, ships, seed, fire, focus, delta_time, start, exchanged, done, stop):
+    memory = shared_memory.SharedMemory(name=name)
+    table = np.ndarray((rows,), dtype=ROW, buffer=memory.buf)
+    worker = ShardWorker(region, regions, table, ships, seed, fire, focus)
+    done.wait()
+    while True:
+        start.wait()
+        if stop.value:
+            break
+        worker.simulate(delta_time)
+        exchanged.wait()
+        worker.exchange()
+        done.wait()
+    del worker, table
+    memory.close()
+
+
+#sharded world
+#the main process side, it starts the workers, steps them in lockstep and reads positions for drawing
+class ShardedWorld:
+
+    def __init__(self, ships:int, regions:int = None, seed:int = 0, fire:bool = False, delta_time:float = FIXED_DELTA_TIME,
+                 focus:tuple = (0, 0)):
+        self.regions = regions or os.cpu_count()
+        self.delta_time = delta_time
+        self.tick = 0
+        rows = ships + self.regions * SHARD_BULLET_SLOTS
+        self.memory = shared_memory.SharedMemory(create=True, size=rows * ROW.itemsize)
+        self.table = np.ndarray((rows,), dtype=ROW, buffer=self.memory.buf)
+        self.table[:] = np.zeros(rows, dtype=ROW)
+
+        # ships spread over the whole world, each heading somewhere else
+        rng = np.random.default_rng(seed)
+        half = SHARD_WORLD_SIZE / 2
+        fleet = self.table[:ships]
+        fleet["kind"] = SHIP
+        fleet["x"] = rng.uniform(-half, half, ships)
+        fleet["y"] = rng.uniform(-half, half, ships)
+        fleet["angle"] = rng.uniform(-np.pi, np.pi, ships)
+        fleet["tx"] = rng.uniform(-half, half, ships)
+        fleet["ty"] = rng.uniform(-half, half, ships)
+        fleet["health"] = CARGO_HEALTH
+        fleet["owner"] = region_of(fleet["x"], self.regions)
+
+        # spawn so the workers don't inherit the parent's window or gl state
+        context = multiprocessing.get_context("spawn")
+        self.start = context.Barrier(self.regions + 1)
+        self.exchanged = context.Barrier(self.regions)
+        self.done = context.Barrier(self.regions + 1)
+        self.stop = context.Value("b", 0)
+        self.workers = [context.Process(target=_work, daemon=True,
+                                        args=(region, self.regions, self.memory.name, rows, ships, seed, fire, focus, delta_time,
+                                              self.start, self.exchanged, self.done, self.stop))
+                        for region in range(self.regions)]
+        for worker in self.workers:
+            worker.start()
+        # every worker has built its strip
+        self.done.wait(SHARD_TIMEOUT)
+
+    def step(self):
+        self.start.wait(SHARD_TIMEOUT)
+        self.done.wait(SHARD_TIMEOUT)
+        self.tick += 1
+
+    def run(self, steps:int) -> float:
+        """Run steps fixed steps back to back, returns the wall time it took"""
+        start = time.perf_counter()
+        for _ in range(steps):
+            self.step()
+        return time.perf_counter() - start
+
+    def positions(self, kind:int = SHIP) -> np.ndarray:
+        """x, y and angle (radians) of every live entity of a kind, safe to call between steps"""
+        table = self.table
+        return table[table["kind"] == kind][["x", "y", "angle"]].copy()
+
+    def close(self):
+        if self.workers:
+            self.stop.value = 1
+            self.start.wait(SHARD_TIMEOUT)
+            for worker in self.workers:
+                worker.join()
+            self.workers = []
+        del self.table
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+        return False
+
+
+#headless entry point
+#python -m game.sharding --ships 10000 --workers 4 --steps 600
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="run a sharded world without a window")
+    parser.add_argument("--ships", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fire", action="store_true", help="every ship keeps shooting")
+    args = parser.parse_args(argv)
+
+    with ShardedWorld(args.ships, regions=args.workers, seed=args.seed, fire=args.fire) as world:
+        elapsed = world.run(args.steps)
+        alive = len(world.positions())
+    print(f"{args.ships} ships on {args.workers} workers: {args.steps} steps in {elapsed:.2f}s, "
+          f"{args.steps / elapsed:.0f} steps/s, {alive} ships left")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,428 @@
+import math
+import time
+import struct
+import hashlib
+import argparse
+import arcade
+import random
+import numpy as np
+from itertools import chain
+from arcade.pymunk_physics_engine import PymunkPhysicsEngine
+from . import entitys
+from . import ai
+from .bulletpool import BulletPool
+from .projectiles import ProjectileSystem
+from .audio import SoundManager
+from .fleet import FleetController
+from .weapons import WeaponScheduler
+from .scheduler import AIScheduler
+from .spatial import SpatialHash
+from .profiler import Profiler
+from .replay import ReplayRecorder, ReplayPlayer
+from .assets import AssetRegistry
+from .components import ComponentStore
+from .telemetry import TelemetrySink, HIT_EVENT
+from .effects import EffectQueue, HIT_EFFECT, EXPLOSION_EFFECT
+from .world import ChunkManager
+from game.constants import *
+
+SCENE_LISTS = ("player_list", "pointer_list", "ships_list", "bullet_list", "Ai_list")
+UPDATE_LISTS = ["Ai_list", "player_list"]
+
+#simulation class
+#owns the physics engine, scene and game rules, and advances them in fixed steps
+#needs no window, so it can run headless and as fast as the cpu allows
+class Simulation:
+
+    def __init__(self, delta_time:float = FIXED_DELTA_TIME, headless:bool = False, profiler:Profiler = None, seed:int = None, fast_bullets:bool = BULLET_FAST_PATH, streaming:bool = False):
+        self.delta_time = delta_time
+        self.headless = headless
+        self.fast_bullets = fast_bullets
+        self.streaming = streaming
+        self.tick = 0
+        self.profiler = profiler if profiler is not None else Profiler()
+
+        # every random decision goes through this, so a seed and the inputs reproduce a run
+        self.seed = seed if seed is not None else random.randrange(2**63)
+        self.random = random.Random(self.seed)
+        self.recorder: ReplayRecorder = None
+        self.playback: ReplayPlayer = None
+        self.telemetry: TelemetrySink = None
+        self.world: ChunkManager = None
+
+        # controls, set by whatever is driving the simulation
+        self.thrust_pressed = False
+        self.fire_pressed = False
+        # a click released before the step ran still fires once
+        self.fire_latched = False
+
+        self.scene = None
+        self.physics_engine: PymunkPhysicsEngine = None
+
+        # sprite position and angle before the last step, for render interpolation
+        self.previous = {}
+        self._rendered = {}
+
+    #setup method
+    #loads the physics, scene and game assets
+    def setup(self):
+        self.physics_engine = PymunkPhysicsEngine(damping=DEFAULT_DAMPING,
+                                                  gravity=GRAVITY)
+
+        self.scene = arcade.Scene()
+        for name in SCENE_LISTS:
+            # lazy sprite lists don't touch opengl until they are drawn
+            self.scene.add_sprite_list(name, sprite_list=arcade.SpriteList(lazy=self.headless))
+
+        # Load every image once, straight into the texture atlas when there is a window
+        self.assets = AssetRegistry()
+        self.assets.load(ctx=None if self.headless else arcade.get_window().ctx)
+
+        # Set up the pointer
+        self.pointer_sprite = entitys.Pointer(self.assets.texture("pointer"), GUI_SCALING)
+        self.mini_pointer = entitys.Pointer(self.assets.texture("minipointer"), GUI_SCALING)
+
+        self.scene.add_sprite("pointer_list", self.pointer_sprite)
+        self.scene.add_sprite("pointer_list", self.mini_pointer)
+
+        # Load sounds once, everything shares the decoded handles
+        self.sounds = SoundManager(enabled=SOUND_ENABLED and not self.headless)
+        self.sounds.load()
+        # thrust, muzzle, hit and explosion emits for the window's particles, nothing to draw them headless
+        self.effects = EffectQueue() if not self.headless else None
+
+        # per entity state of the ships and pooled bullets, the sprites only draw it
+        self.entities = ComponentStore()
+
+        # Set up the bullets, array backed projectiles or pooled pymunk bodies
+        if self.fast_bullets:
+            self.bullet_pool = ProjectileSystem(self.scene, self.physics_engine, delta_time=self.delta_time)
+        else:
+            self.bullet_pool = BulletPool(self.scene, self.physics_engine, entities=self.entities)
+
+        # guns fire on their own cooldowns, every shot of a step is launched in one batch
+        self.weapons = WeaponScheduler(self.bullet_pool)
+
+        # Set up the player
+        self.player_sprite = entitys.ship(self.assets.ship_texture("ship"), SPRITE_SCALING, scene=self.scene, physicsEngine=self.physics_engine, max_vel=PLAYER_MAX_SPEED, mass=PLAYER_MASS,moment=PLAYER_MOMENT, cooldown=PLAYER_GUN_COOLDOWN, list="player_list", collision_type="player", target=self.pointer_sprite, bullet_pool=self.bullet_pool, sounds=self.sounds, assets=self.assets, layer=LAYER_PLAYER, entities=self.entities, effects=self.effects)
+        self.player_sprite.physics_object.body._set_position((500, 0))
+        self.weapons.add(self.player_sprite)
+
+        # AI ships are steered together in one batch
+        self.fleet = FleetController()
+        # and take turns at the costlier decisions, as many as fit in the step's budget
+        self.ai = AIScheduler()
+        self.ai.add_task(self.retarget)
+        # debug cargo ship
+        self.cargodebug = self.spawn_cargo_ship(0, 0)
+
+        # proximity lookups for ships and live bullets, projectiles answer the same queries from their arrays
+        self.ship_index = SpatialHash()
+        self.bullet_index = self.bullet_pool if self.fast_bullets else SpatialHash()
+        # the chunks around the player are generated from the seed and unloaded again behind them
+        if self.streaming:
+            self.stop_world()
+            self.world = ChunkManager(self, self.seed)
+            self.world.update(*self.player_sprite.position)
+        # synced lazily, a headless run with nothing culling never pays for it
+        self.indexed_tick = -1
+
+        # bullets never meet each other, the collision layers keep those pairs out of the broadphase
+        # Set up Cargoships
+        def bulletxcargo_hit_handler(bullet_sprite:entitys.Bullet, cargo_sprite:entitys.ship, _arbiter, _space, _data):
+            self.bullet_hit(bullet_sprite, cargo_sprite)
+        self.physics_engine.add_collision_handler("bullet", "cargoship", post_handler=bulletxcargo_hit_handler)
+        if self.fast_bullets:
+            self.bullet_pool.add_hit_handler("cargoship", self.bullet_hit)
+
+    def bullet_hit(self, bullet_sprite, cargo_sprite:entitys.ship):
+        """A bullet or projectile ran into a cargo ship"""
+        entitys.bullet_hit(bullet_sprite, cargo_sprite, self.observe_hit)
+
+    def observe_hit(self, bullet_sprite, cargo_sprite:entitys.ship):
+        """Telemetry and sparks for a hit that counts"""
+        if self.telemetry is not None:
+            source = bullet_sprite.parent.entity if bullet_sprite.parent is not None else -1
+            self.telemetry.event(self.tick, HIT_EVENT, cargo_sprite.entity, source, bullet_sprite.health)
+        if self.effects is not None:
+            # sparks thrown back the way the bullet came
+            x, y, angle = bullet_sprite.hit_point()
+            self.effects.emit(HIT_EFFECT, x, y, angle + math.pi, *cargo_sprite.physics_object.body.velocity)
+
+    def spawn_cargo_ship(self, x:float, y:float, target:tuple = None, health:float = CARGO_HEALTH, pid:tuple = None) -> entitys.ship:
+        """Add an AI cargo ship at (x, y), heading for target or holding position
+
+        pid is the (err_sum, last_input) of a ship being brought back, a new one starts from rest
+        """
+        cargo = entitys.ship(self.assets.ship_texture("cargo_base"),  SPRITE_SCALING, scene=self.scene, physicsEngine=self.physics_engine, max_vel=CARGO_MAX_SPEED, mass=CARGO_MASS,moment=CARGO_MOMENT, cooldown=CARGO_GUN_COOLDOWN, list="Ai_list", collision_type="cargoship", targetcoord=target if target is not None else (x, y), bullet_pool=self.bullet_pool, sounds=self.sounds, health=health, assets=self.assets, layer=LAYER_AI, entities=self.entities, effects=self.effects)
+        cargo.position = (x, y)
+        cargo.physics_object.body.position = (x, y)
+        # the store copied the sprite's position before it was moved, the next sync is a step away
+        self.entities.position[cargo.entity] = (x, y)
+        if pid is not None:
+            cargo.pid.err_sum, cargo.pid.last_input = pid
+        self.fleet.add(cargo)
+        self.weapons.add(cargo)
+        self.ai.add(cargo)
+        return cargo
+
+    #step method
+    #advances the game by exactly one fixed timestep
+    def step(self):
+        delta_time = self.delta_time
+        profiler = self.profiler
+        self.remember_positions()
+
+        # inputs are fixed for the whole step, recorded or replayed right here
+        if self.playback is not None:
+            self.playback.apply(self)
+        firing = self.fire_pressed or self.fire_latched
+        self.fire_latched = False
+        if self.recorder is not None:
+            self.recorder.capture(self.tick, self.pointer_sprite.position, self.thrust_pressed, firing)
+
+        # Apply acceleration, harder the further away the pointer is
+        if self.thrust_pressed:
+            thrust_amout = math.log(max(self.player_sprite.distance_to_target, 1))
+            self.player_sprite.thrust(PLAYER_MOVE_FORCE*thrust_amout)
+
+        with profiler.scope("fleet"):
+            self.entities.sync_transforms()
+            self.fleet.update(delta_time, focus=self.player_sprite.position)
+        with profiler.scope("scene_update"):
+            # bullets are moved or decayed by their system, their sprites have nothing to update
+            self.scene.on_update(delta_time, UPDATE_LISTS)
+            if not self.fast_bullets:
+                self.bullet_pool.update(delta_time)
+
+
+        if firing:
+            self.player_sprite.fire_guns()
+
+        with profiler.scope("ai"):
+            self.update_ai()
+        with profiler.scope("decisions"):
+            # clock based budgets differ run to run, a recording and its replay decide by count
+            self.ai.run(fixed=self.recorder is not None or self.playback is not None)
+        with profiler.scope("weapons"):
+            self.weapons.update(delta_time)
+
+        # Step the engine
+        with profiler.scope("physics"):
+            self.physics_engine.step(delta_time)
+        if self.fast_bullets:
+            with profiler.scope("projectiles"):
+                self.bullet_pool.update(delta_time)
+        if self.world is not None:
+            with profiler.scope("world"):
+                self.world.update(*self.player_sprite.position)
+        if self.telemetry is not None:
+            with profiler.scope("telemetry"):
+                self.telemetry.record(self.tick, self.entities, len(self.bullet_pool.live))
+        self.tick += 1
+
+    def update_ai(self):
+        """Per step AI, clearing out the dead and the thrust rule, decisions are left to self.ai"""
+        ai_list = self.scene.name_mapping['Ai_list']
+        entities = self.entities
+        ids = np.fromiter([sprite.entity for sprite in ai_list], dtype=np.int64, count=len(ai_list))
+        # ships shot down by the collision handlers during the last physics step
+        dead = (entities.health[ids] <= 0).tolist()
+        steady = (np.abs(entities.output[ids]) <= 10).tolist() # if the Ai ship is not correcting its rotation by a large amount, apply thrust
+
+        for sprite, dead, steady in zip(list(ai_list), dead, steady):
+            sprite:entitys.ship
+            if dead:
+                if self.effects is not None:
+                    self.effects.emit(EXPLOSION_EFFECT, sprite.center_x, sprite.center_y, 0.0, *sprite.physics_object.body.velocity)
+                sprite.destroy()
+                # the decisions below query the ship index, it can't still hold this one
+                self.indexed_tick = -1
+                continue
+            if steady:
+                sprite.thrust(CARGO_MOVE_FORCE)
+
+    def retarget(self, sprite:entitys.ship):
+        """AI decision, see ai.retarget, ships close in on the player"""
+        self.update_indexes()
+        ai.retarget(self.ship_index, sprite, self.player_sprite.position, self.random, self.world)
+
+    def update_indexes(self):
+        """Bring the ship and bullet indexes up to this step, called by what queries them"""
+        if self.indexed_tick == self.tick:
+            return
+        self.indexed_tick = self.tick
+        self.ship_index.sync(chain(self.scene.name_mapping["Ai_list"], self.scene.name_mapping["player_list"]))
+        if not self.fast_bullets:
+            self.bullet_index.sync(self.bullet_pool.live)
+
+    def command(self, action:str, pressed:bool):
+        """Take a queued input command, see InputMap"""
+        if action == "thrust":
+            self.thrust_pressed = pressed
+        elif action == "fire":
+            self.fire_pressed = pressed
+            if pressed:
+                self.fire_latched = True
+
+    def set_aim(self, x:float, y:float):
+        """Move the pointer the player steers towards, in world coordinates"""
+        self.pointer_sprite.center_x = x
+        self.pointer_sprite.center_y = y
+
+    #replays
+    #a replay is the seed plus every input change, played back through step() like live input
+    def start_recording(self, path:str):
+        if self.tick != 0:
+            raise RuntimeError("recording has to start before the first step")
+        self.recorder = ReplayRecorder(path, self.seed, self.delta_time, self.streaming)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close(self.tick, self.digest())
+            self.recorder = None
+
+    #telemetry
+    #per tick ship state, bullet counts and hits streamed to a session directory, see telemetry.py
+    def start_telemetry(self, path:str):
+        self.telemetry = TelemetrySink(path, self.delta_time, self.seed)
+
+    def stop_telemetry(self):
+        if self.telemetry is not None:
+            self.telemetry.close()
+            self.telemetry = None
+
+    def stop_world(self):
+        """Stop streaming and delete the chunks stashed on disk"""
+        if self.world is not None:
+            self.world.close()
+            self.world = None
+
+    @classmethod
+    def from_replay(cls, path:str, **kwargs):
+        """A simulation set up to replay path, call setup() and step it as usual
+
+        it streams the world only if the recording did, whatever the caller's settings
+        """
+        playback = ReplayPlayer(path)
+        simulation = cls(delta_time=playback.delta_time, seed=playback.seed, streaming=playback.streaming, **kwargs)
+        simulation.playback = playback
+        return simulation
+
+    def digest(self) -> bytes:
+        """Short hash of every body's position, angle and velocity, equal digests mean equal runs"""
+        state = hashlib.blake2b(digest_size=8)
+        for physics_object in self.physics_engine.sprites.values():
+            body = physics_object.body
+            state.update(struct.pack("<5d", body.position.x, body.position.y, body.angle, body.velocity.x, body.velocity.y))
+        if self.fast_bullets:
+            projectiles = self.bullet_pool
+            state.update(projectiles.position[:projectiles.count].tobytes())
+            state.update(projectiles.velocity[:projectiles.count].tobytes())
+        return state.digest()
+
+    def run(self, steps:int) -> float:
+        """Run steps fixed steps back to back, returns the wall time it took"""
+        start = time.perf_counter()
+        for _ in range(steps):
+            self.step()
+        return time.perf_counter() - start
+
+    #interpolation
+    #the window renders between two fixed steps, so sprites are drawn part way
+    #from where they were before the last step to where they are now
+    def remember_positions(self):
+        previous = self.previous
+        previous.clear()
+        for sprite in self.physics_engine.sprites:
+            previous[sprite] = (sprite.center_x, sprite.center_y, sprite.angle)
+
+    def interpolate(self, alpha:float, sprites = None, projectiles:bool = True):
+        """Move sprites to their blended position, undo with restore()
+
+        sprites limits it to the ones that will be drawn, all of them by default.
+        projectiles False leaves the projectile sprites alone, for when a renderer draws them from the arrays
+        """
+        rendered = self._rendered
+        rendered.clear()
+        previous = self.previous
+        for sprite in previous if sprites is None else sprites:
+            if sprite not in previous:
+                continue
+            x, y, angle = previous[sprite]
+            current = (sprite.center_x, sprite.center_y, sprite.angle)
+            # teleported this step (e.g. a pooled bullet being launched), nothing to blend
+            if abs(current[0] - x) + abs(current[1] - y) > INTERPOLATION_SNAP:
+                continue
+            rendered[sprite] = current
+            # turn the short way round
+            turn = (current[2] - angle + 180) % 360 - 180
+            sprite.center_x = x + (current[0] - x) * alpha
+            sprite.center_y = y + (current[1] - y) * alpha
+            sprite.angle = angle + turn * alpha
+        # projectiles keep their last two positions themselves
+        if self.fast_bullets and projectiles:
+            self.bullet_pool.place_sprites(alpha, sprites)
+
+    def restore(self):
+        for sprite, (x, y, angle) in self._rendered.items():
+            sprite.center_x = x
+            sprite.center_y = y
+            sprite.angle = angle
+        self._rendered.clear()
+
+
+#headless entry point
+#python -m game.simulation --steps 3600 [--trace name] [--record file | --replay file] [--telemetry dir] [--no-world]
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="run the simulation without a window")
+    parser.add_argument("--steps", type=int, default=3600)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace", help="write a profiler trace with this base name")
+    parser.add_argument("--record", help="record a replay to this file")
+    parser.add_argument("--replay", help="play this replay back and check it ends in the same state")
+    parser.add_argument("--telemetry", help="stream per tick telemetry into this directory")
+    parser.add_argument("--no-world", dest="world", action="store_false", help="don't stream world chunks in around the player, a replay does what its recording did")
+    args = parser.parse_args(argv)
+
+    profiler = Profiler()
+    if args.trace is not None:
+        profiler.start_recording()
+
+    if args.replay is not None:
+        simulation = Simulation.from_replay(args.replay, headless=True, profiler=profiler)
+        steps = simulation.playback.end_tick if simulation.playback.end_tick is not None else args.steps
+    else:
+        simulation = Simulation(headless=True, profiler=profiler, seed=args.seed, streaming=WORLD_STREAMING and args.world)
+        steps = args.steps
+    simulation.setup()
+    if args.record is not None:
+        simulation.start_recording(args.record)
+    if args.telemetry is not None:
+        simulation.start_telemetry(args.telemetry)
+
+    elapsed = simulation.run(steps)
+    print(f"{steps} steps in {elapsed:.2f}s, {steps / elapsed:.0f} steps/s "
+          f"({steps * simulation.delta_time / elapsed:.1f}x real time)")
+    ai = simulation.ai.stats
+    print(f"ai: {ai['per_step']:.1f} decisions/step, every ship within {ai['round_steps']} steps, "
+          f"{ai['overruns']} steps over the {simulation.ai.budget * 1000:g} ms budget (worst {ai['worst_ms']:.2f} ms)")
+    if simulation.world is not None:
+        world = simulation.world.stats
+        print(f"world: {world['loaded']} chunks loaded, {world['stashed']} stashed, {world['generated']} ships generated, "
+              f"{world['unloaded']} unloaded, {world['restored']} restored")
+
+    simulation.stop_recording()
+    simulation.stop_telemetry()
+    simulation.stop_world()
+    if args.trace is not None:
+        profiler.export(args.trace)
+    if args.replay is not None and simulation.playback.digest is not None:
+        matched = simulation.digest() == simulation.playback.digest
+        print("replay matched the recording" if matched else "replay DIVERGED from the recording")
+        return 0 if matched else 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
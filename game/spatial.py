@@ -0,0 +1,230 @@
+import heapq
+import math
+from game.constants import *
+
+#spatial hash
+#uniform grid over the world, each cell holds the items whose position falls inside it
+#positions are refreshed every step from the pymunk bodies, items only change cell when they cross a border
+class SpatialHash:
+
+    def __init__(self, cell_size:float = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {} # (cx, cy) -> {item: None}, dicts keep query order deterministic
+        self.entries = {} # item -> [x, y, cell]
+        self.seen = {}
+        self.generation = 0
+        # cell range that is occupied, bounds the k-nearest search. grows as cells fill, worked out
+        # again on the next search once a cell empties
+        self.bounds = None
+        self.bounds_stale = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def position(self, item) -> tuple:
+        entry = self.entries[item]
+        return entry[0], entry[1]
+
+    def cell_of(self, x:float, y:float) -> tuple:
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def move(self, item, x:float, y:float):
+        """Insert item or update its position"""
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        entry = self.entries.get(item)
+        if entry is None:
+            self.entries[item] = [x, y, cell]
+            self._enter(item, cell)
+            return
+
+        entry[0] = x
+        entry[1] = y
+        if entry[2] != cell:
+            self._leave(item, entry[2])
+            self._enter(item, cell)
+            entry[2] = cell
+
+    def remove(self, item):
+        entry = self.entries.pop(item, None)
+        if entry is not None:
+            self._leave(item, entry[2])
+        self.seen.pop(item, None)
+
+    def _enter(self, item, cell):
+        members = self.cells.get(cell)
+        if members is None:
+            members = self.cells[cell] = {}
+            bounds = self.bounds
+            if bounds is None:
+                self.bounds = [cell[0], cell[1], cell[0], cell[1]]
+            else:
+                if cell[0] < bounds[0]: bounds[0] = cell[0]
+                if cell[1] < bounds[1]: bounds[1] = cell[1]
+                if cell[0] > bounds[2]: bounds[2] = cell[0]
+                if cell[1] > bounds[3]: bounds[3] = cell[1]
+        members[item] = None
+
+    def _leave(self, item, cell):
+        members = self.cells[cell]
+        del members[item]
+        if not members:
+            del self.cells[cell]
+            self.bounds_stale = True
+
+    def sync(self, sprites):
+        """Re-read positions from the sprites' pymunk bodies, anything not passed in is dropped"""
+        self.generation += 1
+        generation = self.generation
+        seen = self.seen
+        count = 0
+        for sprite in sprites:
+            x, y = sprite.physics_object.body.position
+            self.move(sprite, x, y)
+            seen[sprite] = generation
+            count += 1
+
+        if count != len(self.entries):
+            for item in [item for item, mark in seen.items() if mark != generation]:
+                self.remove(item)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.seen.clear()
+        self.bounds = None
+        self.bounds_stale = False
+
+    def _rebuild_bounds(self):
+        self.bounds_stale = False
+        if not self.cells:
+            self.bounds = None
+            return
+        xs = [cell[0] for cell in self.cells]
+        ys = [cell[1] for cell in self.cells]
+        self.bounds = [min(xs), min(ys), max(xs), max(ys)]
+
+    def query_radius(self, x:float, y:float, radius:float) -> list:
+        """Every item within radius of (x, y)"""
+        size = self.cell_size
+        low_x, low_y = int((x - radius) // size), int((y - radius) // size)
+        high_x, high_y = int((x + radius) // size), int((y + radius) // size)
+        radius_sq = radius * radius
+        cells = self.cells
+        entries = self.entries
+        found = []
+
+        for cx in range(low_x, high_x + 1):
+            for cy in range(low_y, high_y + 1):
+                members = cells.get((cx, cy))
+                if members is None:
+                    continue
+                for item in members:
+                    entry = entries[item]
+                    dx = entry[0] - x
+                    dy = entry[1] - y
+                    if dx * dx + dy * dy <= radius_sq:
+                        found.append(item)
+        return found
+
+    def query_rect(self, left:float, bottom:float, right:float, top:float) -> list:
+        """Every item inside the axis aligned box"""
+        size = self.cell_size
+        cells = self.cells
+        entries = self.entries
+        found = []
+
+        for cx in range(int(left // size), int(right // size) + 1):
+            for cy in range(int(bottom // size), int(top // size) + 1):
+                members = cells.get((cx, cy))
+                if members is None:
+                    continue
+                for item in members:
+                    entry = entries[item]
+                    if left <= entry[0] <= right and bottom <= entry[1] <= top:
+                        found.append(item)
+        return found
+
+    def nearest(self, x:float, y:float, k:int = 1, max_radius:float = math.inf, exclude = None) -> list:
+        """Up to k items closest to (x, y), closest first
+
+        searches outwards one ring of cells at a time and stops once no unvisited
+        cell can hold anything closer than the k-th best so far
+        """
+        if not self.entries or k <= 0:
+            return []
+
+        size = self.cell_size
+        cells = self.cells
+        entries = self.entries
+        origin_x, origin_y = self.cell_of(x, y)
+        max_radius_sq = max_radius * max_radius
+
+        # no point searching past the furthest occupied cell
+        if self.bounds_stale:
+            self._rebuild_bounds()
+        low_x, low_y, high_x, high_y = self.bounds
+        furthest = max(origin_x - low_x, origin_y - low_y, high_x - origin_x, high_y - origin_y, 0)
+        if max_radius != math.inf:
+            furthest = min(furthest, int(max_radius // size) + 1)
+        # finding k items takes walking about k cells per item's worth of area, when that is more
+        # cells than there are items, checking every item is quicker
+        area = min((high_x - low_x + 1) * (high_y - low_y + 1), (2 * furthest + 1) ** 2)
+        if len(entries) ** 2 <= k * area:
+            return self._scan(x, y, k, max_radius_sq, exclude)
+
+        best = [] # max heap of (-distance_sq, order, item)
+        order = 0
+        for ring in range(furthest + 1):
+            for cell in self._ring(origin_x, origin_y, ring):
+                members = cells.get(cell)
+                if members is None:
+                    continue
+                for item in members:
+                    if item is exclude:
+                        continue
+                    entry = entries[item]
+                    dx = entry[0] - x
+                    dy = entry[1] - y
+                    distance_sq = dx * dx + dy * dy
+                    if distance_sq > max_radius_sq:
+                        continue
+                    order += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance_sq, -order, item))
+                    elif distance_sq < -best[0][0]:
+                        heapq.heapreplace(best, (-distance_sq, -order, item))
+
+            # anything in ring + 1 is at least ring * size away
+            if len(best) == k and -best[0][0] <= (ring * size) ** 2:
+                break
+
+        best.sort(reverse=True)
+        return [item for _distance, _order, item in best]
+
+    def _scan(self, x:float, y:float, k:int, max_radius_sq:float, exclude) -> list:
+        """nearest() by checking every item, a few items spread over many empty cells are quicker this way"""
+        found = []
+        for order, (item, entry) in enumerate(self.entries.items()):
+            if item is exclude:
+                continue
+            dx = entry[0] - x
+            dy = entry[1] - y
+            distance_sq = dx * dx + dy * dy
+            if distance_sq <= max_radius_sq:
+                found.append((distance_sq, order, item))
+        return [item for _distance, _order, item in heapq.nsmallest(k, found)]
+
+    @staticmethod
+    def _ring(cx:int, cy:int, ring:int):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
@@ -0,0 +1,270 @@
+import os
+import json
+import glob
+import queue
+import threading
+import numpy as np
+from game.constants import *
+
+#telemetry session layout, a directory with
+#   session.json        delta time, seed, chunk size, and the totals once it was closed
+#   chunk-000000.npz    compressed frames, ships and events arrays of TELEMETRY_CHUNK_TICKS ticks
+#row counters run over the whole session, so the chunks concatenated line up with the frames' offsets
+SESSION = "session.json"
+CHUNK_NAME = "chunk-{:06d}.npz"
+VERSION = 1
+
+# one row per tick
+FRAME = np.dtype([
+    ("tick", np.uint32),
+    ("ship_start", np.uint64), # session index of the tick's first ship row
+    ("ships", np.uint32),
+    ("event_start", np.uint64),
+    ("events", np.uint32),
+    ("bullets", np.uint32),
+    ("dropped", np.bool_), # the flush thread was too far behind, the tick's ship rows were left out
+])
+# one row per ship and tick, what its steering saw and decided that tick
+SHIP = np.dtype([
+    ("tick", np.uint32),
+    ("entity", np.uint32),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("angle", np.float32),
+    ("vx", np.float32), # nan on the first tick a ship is seen
+    ("vy", np.float32),
+    ("pid_output", np.float32),
+    ("distance", np.float32),
+])
+EVENT = np.dtype([
+    ("tick", np.uint32),
+    ("kind", np.uint8),
+    ("target", np.int32),
+    ("source", np.int32),
+    ("value", np.float32),
+])
+
+# a bullet hit a ship, target and source are entity ids, value the damage
+HIT_EVENT = 0
+
+
+#ring
+#preallocated rows the game thread writes and the flush thread reads. the counters only grow,
+#a row sits at its counter modulo the capacity
+class _Ring:
+
+    def __init__(self, dtype:np.dtype, capacity:int):
+        self.rows = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.written = 0
+        self.flushed = 0 # moved on by the flush thread once it has copied the rows out
+
+    def has_room(self, n:int) -> bool:
+        return self.written + n - self.flushed <= self.capacity
+
+    def put(self, n:int, columns:dict):
+        """Write n rows after the last one, columns maps field names to n values or a scalar"""
+        rows = self.rows
+        i = self.written % self.capacity
+        end = i + n
+        if end <= self.capacity:
+            for name, values in columns.items():
+                rows[name][i:end] = values
+        else:
+            first = self.capacity - i
+            for name, values in columns.items():
+                if np.ndim(values) == 0:
+                    rows[name][i:] = values
+                    rows[name][:end - self.capacity] = values
+                else:
+                    rows[name][i:] = values[:first]
+                    rows[name][:end - self.capacity] = values[first:]
+        self.written += n
+
+    def append(self, row:tuple):
+        self.rows[self.written % self.capacity] = row
+        self.written += 1
+
+    def copy(self, start:int, stop:int) -> np.ndarray:
+        i = start % self.capacity
+        end = i + stop - start
+        if end <= self.capacity:
+            return self.rows[i:end].copy()
+        return np.concatenate((self.rows[i:], self.rows[:end - self.capacity]))
+
+
+#telemetry sink
+#the game thread copies each tick's ship state, bullet count and events into preallocated rings
+#with a handful of numpy slice writes. every TELEMETRY_CHUNK_TICKS ticks the new rows are handed to
+#a background thread that compresses them to disk. it never waits for that thread, a tick that
+#doesn't fit in the ring because the thread fell behind is marked dropped instead
+class TelemetrySink:
+
+    def __init__(self, path:str, delta_time:float = FIXED_DELTA_TIME, seed:int = None,
+                 chunk_ticks:int = TELEMETRY_CHUNK_TICKS,
+                 ship_rows:int = TELEMETRY_SHIP_ROWS,
+                 event_rows:int = TELEMETRY_EVENT_ROWS):
+        self.path = path
+        self.delta_time = delta_time
+        self.chunk_ticks = chunk_ticks
+        self.frames = _Ring(FRAME, 4 * chunk_ticks)
+        self.ships = _Ring(SHIP, ship_rows)
+        self.events = _Ring(EVENT, event_rows)
+        self.dropped_ticks = 0
+        self.dropped_events = 0
+        self.event_mark = 0 # events before this one belong to an earlier frame
+
+        # last position of every entity, for the velocities
+        self.last_position = np.zeros((0, 2))
+        self.last_seen = np.zeros(0, dtype=np.int64)
+
+        os.makedirs(path, exist_ok=True)
+        self.meta = {"version": VERSION, "delta_time": delta_time, "seed": seed, "chunk_ticks": chunk_ticks}
+        self._write_meta()
+
+        self.chunks = 0
+        self.handed = (0, 0, 0) # frames, ships and events already queued for the flush thread
+        self.queue = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._flush_loop, name="telemetry", daemon=True)
+        self.thread.start()
+
+    #game thread
+
+    def event(self, tick:int, kind:int, target:int, source:int = -1, value:float = 0.0):
+        if not self.events.has_room(1):
+            self.dropped_events += 1
+            return
+        self.events.append((tick, kind, target, source, value))
+
+    def record(self, tick:int, entities, bullets:int):
+        """Take the tick's rows from the store, call once per tick after the AI has run"""
+        if not self.frames.has_room(1):
+            self.dropped_ticks += 1
+            # the tick's events go with it, the next frame only claims its own
+            self.event_mark = self.events.written
+            return
+        frame_ships = self.ships.written
+        bodies = entities.bodies
+        n = len(bodies)
+        dropped = not self.ships.has_room(n)
+        if dropped:
+            self.dropped_ticks += 1
+            n = 0
+        elif n:
+            ids = np.fromiter(bodies, dtype=np.int64, count=n)
+            position = entities.position[ids]
+
+            if len(self.last_seen) < entities.capacity:
+                self._grow(entities.capacity)
+            # velocity from the last tick's position, unknown for ships that weren't there
+            known = self.last_seen[ids] == tick - 1
+            velocity = (position - self.last_position[ids]) / self.delta_time
+            velocity[~known] = np.nan
+            self.last_position[ids] = position
+            self.last_seen[ids] = tick
+
+            self.ships.put(n, {
+                "tick": tick,
+                "entity": ids,
+                "x": position[:, 0],
+                "y": position[:, 1],
+                "angle": entities.angle[ids],
+                "vx": velocity[:, 0],
+                "vy": velocity[:, 1],
+                "pid_output": entities.output[ids],
+                "distance": entities.distance[ids],
+            })
+
+        # events were written as they happened, the frame claims the ones since the last frame
+        event_start = self.event_mark
+        self.event_mark = self.events.written
+        self.frames.append((tick, frame_ships, n, event_start, self.event_mark - event_start, bullets, dropped))
+
+        if self.frames.written - self.handed[0] >= self.chunk_ticks:
+            self._hand_off()
+
+    def _grow(self, capacity:int):
+        position = np.zeros((capacity, 2))
+        seen = np.full(capacity, -2, dtype=np.int64)
+        position[:len(self.last_position)] = self.last_position
+        seen[:len(self.last_seen)] = self.last_seen
+        self.last_position = position
+        self.last_seen = seen
+
+    def _hand_off(self):
+        written = (self.frames.written, self.ships.written, self.events.written)
+        if written == self.handed:
+            return
+        self.queue.put((self.chunks, self.handed, written))
+        self.chunks += 1
+        self.handed = written
+
+    def close(self):
+        """Flush what is left, wait for the flush thread and write the totals"""
+        self._hand_off()
+        self.queue.put(None)
+        self.thread.join()
+        self.meta.update(ticks=self.frames.written, ship_rows=self.ships.written, events=self.events.written,
+                         chunks=self.chunks, dropped_ticks=self.dropped_ticks, dropped_events=self.dropped_events)
+        self._write_meta()
+        if self.error is not None:
+            raise self.error
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, SESSION), "w") as file:
+            json.dump(self.meta, file, indent=2)
+
+    #flush thread
+
+    def _flush_loop(self):
+        rings = (self.frames, self.ships, self.events)
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            index, start, stop = item
+            try:
+                arrays = [ring.copy(a, b) for ring, a, b in zip(rings, start, stop)]
+                # the rows are copied out, the game thread may write over them now
+                for ring, b in zip(rings, stop):
+                    ring.flushed = b
+                np.savez_compressed(os.path.join(self.path, CHUNK_NAME.format(index)),
+                                    frames=arrays[0], ships=arrays[1], events=arrays[2])
+            except Exception as error:
+                self.error = error
+                for ring, b in zip(rings, stop):
+                    ring.flushed = b
+
+
+#telemetry reader
+#loads a whole session back for analysis
+class TelemetryReader:
+
+    def __init__(self, path:str):
+        with open(os.path.join(path, SESSION)) as file:
+            self.meta = json.load(file)
+        frames, ships, events = [], [], []
+        for name in sorted(glob.glob(os.path.join(path, "chunk-*.npz"))):
+            with np.load(name) as chunk:
+                frames.append(chunk["frames"])
+                ships.append(chunk["ships"])
+                events.append(chunk["events"])
+        self.frames = np.concatenate(frames) if frames else np.zeros(0, FRAME)
+        self.ships = np.concatenate(ships) if ships else np.zeros(0, SHIP)
+        self.events = np.concatenate(events) if events else np.zeros(0, EVENT)
+
+    def tick(self, tick:int) -> tuple:
+        """Ship rows and events of one tick"""
+        frame = self.frames[np.searchsorted(self.frames["tick"], tick)]
+        ship_start = int(frame["ship_start"])
+        event_start = int(frame["event_start"])
+        return (self.ships[ship_start:ship_start + int(frame["ships"])],
+                self.events[event_start:event_start + int(frame["events"])])
+
+    def ship(self, entity:int) -> np.ndarray:
+        """Every row of one entity id, ids are reused after a ship is destroyed"""
+        return self.ships[self.ships["entity"] == entity]
+
+    def hits(self) -> np.ndarray:
+        return self.events[self.events["kind"] == HIT_EVENT]
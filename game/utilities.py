@@ -1,4 +1,5 @@
 import math
+import numpy as np
 def get_angle_to(startvec2, endvec2):
         # start Position
         start_x = startvec2[0]
@@ -13,11 +14,26 @@ def get_angle_to(startvec2, endvec2):
         angle = math.atan2(y_diff, x_diff)
         return angle
 
+def wrap_angles(bodyangle, target_angle):
+        """lift one of the two angles by 2pi so the error between them never goes the long way round"""
+        error = bodyangle - target_angle
+        if abs(error) > math.pi:
+                if target_angle > bodyangle:
+                        bodyangle = bodyangle + 2*math.pi
+                elif bodyangle > target_angle:
+                        target_angle = target_angle + 2*math.pi
+        return bodyangle, target_angle
+
 def pid(input,
         setpoint,
         delta_time,
-        params:dict = {"p":100, "i":10, "d":10},
-        data:dict = {"errSum":0, "lasterr":0}) -> float:
+        params:dict = None,
+        data:dict = None) -> float:
+        """dict based pid, a call without data starts from a fresh state every time, see pid_step"""
+        if params is None:
+                params = {"p":100, "i":10, "d":10}
+        if data is None:
+                data = {"errSum":0, "lasterr":0}
 
         error = setpoint - input
         data["errSum"] += (error * delta_time)
@@ -28,6 +44,52 @@ def pid(input,
 
         #>:3
 
+#pid state
+#gains and memory of one controller, slots so pid_step can update it in place without allocating
+class PIDState:
+        __slots__ = ("p", "i", "d", "windup", "err_sum", "last_input")
+
+        def __init__(self, p:float, i:float, d:float, windup:float = math.inf, input:float = 0.0):
+                """input is the measurement the controller starts from, windup the most the integral can hold"""
+                self.p = p
+                self.i = i
+                self.d = d
+                self.windup = windup
+                self.err_sum = 0.0
+                self.last_input = input
+
+        def reset(self, input:float = 0.0):
+                self.err_sum = 0.0
+                self.last_input = input
+
+def pid_step(state:PIDState, input:float, setpoint:float, delta_time:float) -> float:
+        """One pid update, same sign as pid()
+
+        the integral is clamped to +-windup so it can't wind up while the output is saturated,
+        and the derivative is taken on the measurement so a setpoint jump doesn't kick the output
+        """
+        error = setpoint - input
+        err_sum = state.err_sum + error * delta_time
+        windup = state.windup
+        if err_sum > windup:
+                err_sum = windup
+        elif err_sum < -windup:
+                err_sum = -windup
+        state.err_sum = err_sum
+        dinput = (input - state.last_input) / delta_time
+        state.last_input = input
+        return -(state.p * error + state.i * err_sum - state.d * dinput)
+
+def pid_batch(input, setpoint, delta_time, gains, err_sum, last_input, windup):
+        """pid_step over numpy arrays of controllers, gains is (n, 3)
+
+        returns the outputs and the new err_sum, the new last_input is input
+        """
+        error = setpoint - input
+        err_sum = np.clip(err_sum + error * delta_time, -windup, windup)
+        dinput = (input - last_input) / delta_time
+        return -(gains[:, 0] * error + gains[:, 1] * err_sum - gains[:, 2] * dinput), err_sum
+
 def cycle(list):
         """more memory efficient cycle"""
         while list:
@@ -0,0 +1,72 @@
+#weapon scheduler
+#keeps one clock for every armed ship and works out the shots each gun owes for a step from
+#its own cooldown, so the fire rate no longer depends on how often fire_guns gets called.
+#a gun whose cooldown is shorter than the step fires more than once in it, and every shot
+#of the step goes to the bullet system in one acquire_many call
+class WeaponScheduler:
+
+    def __init__(self, bullet_pool):
+        self.bullet_pool = bullet_pool
+        self.time = 0.0
+        self.ships = set()
+        # ships holding the trigger this step and the last one
+        self.triggered = {}
+        self.held = {}
+        self.shots = 0
+
+    def add(self, ship):
+        self.ships.add(ship)
+        ship.weapons = self
+
+    def remove(self, ship):
+        self.ships.discard(ship)
+        self.triggered.pop(ship, None)
+        self.held.pop(ship, None)
+        ship.weapons = None
+
+    def trigger(self, ship):
+        """Hold ship's trigger down for the next update"""
+        self.triggered[ship] = None
+
+    #update method
+    #fires whatever the triggered ships' guns owe between now and delta_time from now
+    def update(self, delta_time:float) -> list:
+        start = self.time
+        end = self.time = start + delta_time
+
+        shots = [] # (time, ship, gun)
+        for ship in self.triggered:
+            guns = ship.gunlist
+            # a gun without a cooldown fires once every step
+            cooldowns = [gun.cooldown if gun.cooldown > 0 else delta_time for gun in guns]
+            if ship not in self.held:
+                # trigger just pulled, the guns take turns instead of all going off together
+                interval = 1 / sum(1 / cooldown for cooldown in cooldowns)
+                for turn, gun in enumerate(guns):
+                    gun.ready = max(gun.ready, start + turn * interval)
+            for gun, cooldown in zip(guns, cooldowns):
+                # a gun left idle doesn't bank shots, the first one goes off at the start of the step
+                shot = max(gun.ready, start)
+                while shot < end:
+                    shots.append((shot, ship, gun))
+                    shot += cooldown
+                gun.ready = shot
+
+        self.held, self.triggered = self.triggered, self.held
+        self.triggered.clear()
+        if not shots:
+            return []
+
+        shots.sort(key=lambda shot: shot[0])
+        self.shots += len(shots)
+        bullets = self.bullet_pool.acquire_many([ship for _time, ship, _gun in shots],
+                                                [time - start for time, _ship, _gun in shots])
+        # one report and flash per gun and step, catch up shots would only stack the same sound
+        for gun in {gun: None for _time, _ship, gun in shots}:
+            gun.play_sound()
+            gun.flash()
+        return bullets
+
+    def clear(self):
+        self.triggered.clear()
+        self.held.clear()
@@ -0,0 +1,219 @@
+import os
+import math
+import struct
+import random
+import shutil
+import weakref
+import hashlib
+import tempfile
+import numpy as np
+from game.constants import *
+
+#world chunks
+#space is cut into WORLD_CHUNK_SIZE squares around the player. a chunk is generated from its own
+#seed the first time the player comes near, so the same world seed always fills it the same way.
+#once the player is far enough away its ships are written out to rows and destroyed, bodies,
+#sprites, entities and all, and read back in when the player returns. the live world never holds
+#more than the chunks around the player, however far they fly
+CHUNK_NAME = "chunk{:+d}{:+d}.npz"
+
+# one row per ship stashed in a chunk
+SHIP_ROW = np.dtype([
+    ("x", np.float64),
+    ("y", np.float64),
+    ("angle", np.float64),
+    ("vx", np.float64),
+    ("vy", np.float64),
+    ("spin", np.float64),
+    ("tx", np.float64),
+    ("ty", np.float64),
+    ("err_sum", np.float64),
+    ("last_input", np.float64),
+    ("health", np.float64),
+    ("homed", np.bool_), # generated by a chunk, it patrols home instead of chasing the player
+    ("home", np.int64, 2),
+])
+
+
+#chunk manager
+#keeps the chunks around the player loaded. a chunk that goes with ships in it is written to a file
+#in a new directory of its own, made inside directory or the system temp directory, and deleted
+#again by close(). one that goes empty is only remembered by its key, so the memory held for the
+#world visited stays a few bytes a chunk however far the player flies
+class ChunkManager:
+
+    def __init__(self, simulation, seed:int, size:float = WORLD_CHUNK_SIZE, load_radius:int = WORLD_LOAD_RADIUS,
+                 unload_radius:float = WORLD_UNLOAD_RADIUS, directory:str = None):
+        self.simulation = simulation
+        self.seed = seed
+        self.size = size
+        self.load_radius = load_radius
+        self.unload_radius = max(unload_radius, load_radius)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        # chunks left over from another world would be read back into this one, so every
+        # manager starts from an empty directory and never touches what was already there
+        self.directory = tempfile.mkdtemp(prefix="chunks-", dir=directory)
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+        self.loaded = set()
+        self.visited = set() # generated and left with no ships in them
+        self.stashed = {} # key -> size of its file
+        self.center = None
+        self.steps = 0
+
+        # counters
+        self.generated = 0 # ships made by generating chunks
+        self.restored = 0
+        self.unloaded = 0 # ships written out
+
+    def chunk_of(self, x:float, y:float) -> tuple:
+        return (math.floor(x / self.size), math.floor(y / self.size))
+
+    def chunk_random(self, key:tuple) -> random.Random:
+        """The chunk's own generator, only the world seed and where it is decide what it holds"""
+        data = struct.pack("<Qqq", self.seed % 2**64, *key)
+        return random.Random(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little"))
+
+    def bounds(self, key:tuple) -> tuple:
+        """left, bottom, right, top of the chunk"""
+        return (key[0] * self.size, key[1] * self.size, (key[0] + 1) * self.size, (key[1] + 1) * self.size)
+
+    def random_point(self, key:tuple, rng:random.Random) -> tuple:
+        """Somewhere inside the chunk, drawn from rng"""
+        return ((key[0] + rng.random()) * self.size, (key[1] + rng.random()) * self.size)
+
+    #update method
+    #follows the player, chunks only change when they cross into another one
+    def update(self, x:float, y:float):
+        self.steps += 1
+        center = self.chunk_of(x, y)
+        if center != self.center:
+            self.center = center
+            cx, cy = center
+            radius = self.load_radius
+            for key in ((cx + dx, cy + dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)):
+                if key not in self.loaded:
+                    self.load(key)
+            for key in [key for key in self.loaded if max(abs(key[0] - cx), abs(key[1] - cy)) > self.unload_radius]:
+                # remembered even when it ends up empty, so coming back doesn't generate it again
+                self.loaded.discard(key)
+                self.put(key, True, np.zeros(0, dtype=SHIP_ROW))
+            self.sweep()
+        elif self.steps % WORLD_SWEEP_INTERVAL == 0:
+            self.sweep()
+
+    def sweep(self):
+        """Stash every live AI ship that is outside the loaded chunks, into the chunk it is in"""
+        simulation = self.simulation
+        ai_list = simulation.scene.name_mapping["Ai_list"]
+        if not len(ai_list):
+            return
+        entities = simulation.entities
+        ids = np.fromiter([sprite.entity for sprite in ai_list], dtype=np.int64, count=len(ai_list))
+        cells = np.floor(entities.position[ids] / self.size).astype(np.int64).tolist()
+        alive = (entities.health[ids] > 0).tolist()
+
+        leaving = {}
+        for sprite, cell, alive in zip(list(ai_list), cells, alive):
+            # the dead are left for update_ai to blow up
+            key = tuple(cell)
+            if alive and key not in self.loaded:
+                leaving.setdefault(key, []).append(sprite)
+        for key, ships in leaving.items():
+            self.stash(key, ships)
+
+    def stash(self, key:tuple, ships:list):
+        rows = np.zeros(len(ships), dtype=SHIP_ROW)
+        entities = self.simulation.entities
+        for row, ship in zip(rows, ships):
+            body = ship.physics_object.body
+            fleet = ship.fleet
+            row["x"], row["y"] = body.position
+            row["angle"] = body.angle
+            row["vx"], row["vy"] = body.velocity
+            row["spin"] = body.angular_velocity
+            row["tx"], row["ty"] = entities.target[ship.entity]
+            row["err_sum"] = fleet.err_sum[ship.fleet_index] if fleet is not None else ship.pid.err_sum
+            row["last_input"] = fleet.last_input[ship.fleet_index] if fleet is not None else ship.pid.last_input
+            row["health"] = entities.health[ship.entity]
+            if ship.home is not None:
+                row["homed"] = True
+                row["home"] = ship.home
+            ship.destroy()
+        self.unloaded += len(ships)
+
+        # a chunk that was never loaded still gets generated when it is, on top of the ships that drifted in
+        generated, old = self.take(key)
+        if old is not None:
+            rows = np.concatenate((old, rows))
+        self.put(key, generated, rows)
+
+    def load(self, key:tuple):
+        generated, rows = self.take(key)
+        if not generated:
+            self.generate(key)
+        if rows is not None:
+            for row in rows:
+                self.restore(row)
+            self.restored += len(rows)
+        self.loaded.add(key)
+
+    def generate(self, key:tuple):
+        rng = self.chunk_random(key)
+        for _ in range(rng.randint(0, WORLD_CHUNK_SHIPS)):
+            x, y = self.random_point(key, rng)
+            ship = self.simulation.spawn_cargo_ship(x, y)
+            ship.home = key
+            self.generated += 1
+
+    def restore(self, row):
+        ship = self.simulation.spawn_cargo_ship(float(row["x"]), float(row["y"]), (float(row["tx"]), float(row["ty"])),
+                                                health=float(row["health"]), pid=(float(row["err_sum"]), float(row["last_input"])))
+        body = ship.physics_object.body
+        body.angle = float(row["angle"])
+        body.velocity = (float(row["vx"]), float(row["vy"]))
+        body.angular_velocity = float(row["spin"])
+        ship.angle = math.degrees(body.angle)
+        if row["homed"]:
+            ship.home = tuple(row["home"].tolist())
+        return ship
+
+    #stash storage
+    #take hands back (generated, rows) and forgets them, rows is None when nothing was stashed
+    def take(self, key:tuple) -> tuple:
+        if key in self.visited:
+            self.visited.discard(key)
+            return True, None
+        if self.stashed.pop(key, None) is None:
+            return False, None
+        path = os.path.join(self.directory, CHUNK_NAME.format(*key))
+        with np.load(path) as data:
+            generated, rows = bool(data["generated"]), data["rows"]
+        os.remove(path)
+        return generated, rows
+
+    def put(self, key:tuple, generated:bool, rows:np.ndarray):
+        if not len(rows):
+            # a chunk never generated with nothing in it is no different from one never seen
+            if generated:
+                self.visited.add(key)
+            return
+        path = os.path.join(self.directory, CHUNK_NAME.format(*key))
+        np.savez(path, generated=generated, rows=rows)
+        self.stashed[key] = os.path.getsize(path)
+
+    def close(self):
+        """Delete the stash directory and every chunk in it, the world can't be streamed after this"""
+        self._cleanup()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "loaded": len(self.loaded),
+            "stashed": len(self.stashed),
+            "stashed_bytes": sum(self.stashed.values()),
+            "visited": len(self.visited),
+            "generated": self.generated,
+            "restored": self.restored,
+            "unloaded": self.unloaded,
+        }
@@ -0,0 +1,24 @@
+import pytest
+from game.simulation import Simulation
+
+STEPS = 120
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_replay_matches_with_the_recorded_world_setting(tmp_path, streaming):
+    path = str(tmp_path / "run.bin")
+    recorded = Simulation(headless=True, seed=7, streaming=streaming)
+    recorded.setup()
+    recorded.start_recording(path)
+    recorded.thrust_pressed = True
+    recorded.fire_pressed = True
+    recorded.run(STEPS)
+    recorded.stop_recording()
+
+    # replayed with the defaults, the header decides whether the world streams
+    replayed = Simulation.from_replay(path, headless=True)
+    assert replayed.streaming == streaming
+    replayed.setup()
+    replayed.run(replayed.playback.end_tick)
+    assert replayed.playback.end_tick == STEPS
+    assert replayed.digest() == replayed.playback.digest
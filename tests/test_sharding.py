@@ -0,0 +1,36 @@
+import gc
+import weakref
+import numpy as np
+from game.sharding import ShardWorker, ROW, SHIP
+from game.constants import *
+
+FOREIGN = 8
+
+
+def test_ghosts_stay_bounded_as_ships_cross_the_border():
+    # region 0 of 2 ends at x=0, every ship belongs to region 1 and keeps crossing in and out of the halo
+    rows = FOREIGN + 2 * SHARD_BULLET_SLOTS
+    table = np.zeros(rows, dtype=ROW)
+    ships = table[:FOREIGN]
+    ships["kind"] = SHIP
+    ships["owner"] = 1
+    ships["y"] = np.arange(FOREIGN) * 100
+    ships["health"] = CARGO_HEALTH
+    worker = ShardWorker(0, 2, table, FOREIGN, seed=0)
+
+    made = []
+    for cycle in range(40):
+        ships["x"] = SHARD_GHOST_MARGIN / 2 if cycle % 2 == 0 else SHARD_GHOST_MARGIN * 10
+        worker.exchange()
+        if cycle % 2 == 0:
+            # the last cycle took every ghost away, these are all new
+            made += [weakref.ref(ghost) for ghost in worker.ghosts.values()]
+        worker.simulate(FIXED_DELTA_TIME)
+
+    gc.collect()
+    ghost_list = worker.scene["ghost_list"]
+    assert len(made) == 20 * FOREIGN
+    assert len(worker.ghosts) == 0
+    assert len(ghost_list) == 0
+    assert not ghost_list._deferred_sprites
+    assert sum(ref() is not None for ref in made) == 0
@@ -0,0 +1,28 @@
+import random
+import pytest
+from game.spatial import SpatialHash
+
+
+# sparse enough that k-nearest scans every item, dense enough that it walks the grid
+@pytest.mark.parametrize("count, world", [(50, 20000), (2000, 2000)])
+def test_nearest_matches_brute_force(count, world):
+    rng = random.Random(count)
+    points = [(rng.uniform(-world, world), rng.uniform(-world, world)) for _ in range(count)]
+    index = SpatialHash()
+    for i, (x, y) in enumerate(points):
+        index.move(i, x, y)
+
+    for _ in range(50):
+        x, y = points[rng.randrange(count)]
+        distance = lambda i: (points[i][0] - x) ** 2 + (points[i][1] - y) ** 2
+        expected = sorted(range(count), key=distance)[:8]
+        assert [distance(i) for i in index.nearest(x, y, 8)] == [distance(i) for i in expected]
+
+
+def test_bounds_shrink_once_a_cell_empties():
+    index = SpatialHash(cell_size=100)
+    index.move("a", 0, 0)
+    index.move("b", 5000, 5000)
+    index.remove("b")
+    assert index.nearest(0, 0) == ["a"]
+    assert index.bounds == [0, 0, 0, 0]
@@ -0,0 +1,38 @@
+import os
+from game.simulation import Simulation
+from game.world import ChunkManager
+
+
+def test_chunk_directory_leaves_existing_files_alone(tmp_path):
+    mine = tmp_path / "chunk+0+0.npz"
+    mine.write_bytes(b"not the manager's")
+    simulation = Simulation(headless=True, seed=1)
+    simulation.setup()
+    world = ChunkManager(simulation, simulation.seed, unload_radius=1, directory=str(tmp_path))
+    world.update(0, 0)
+    # far enough away that the chunks around the start are written out
+    world.update(10 * world.size, 0)
+
+    assert mine.read_bytes() == b"not the manager's"
+    assert os.path.dirname(world.directory) == str(tmp_path)
+    assert world.stats["stashed"] > 0
+
+
+def test_empty_chunks_are_kept_as_keys_and_close_deletes_the_stash(tmp_path):
+    simulation = Simulation(headless=True, seed=1)
+    simulation.setup()
+    world = ChunkManager(simulation, simulation.seed, unload_radius=1, directory=str(tmp_path))
+    for chunk in range(10):
+        world.update(chunk * world.size, 0)
+
+    assert len(os.listdir(world.directory)) == world.stats["stashed"]
+    assert world.visited and not world.visited & set(world.stashed)
+    # flying back restores the ships and doesn't generate the empty chunks again
+    generated = world.generated
+    for chunk in reversed(range(10)):
+        world.update(chunk * world.size, 0)
+    assert world.generated == generated
+    assert not world.loaded & (world.visited | set(world.stashed))
+
+    world.close()
+    assert not os.path.exists(world.directory)